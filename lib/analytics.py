@@ -0,0 +1,105 @@
+"""
+Whole-graph reporting over a columnar snapshot (see lib.db.snapshot).
+
+Each report is computed over entire columns at once: NumPy
+``unique`` when NumPy is installed, and C-level ``Counter`` /
+``set`` passes over the memory-mapped arrays otherwise. Neither builds
+model objects or issues a query per author or magazine. Results are plain
+dicts and lists keyed by id.
+
+    export_snapshot("snapshots/today")
+    snapshot = load_snapshot("snapshots/today")
+    for author_id, name, count in top_authors(snapshot, 5):
+        ...
+"""
+from collections import Counter, defaultdict
+
+from lib.db.snapshot import numpy
+
+
+def _index(sorted_ids, values):
+    """Positions of ``values`` in the sorted id column (snapshots are ordered by id)."""
+    return numpy.searchsorted(sorted_ids, values)
+
+
+def author_article_counts(snapshot):
+    """Return ``{author_id: number of articles}`` for every author with articles."""
+    author_ids = snapshot.column("articles", "author_id")
+    if numpy is not None:
+        ids, counts = numpy.unique(author_ids, return_counts=True)
+        return dict(zip(ids.tolist(), counts.tolist()))
+    return dict(Counter(author_ids))
+
+
+def top_authors(snapshot, n=10):
+    """
+    Return the ``n`` most prolific authors as ``(author_id, name, count)`` tuples.
+
+    Ties are broken by the lower author id.
+    """
+    counts = author_article_counts(snapshot)
+    ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:n]
+    ids = snapshot.column("authors", "id")
+    names = snapshot.column("authors", "name")
+    if numpy is not None:
+        positions = _index(ids, [author_id for author_id, _ in ranked]).tolist()
+    else:
+        position = {author_id: i for i, author_id in enumerate(ids)}
+        positions = [position[author_id] for author_id, _ in ranked]
+    return [(author_id, names[i], count) for (author_id, count), i in zip(ranked, positions)]
+
+
+def _magazine_categories(snapshot):
+    """Dictionary-encode the magazine categories: (codes per magazine, category names)."""
+    names = []
+    code_of = {}
+    codes = []
+    for category in snapshot.column("magazines", "category"):
+        if category not in code_of:
+            code_of[category] = len(names)
+            names.append(category)
+        codes.append(code_of[category])
+    return codes, names
+
+
+def topic_areas(snapshot):
+    """Return ``{author_id: sorted list of categories written in}`` (Author.topic_areas for all)."""
+    author_ids = snapshot.column("articles", "author_id")
+    magazine_ids = snapshot.column("articles", "magazine_id")
+    if not len(author_ids):
+        return {}
+    codes, names = _magazine_categories(snapshot)
+    areas = defaultdict(list)
+    if numpy is not None:
+        article_codes = numpy.asarray(codes, dtype=numpy.int64)[
+            _index(snapshot.column("magazines", "id"), magazine_ids)
+        ]
+        pairs = numpy.unique(numpy.asarray(author_ids) * len(names) + article_codes)
+        for author_id, code in zip((pairs // len(names)).tolist(), (pairs % len(names)).tolist()):
+            areas[author_id].append(names[code])
+    else:
+        code_of = dict(zip(snapshot.column("magazines", "id"), codes))
+        for author_id, magazine_id in set(zip(author_ids, magazine_ids)):
+            areas[author_id].append(names[code_of[magazine_id]])
+    return {author_id: sorted(set(categories)) for author_id, categories in areas.items()}
+
+
+def magazine_author_counts(snapshot):
+    """Return ``{magazine_id: number of distinct authors}``."""
+    author_ids = snapshot.column("articles", "author_id")
+    magazine_ids = snapshot.column("articles", "magazine_id")
+    if numpy is not None:
+        if not len(magazine_ids):
+            return {}
+        stride = int(numpy.max(author_ids)) + 1
+        pairs = numpy.unique(numpy.asarray(magazine_ids) * stride + numpy.asarray(author_ids))
+        ids, counts = numpy.unique(pairs // stride, return_counts=True)
+        return dict(zip(ids.tolist(), counts.tolist()))
+    return dict(Counter(magazine_id for magazine_id, _ in set(zip(magazine_ids, author_ids))))
+
+
+def multi_author_magazines(snapshot):
+    """Return the ids of magazines with articles by more than one author, ascending."""
+    return sorted(
+        magazine_id for magazine_id, authors in magazine_author_counts(snapshot).items() if authors > 1
+    )
@@ -0,0 +1,39 @@
+from lib.db.connection import shard_count, transaction
+from lib.db.query_cache import clear_query_cache
+
+# Same backfill as lib/db/migrations/0003_aggregates.sql.
+REBUILD_STATEMENTS = (
+    "DELETE FROM author_stats",
+    "DELETE FROM magazine_author_stats",
+    "DELETE FROM magazine_stats",
+    """
+    INSERT INTO author_stats (author_id, article_count)
+    SELECT author_id, COUNT(*) FROM articles GROUP BY author_id
+    """,
+    """
+    INSERT INTO magazine_author_stats (magazine_id, author_id, article_count)
+    SELECT magazine_id, author_id, COUNT(*) FROM articles GROUP BY magazine_id, author_id
+    """,
+    """
+    INSERT INTO magazine_stats (magazine_id, article_count, author_count)
+    SELECT magazine_id, SUM(article_count), COUNT(*) FROM magazine_author_stats GROUP BY magazine_id
+    """,
+)
+
+
+def rebuild_aggregates():
+    """
+    Recompute the summary tables from the articles table in one transaction
+    (per shard, when articles are sharded).
+
+    The triggers keep them current, so this is only needed after bulk
+    surgery with the triggers dropped, or to repair suspected drift.
+    """
+    for shard in range(shard_count()):
+        with transaction(shard) as conn:
+            for statement in REBUILD_STATEMENTS:
+                conn.execute(statement)
+            # Derived data only; nothing cached in-process depends on it.
+            conn.acknowledge_changes()
+    # The stats tables changed without a data version bump; drop what was read from them.
+    clear_query_cache()
@@ -0,0 +1,66 @@
+"""
+Change-data feed over authors, magazines and articles.
+
+Triggers (lib/db/migrations/0006_change_feed.sql) append one entry to the
+changes table for every row inserted, updated or deleted, by any code path
+or process, with a sequence number that only grows. A consumer remembers
+the last ``seq`` it processed and asks for what came after:
+
+    for change in iter_changes(since_seq=last_seq):
+        apply(change)
+        last_seq = change.seq
+
+Sequence numbers are assigned under the database's write lock, so a commit
+never makes a lower seq visible after a higher one. With sharded articles
+each database has its own feed (article changes live with their shard),
+and consumers keep a position per database: ``shard=None`` is the main one.
+"""
+import json
+from collections import namedtuple
+
+from lib.db import queries
+from lib.db.connection import STREAM_BATCH_SIZE, read_cursor, transaction
+
+Change = namedtuple("Change", "seq table op row_id data")
+Change.__doc__ = """One row change. ``data`` is a dict of the new column values, or None for a delete."""
+
+
+def _change(cursor, row):
+    seq, table, op, row_id, data = row
+    return Change(seq, table, op, row_id, json.loads(data) if data is not None else None)
+
+
+def iter_changes(since_seq=0, batch_size=STREAM_BATCH_SIZE, shard=None):
+    """
+    Yield the changes after ``since_seq`` in seq order, ``batch_size`` at a time.
+
+    Each batch is its own short query (keyset pagination on seq), so a slow
+    consumer doesn't hold a read transaction open, and changes committed
+    while iterating are picked up as it reaches them.
+    """
+    while True:
+        with read_cursor(_change, shard) as cursor:
+            batch = cursor.execute(queries.CHANGES_SINCE, (since_seq, batch_size)).fetchall()
+        yield from batch
+        if len(batch) < batch_size:
+            return
+        since_seq = batch[-1].seq
+
+
+def latest_seq(shard=None):
+    """The seq of the newest change, 0 if there has been none."""
+    with read_cursor(shard=shard) as cursor:
+        return cursor.execute(queries.DATA_VERSION).fetchone()[0]
+
+
+def prune_changes(through_seq, shard=None):
+    """
+    Delete changes up to and including ``through_seq`` once every consumer has them.
+
+    Returns the number deleted. Later sequence numbers are unaffected.
+    """
+    with transaction(shard) as conn:
+        deleted = conn.execute(queries.CHANGES_PRUNE, (through_seq,)).rowcount
+        # The feed is not model data; nothing in-process needs invalidating.
+        conn.acknowledge_changes()
+    return deleted
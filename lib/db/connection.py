@@ -1,24 +1,809 @@
+import heapq
+import random
 import sqlite3
-from contextlib import contextmanager
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from itertools import islice
+from pathlib import Path
+
+from lib.db.instrument import ProfiledCursor, profiler
+from lib.db.migrate import migrate
+from lib.db.queries import HOT_QUERIES
 
 DATABASE_PATH = 'articles.db'
 
 DB_NAME = "articles.db"
 
-def get_connection():
-    conn = sqlite3.connect('articles.db')
-    conn.row_factory = sqlite3.Row  # allows access by column name
-    return conn
+POOL_SIZE = 5  # read-only connections; all writes share one writer connection
+SHARDS = 1  # article databases; above 1, articles are partitioned by magazine (see configure())
+POOL_TIMEOUT = 10.0  # seconds to wait for a free connection before giving up
+HEALTH_CHECK_INTERVAL = 30.0  # idle seconds after which a connection is re-validated
+BUSY_TIMEOUT_MS = 2000  # how long SQLite waits on another process's lock before raising SQLITE_BUSY
+BEGIN_ATTEMPTS = 5  # BEGIN IMMEDIATE tries before "database is locked" reaches the caller
+RETRY_BASE_DELAY = 0.05  # seconds; the backoff cap doubles per attempt, and the sleep is random below it
+RETRY_MAX_DELAY = 1.0
+LOCK_WAIT_THRESHOLD = 0.005  # a BEGIN slower than this waited in SQLite's busy handler, not just for the GIL
+
+# Applied to every new connection; see lib/db/schema.sql.
+CONNECTION_PRAGMAS = (
+    "journal_mode = WAL",  # readers don't block the writer (persists in the file)
+    "synchronous = NORMAL",  # safe under WAL; fsync at checkpoints instead of every commit
+    "foreign_keys = ON",
+    "cache_size = -16000",  # 16 MB page cache per connection
+    "mmap_size = 268435456",  # memory-map up to 256 MB of the database file
+    "temp_store = MEMORY",  # temp b-trees for DISTINCT/GROUP BY/ORDER BY stay in RAM
+    f"busy_timeout = {BUSY_TIMEOUT_MS}",
+)
+# Applied to read-only connections instead; the writer has already set WAL mode.
+READER_PRAGMAS = (
+    "query_only = ON",
+    "cache_size = -16000",
+    "mmap_size = 268435456",
+    "temp_store = MEMORY",
+    f"busy_timeout = {BUSY_TIMEOUT_MS}",
+)
+# Applied to shard writers: their articles reference authors and magazines
+# that live in the home database, so SQLite can't check those keys.
+SHARD_PRAGMAS = tuple(
+    pragma for pragma in CONNECTION_PRAGMAS if not pragma.startswith("foreign_keys")
+) + ("foreign_keys = OFF",)
+
+BULK_CHUNK_SIZE = 1000  # rows per executemany() batch in the bulk write paths
+STREAM_BATCH_SIZE = 500  # rows per fetchmany() call in the streaming iterators
+IN_CHUNK_SIZE = 512  # ids per "WHERE id IN (...)" query: the largest queries.IN_BUCKETS size
+STATEMENT_CACHE_SIZE = 256  # prepared statements kept per connection (sqlite3 default: 128)
+
+
+class PoolTimeoutError(sqlite3.OperationalError):
+    """Raised when no pooled connection becomes free within the pool timeout."""
+
+
+def is_busy_error(exc):
+    """Whether ``exc`` is SQLite's "database is locked" (SQLITE_BUSY/SQLITE_LOCKED)."""
+    return (
+        isinstance(exc, sqlite3.OperationalError)
+        and not isinstance(exc, PoolTimeoutError)
+        and "locked" in str(exc)
+    )
+
+
+def backoff_delay(attempt):
+    """Seconds to sleep before retry ``attempt`` (1-based): full jitter under a doubling cap."""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1)))
+
+
+class _PoolEntry:
+    """A raw sqlite3 connection plus the bookkeeping the pool needs for it."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.leases = 0
+        self.owner = None
+        self.last_owner = None
+        self.returned_at = time.monotonic()
+        self.seen_changes = 0
+        self.instrumented = False
+
+
+_write_listeners = []
+
+
+def add_write_listener(callback):
+    """
+    Register ``callback()`` to run after unacknowledged writes.
+
+    Model write paths call ``PooledConnection.acknowledge_changes()`` once they
+    have invalidated what they touched; any other change made through a pooled
+    connection (raw SQL, ad-hoc scripts) triggers the listeners so in-process
+    caches can drop what may now be stale.
+    """
+    _write_listeners.append(callback)
+
+
+def _check_changes(entry):
+    total = entry.conn.total_changes
+    if total != entry.seen_changes:
+        entry.seen_changes = total
+        for callback in _write_listeners:
+            callback()
+
+
+class PooledConnection:
+    """
+    A lease on a pooled connection.
+
+    Behaves like a ``sqlite3.Connection`` (attribute access is delegated), but
+    ``close()`` hands the connection back to the pool instead of closing it.
+    A lease that is garbage-collected without being closed is released too.
+    """
+
+    def __init__(self, pool, entry):
+        self._pool = pool
+        self._entry = entry
+
+    @property
+    def raw(self):
+        if self._entry is None:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        return self._entry.conn
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.raw, name)
+
+    def __setattr__(self, name, value):
+        if name.startswith("_"):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self.raw, name, value)
+
+    def cursor(self, factory=None):
+        if factory is None and profiler.enabled:
+            factory = ProfiledCursor
+        return self.raw.cursor(factory) if factory is not None else self.raw.cursor()
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def __enter__(self):
+        self.raw.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return self.raw.__exit__(exc_type, exc, tb)
+
+    def begin(self):
+        """
+        Start a write transaction with BEGIN IMMEDIATE.
+
+        IMMEDIATE takes the write lock up front, so a transaction can't fail
+        halfway through when it first writes. While another process holds
+        the lock SQLite waits up to ``BUSY_TIMEOUT_MS``; if it is still held,
+        the BEGIN is retried after a jittered exponential backoff, up to
+        ``BEGIN_ATTEMPTS`` times, before the error is raised. Nothing has run
+        in the transaction yet, so retrying never repeats work. Waits and
+        retries are counted in the pool's ``stats()``.
+        """
+        attempt = 1
+        while True:
+            start = time.perf_counter()
+            try:
+                self.execute("BEGIN IMMEDIATE")
+            except sqlite3.OperationalError as e:
+                if not is_busy_error(e):
+                    raise
+                self._pool._record_busy(time.perf_counter() - start, attempt < BEGIN_ATTEMPTS)
+                if attempt >= BEGIN_ATTEMPTS:
+                    raise
+                time.sleep(backoff_delay(attempt))
+                attempt += 1
+            else:
+                waited = time.perf_counter() - start
+                if waited >= LOCK_WAIT_THRESHOLD:
+                    self._pool._record_busy(waited, None)
+                return
+
+    def try_begin(self):
+        """
+        Start a write transaction only if the lock is free right now.
+
+        One BEGIN IMMEDIATE with SQLite's busy timeout off and no retry, for
+        optional writes that should be skipped rather than wait. Returns
+        False if another process holds the lock.
+        """
+        busy_timeout = self.execute("PRAGMA busy_timeout").fetchone()[0]
+        self.execute("PRAGMA busy_timeout = 0")
+        try:
+            self.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError as e:
+            if not is_busy_error(e):
+                raise
+            return False
+        finally:
+            self.execute(f"PRAGMA busy_timeout = {int(busy_timeout)}")
+        return True
+
+    def acknowledge_changes(self):
+        """Mark this connection's writes so far as handled by the caller."""
+        entry = self._entry
+        if entry is not None:
+            entry.seen_changes = entry.conn.total_changes
+
+    def close(self):
+        entry, self._entry = self._entry, None
+        if entry is not None:
+            self._pool._release(entry)
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """
+    Bounded pool of SQLite connections with per-thread affinity.
+
+    A thread that already holds a lease gets the same connection back for
+    nested ``connection()`` calls, and a released connection is preferentially
+    handed back to the thread that used it last so its page cache stays warm.
+    At most ``max_size`` connections are open at once; callers block (up to
+    ``timeout`` seconds) when all of them are checked out.
+
+    A ``readonly`` pool opens its connections with ``mode=ro`` and
+    ``query_only``; it never migrates, so the database must already exist.
+    ``pragmas`` overrides the per-connection pragmas.
+    """
+
+    def __init__(self, database_path=DATABASE_PATH, max_size=POOL_SIZE,
+                 timeout=POOL_TIMEOUT, health_check_interval=HEALTH_CHECK_INTERVAL,
+                 readonly=False, pragmas=None):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.database_path = database_path
+        self.max_size = max_size
+        self.readonly = readonly
+        if pragmas is None:
+            pragmas = READER_PRAGMAS if readonly else CONNECTION_PRAGMAS
+        self.pragmas = pragmas
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self._cond = threading.Condition()
+        self._idle = []
+        self._owned = {}
+        self._size = 0
+        self._closed = False
+        self._migrated = False
+        self._stats = {"hits": 0, "misses": 0, "waits": 0, "wait_time": 0.0, "discarded": 0,
+                       "lock_waits": 0, "lock_wait_time": 0.0, "busy_retries": 0, "busy_errors": 0,
+                       "timeouts": 0}
+
+    def _connect(self):
+        if self.readonly:
+            uri = Path(self.database_path).absolute().as_uri() + "?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False,
+                                   cached_statements=STATEMENT_CACHE_SIZE)
+        else:
+            conn = sqlite3.connect(self.database_path, check_same_thread=False,
+                                   cached_statements=STATEMENT_CACHE_SIZE)
+        conn.row_factory = sqlite3.Row  # allows access by column name
+        for pragma in self.pragmas:
+            conn.execute(f"PRAGMA {pragma}")
+        if not self._migrated and not self.readonly:
+            migrate(conn)
+            self._migrated = True
+        self._prepare(conn)
+        return conn
+
+    @staticmethod
+    def _prepare(conn):
+        """Compile the hot model queries into the connection's statement cache."""
+        for sql in HOT_QUERIES:
+            try:
+                # Executing with dummy ids prepares and caches the statement;
+                # no rows are fetched.
+                conn.execute(sql, (0,) * sql.count("?")).close()
+            except sqlite3.Error:
+                pass
+
+    def _is_healthy(self, entry):
+        if time.monotonic() - entry.returned_at < self.health_check_interval:
+            return True
+        try:
+            entry.conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _take_idle(self, ident):
+        """Pop an idle entry, preferring the one this thread used last."""
+        for i, entry in enumerate(self._idle):
+            if entry.last_owner == ident:
+                return self._idle.pop(i)
+        return self._idle.pop()
+
+    def held_by_current_thread(self):
+        """Whether the calling thread already has a lease from this pool."""
+        with self._cond:
+            return threading.get_ident() in self._owned
+
+    def connection(self, timeout=None):
+        """
+        Check out a connection lease for the calling thread.
+
+        ``timeout`` overrides the pool's wait limit; 0 raises PoolTimeoutError
+        at once unless a connection is free.
+        """
+        ident = threading.get_ident()
+        with self._cond:
+            if self._closed:
+                raise sqlite3.ProgrammingError("Connection pool is closed.")
+            entry = self._owned.get(ident)
+            if entry is not None:
+                entry.leases += 1
+                self._stats["hits"] += 1
+            else:
+                entry = self._checkout(ident, self.timeout if timeout is None else timeout)
+        if entry.instrumented != profiler.enabled:
+            profiler.install(entry.conn)
+            entry.instrumented = profiler.enabled
+        _check_changes(entry)
+        return PooledConnection(self, entry)
+
+    def _checkout(self, ident, timeout):
+        """Hand out an idle or new connection, waiting if the pool is full."""
+        entry = None
+        waited_since = None
+        while True:
+            while self._idle:
+                entry = self._take_idle(ident)
+                if self._is_healthy(entry):
+                    self._stats["hits"] += 1
+                    break
+                entry.conn.close()
+                self._size -= 1
+                self._stats["discarded"] += 1
+                entry = None
+            if entry is not None:
+                break
+            if self._size < self.max_size:
+                self._size += 1
+                self._stats["misses"] += 1
+                entry = self._open_reserved()
+                break
+            if waited_since is None:
+                waited_since = time.monotonic()
+                self._stats["waits"] += 1
+            remaining = timeout - (time.monotonic() - waited_since)
+            if remaining <= 0 or not self._cond.wait(remaining):
+                if not self._idle and self._size >= self.max_size:
+                    self._stats["wait_time"] += time.monotonic() - waited_since
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeoutError(
+                        f"No connection available within {timeout}s "
+                        f"(pool size {self.max_size})"
+                    )
+        if waited_since is not None:
+            self._stats["wait_time"] += time.monotonic() - waited_since
+
+        entry.leases = 1
+        entry.owner = ident
+        self._owned[ident] = entry
+        return entry
+
+    def _release(self, entry):
+        _check_changes(entry)
+        with self._cond:
+            entry.leases -= 1
+            if entry.leases > 0:
+                return
+            self._owned.pop(entry.owner, None)
+            entry.last_owner, entry.owner = entry.owner, None
+        # Never hand an open transaction or a caller's row factory to the next lease.
+        try:
+            if entry.conn.in_transaction:
+                entry.conn.rollback()
+            entry.conn.row_factory = sqlite3.Row
+            healthy = True
+        except sqlite3.Error:
+            healthy = False
+        with self._cond:
+            if self._closed or not healthy:
+                entry.conn.close()
+                self._size -= 1
+                if not healthy:
+                    self._stats["discarded"] += 1
+            else:
+                entry.returned_at = time.monotonic()
+                self._idle.append(entry)
+            self._cond.notify()
+
+    def prefill(self, count=None):
+        """
+        Open (and prepare) up to ``count`` idle connections ahead of traffic.
+
+        Defaults to the full pool size. Returns the number opened.
+        """
+        count = self.max_size if count is None else count
+        opened = 0
+        with self._cond:
+            while self._size < min(count, self.max_size) and not self._closed:
+                self._size += 1
+                entry = self._open_reserved()
+                if self._closed:
+                    entry.conn.close()
+                    self._size -= 1
+                    break
+                self._idle.append(entry)
+                opened += 1
+                self._cond.notify()
+        return opened
+
+    def _open_reserved(self):
+        """
+        Open a connection for a slot already counted in ``_size``; call with ``_cond`` held.
+
+        The lock is released while connecting (on first open that includes
+        migrating and preparing the hot queries), so checkouts and releases
+        on this pool don't stall behind it. A failed connect gives the slot
+        back.
+        """
+        self._cond.release()
+        try:
+            conn = self._connect()
+        except BaseException:
+            self._cond.acquire()
+            self._size -= 1
+            self._cond.notify()
+            raise
+        self._cond.acquire()
+        return _PoolEntry(conn)
+
+    def _record_busy(self, waited, retrying):
+        """
+        Count a BEGIN that waited on another process's lock.
+
+        ``retrying`` is None if it then got the lock, True if it failed and
+        will be retried, False if it failed for good.
+        """
+        with self._cond:
+            self._stats["lock_waits"] += 1
+            self._stats["lock_wait_time"] += waited
+            if retrying is not None:
+                self._stats["busy_retries" if retrying else "busy_errors"] += 1
+
+    def stats(self):
+        """
+        Return a snapshot of pool counters for sizing the pool.
+
+        ``waits``/``wait_time`` are threads of this process waiting for a
+        connection and ``timeouts`` those that gave up; ``lock_waits``/``lock_wait_time`` are BEGINs waiting for
+        another process's write lock, ``busy_retries`` those that timed out and
+        were retried and ``busy_errors`` those that gave up (see ``begin()``).
+        """
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update(size=self._size, idle=len(self._idle),
+                         in_use=self._size - len(self._idle), max_size=self.max_size)
+        return stats
+
+    def close(self):
+        """Close idle connections; checked-out ones are closed when released."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for entry in idle:
+            entry.conn.close()
+
+
+_pool = None
+_read_pool = None
+_shard_pools = {}  # shard -> (writer pool, reader pool), only when SHARDS > 1
+_fan_out_executor = None
+_pool_lock = threading.Lock()
+
+
+def configure(database_path=None, pool_size=None, timeout=None, shards=None):
+    """
+    Point the data layer at a database, resize the reader pool, or shard it.
+
+    With ``shards`` above 1, articles are partitioned by magazine across that
+    many SQLite files next to the database (see ``shard_path()``), each with
+    its own writer, so ingest into different shards doesn't serialize on one
+    lock. Authors and magazines stay in the database itself. Shards start
+    empty; articles already in the database are not moved.
+
+    The current pools are closed and new ones are created lazily on the next
+    ``get_connection()`` / ``get_read_connection()`` call, and write
+    listeners run, since every cached row may now be from another database.
+    """
+    global DATABASE_PATH, POOL_SIZE, POOL_TIMEOUT, SHARDS, _pool, _read_pool, _fan_out_executor
+    if shards is not None and shards < 1:
+        raise ValueError("shards must be at least 1")
+    with _pool_lock:
+        if database_path is not None:
+            DATABASE_PATH = database_path
+        if pool_size is not None:
+            POOL_SIZE = pool_size
+        if timeout is not None:
+            POOL_TIMEOUT = timeout
+        if shards is not None:
+            SHARDS = shards
+        old = [_pool, _read_pool]
+        for pools in _shard_pools.values():
+            old.extend(pools)
+        executor = _fan_out_executor
+        _pool = _read_pool = _fan_out_executor = None
+        _shard_pools.clear()
+    for pool in old:
+        if pool is not None:
+            pool.close()
+    if executor is not None:
+        executor.shutdown(wait=False)
+    for callback in _write_listeners:
+        callback()
+
+
+def shard_count():
+    """Number of article shards; 1 means articles live in the main database."""
+    return SHARDS
+
+
+def shard_for(magazine_id):
+    """The shard holding ``magazine_id``'s articles (always 0, for any value, when unsharded)."""
+    if SHARDS == 1:
+        return 0
+    return magazine_id % SHARDS
+
+
+def shard_of_article(article_id):
+    """
+    The shard holding article ``article_id``.
+
+    Shard ``k`` of ``n`` only assigns ids with ``(id - 1) % n == k`` (see
+    ``article_id_params()``), so an id is enough to find its article.
+    Unsharded it is always 0, so bad ids reach SQLite as before.
+    """
+    if SHARDS == 1:
+        return 0
+    return (article_id - 1) % SHARDS
+
+
+def article_id_params(shard):
+    """Leading parameters of queries.ARTICLE_INSERT_SHARDED for ``shard``."""
+    return (shard + 1 - SHARDS, SHARDS)
+
+
+def shard_path(shard):
+    """File of article shard ``shard``: ``articles.db`` -> ``articles.shard0.db``."""
+    path = Path(DATABASE_PATH)
+    return str(path.with_name(f"{path.stem}.shard{shard}{path.suffix}"))
+
+
+def require_unsharded(feature):
+    """Raise RuntimeError when sharded: ``feature`` reads or writes articles in one database."""
+    if SHARDS > 1:
+        raise RuntimeError(f"{feature} is not supported with sharded articles.")
+
+
+def _shard_pool_pair(shard):
+    if not 0 <= shard < SHARDS:
+        raise ValueError(f"No shard {shard}; there are {SHARDS}.")
+    with _pool_lock:
+        pools = _shard_pools.get(shard)
+        if pools is None:
+            writer = ConnectionPool(shard_path(shard), 1, POOL_TIMEOUT, pragmas=SHARD_PRAGMAS)
+            pools = _shard_pools[shard] = (writer, None)
+        if pools[1] is not None:
+            return pools
+    pools[0].prefill(1)  # create and migrate the shard before a reader opens it
+    with _pool_lock:
+        writer, readers = _shard_pools.get(shard, pools)
+        if readers is None:
+            readers = ConnectionPool(shard_path(shard), POOL_SIZE, POOL_TIMEOUT, readonly=True)
+            _shard_pools[shard] = (writer, readers)
+        return writer, readers
+
+
+def get_pool(shard=None):
+    """
+    Return the writer pool: a single connection, so writes are serialized in-process.
+
+    ``shard`` selects an article shard's writer; unsharded, every shard is
+    the main database.
+    """
+    global _pool
+    if shard is not None and SHARDS > 1:
+        return _shard_pool_pair(shard)[0]
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(DATABASE_PATH, 1, POOL_TIMEOUT)
+        return _pool
+
+
+def get_read_pool(shard=None):
+    """Return the pool of ``POOL_SIZE`` read-only connections (of ``shard``, if given)."""
+    global _read_pool
+    if shard is not None and SHARDS > 1:
+        return _shard_pool_pair(shard)[1]
+    with _pool_lock:
+        if _read_pool is not None:
+            return _read_pool
+    # Readers can't create or migrate the database; the writer's first connection does.
+    get_pool().prefill(1)
+    with _pool_lock:
+        if _read_pool is None:
+            _read_pool = ConnectionPool(DATABASE_PATH, POOL_SIZE, POOL_TIMEOUT, readonly=True)
+        return _read_pool
+
+
+def pool_stats():
+    """Return hit/miss/wait counters for the writer and reader pools (and each shard's)."""
+    stats = {"writer": get_pool().stats(), "readers": get_read_pool().stats()}
+    if SHARDS > 1:
+        stats["shards"] = [
+            {"writer": get_pool(shard).stats(), "readers": get_read_pool(shard).stats()}
+            for shard in range(SHARDS)
+        ]
+    return stats
+
+
+def fan_out(fn):
+    """
+    Return ``[fn(shard) for shard in range(shard_count())]``.
+
+    Sharded, the calls run in parallel threads, one per shard. ``fn`` should
+    only read: a worker thread doesn't see writes the caller has not yet
+    committed.
+    """
+    global _fan_out_executor
+    if SHARDS == 1:
+        return [fn(0)]
+    with _pool_lock:
+        if _fan_out_executor is None:
+            _fan_out_executor = ThreadPoolExecutor(SHARDS, thread_name_prefix="shard")
+        executor = _fan_out_executor
+    return list(executor.map(fn, range(SHARDS)))
+
+
+def merge_by_id(lists, limit=None):
+    """Merge per-shard lists of models already in id order, keeping the first ``limit``."""
+    merged = heapq.merge(*lists, key=lambda obj: obj.id)
+    return list(merged if limit is None else islice(merged, limit))
+
+
+def chunked(iterable, size):
+    """Yield lists of up to ``size`` items without materializing ``iterable``."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def inserted_ids(conn, count, step=1):
+    """
+    Return the rowids assigned by an executemany() INSERT of ``count`` rows.
+
+    Inside a write transaction no other connection can insert, and SQLite
+    gives each new row max(rowid) + 1, so the ids form the contiguous range
+    ending at last_insert_rowid(). Sharded article inserts assign
+    max(id) + ``step`` instead.
+    """
+    if not count:
+        return []
+    last = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+    return list(range(last - (count - 1) * step, last + 1, step))
+
+
+def iter_rows(sql, params=(), batch_size=STREAM_BATCH_SIZE, row_factory=None, shard=None):
+    """
+    Yield the rows of ``sql`` lazily, ``batch_size`` at a time via fetchmany.
+
+    ``row_factory`` overrides the connection's sqlite3.Row factory for this
+    query, e.g. a model's ``from_row``. The pooled read connection is held
+    until the generator is exhausted or closed.
+    """
+    conn = get_read_connection(shard)
+    try:
+        cursor = conn.cursor()
+        if row_factory is not None:
+            cursor.row_factory = row_factory
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield from rows
+    finally:
+        conn.close()
+
+
+def warm_up(connections=None):
+    """
+    Open pooled connections and prepare the hot model queries on each.
+
+    Call at startup so the first requests don't pay for connecting,
+    migrating and compiling SQL. ``connections`` caps the number of
+    readers opened. Returns the number of connections opened.
+    """
+    opened = get_pool().prefill() + get_read_pool().prefill(connections)
+    if SHARDS > 1:
+        for shard in range(SHARDS):
+            opened += get_pool(shard).prefill() + get_read_pool(shard).prefill(connections)
+    return opened
+
+
+def get_connection(shard=None):
+    """Lease the writer connection (of article ``shard``); use this for anything that writes."""
+    return get_pool(shard).connection()
+
+
+def get_read_connection(shard=None):
+    """
+    Lease a read-only connection (to article ``shard``, if given).
+
+    Under WAL readers see every committed write and are never blocked by an
+    open write transaction. A thread that is already holding the writer
+    (e.g. inside ``transaction()``) gets the writer back instead, so it
+    reads its own uncommitted changes.
+    """
+    writer = get_pool(shard)
+    if writer.held_by_current_thread():
+        return writer.connection()
+    return get_read_pool(shard).connection()
+
 
 @contextmanager
-def transaction():
-    conn = get_connection()
+def read_cursor(row_factory=None, shard=None):
+    """
+    Yield a cursor on a leased read connection; the lease ends with the block.
+
+    ``row_factory`` (e.g. a model's ``from_row``) applies to this cursor only.
+    Model read paths go through here so a connection can't outlive its query.
+    """
+    conn = get_read_connection(shard)
     try:
-        conn.execute("BEGIN")
+        cursor = conn.cursor()
+        if row_factory is not None:
+            cursor.row_factory = row_factory
+        yield cursor
+    finally:
+        conn.close()
+
+
+@contextmanager
+def transaction(shard=None):
+    """
+    Yield the writer connection inside a transaction, committing on success.
+
+    The transaction starts with ``PooledConnection.begin()``, which retries
+    while another process holds the database lock. Model writes all go
+    through here (or ``begin()`` directly, in a Session).
+    """
+    conn = get_connection(shard)
+    start = time.perf_counter()
+    committed = False
+    try:
+        conn.begin()
         yield conn
         conn.commit()
+        committed = True
     except Exception as e:
         conn.rollback()
         raise e
     finally:
         conn.close()
+        if profiler.enabled:
+            profiler.record_transaction(time.perf_counter() - start, committed)
+
+
+@contextmanager
+def shard_transactions(shards):
+    """
+    Yield ``{shard: connection}`` with a transaction open on each of ``shards``.
+
+    ``None`` among ``shards`` is the main database. An exception in the
+    block rolls all of them back, but each database commits separately, so
+    a failure while committing can leave others committed. Unsharded, they
+    are all one ``transaction()``.
+    """
+    with ExitStack() as stack:
+        conns = {}
+        by_pool = {}
+        for shard in sorted(set(shards), key=lambda shard: -1 if shard is None else shard):
+            pool = get_pool(shard)
+            if pool not in by_pool:
+                by_pool[pool] = stack.enter_context(transaction(shard))
+            conns[shard] = by_pool[pool]
+        yield conns
@@ -0,0 +1,290 @@
+"""
+Query instrumentation and slow-query profiling.
+
+When enabled, every statement run through a pooled connection records its
+latency (execute plus fetches), rows returned and the model method that
+issued it, aggregated per (statement, caller). sqlite3's trace callback
+counts every statement SQLite runs (including trigger bodies) and its
+progress handler counts virtual-machine steps, a CPU-cost measure that is
+independent of machine load. Statements slower than the threshold are
+kept, with their EXPLAIN QUERY PLAN, in a bounded slow-query log and
+reported through the ``lib.db.slow_query`` logger.
+
+    enable_instrumentation(slow_query_ms=50)
+    ...
+    for row in query_stats()[:10]:
+        print(row["caller"], row["total_ms"], row["sql"])
+"""
+import logging
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+
+SLOW_QUERY_MS = 100.0
+SLOW_LOG_SIZE = 100  # most recent slow queries kept in memory
+PROGRESS_INTERVAL = 1000  # VM instructions between progress-handler calls
+
+slow_query_logger = logging.getLogger("lib.db.slow_query")
+
+_MODELS_DIR = "lib/models/"
+_EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+
+def normalize_sql(sql):
+    """Collapse whitespace and variable-length IN lists so similar statements aggregate."""
+    sql = " ".join(sql.split())
+    return re.sub(r"\(\?(?:\s*,\s*\?)+\)", "(?, ...)", sql)
+
+
+def _caller():
+    """Return the innermost model method on the stack, e.g. 'Author.find_by_id'."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        if _MODELS_DIR in frame.f_code.co_filename.replace("\\", "/"):
+            # Helpers nested in a method (e.g. what it fans out to shards) count as the method.
+            return frame.f_code.co_qualname.split(".<locals>", 1)[0]
+        frame = frame.f_back
+    return None
+
+
+class QueryProfiler:
+    """Aggregated per-statement counters plus the slow-query log."""
+
+    def __init__(self):
+        self.enabled = False
+        self.slow_query_ms = SLOW_QUERY_MS
+        self.explain = True
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._slow = deque(maxlen=SLOW_LOG_SIZE)
+        self._vm_ticks = {}
+        # statements_traced includes each statement run inside fired triggers.
+        self._counters = {"statements_traced": 0, "transactions": 0, "rollbacks": 0,
+                          "transaction_time": 0.0}
+
+    # -- sqlite3 callbacks -------------------------------------------------
+
+    def install(self, conn):
+        """Attach (or, when disabled, detach) the trace and progress callbacks."""
+        key = id(conn)
+        if not self.enabled:
+            conn.set_trace_callback(None)
+            conn.set_progress_handler(None, 0)
+            self._vm_ticks.pop(key, None)
+            return
+
+        def trace(statement):
+            with self._lock:
+                self._counters["statements_traced"] += 1
+
+        def progress():
+            self._vm_ticks[key] = self._vm_ticks.get(key, 0) + 1
+            return 0
+
+        conn.set_trace_callback(trace)
+        conn.set_progress_handler(progress, PROGRESS_INTERVAL)
+
+    def vm_steps(self, conn):
+        return self._vm_ticks.get(id(conn), 0) * PROGRESS_INTERVAL
+
+    # -- recording ---------------------------------------------------------
+
+    def record(self, conn, sql, params, caller, elapsed, rows, vm_steps):
+        key = (normalize_sql(sql), caller)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = {"count": 0, "total": 0.0, "max": 0.0,
+                                            "rows": 0, "vm_steps": 0}
+            stats["count"] += 1
+            stats["total"] += elapsed
+            stats["max"] = max(stats["max"], elapsed)
+            stats["rows"] += rows
+            stats["vm_steps"] += vm_steps
+        if elapsed * 1000 >= self.slow_query_ms:
+            self._record_slow(conn, sql, params, caller, elapsed, rows)
+
+    def _record_slow(self, conn, sql, params, caller, elapsed, rows):
+        plan = None
+        if self.explain and sql.lstrip().upper().startswith(_EXPLAINABLE) and params is not None:
+            try:
+                plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+            except sqlite3.Error:
+                pass
+        entry = {"sql": normalize_sql(sql), "caller": caller, "ms": round(elapsed * 1000, 3),
+                 "rows": rows, "plan": plan, "at": time.time()}
+        with self._lock:
+            self._slow.append(entry)
+        slow_query_logger.warning(
+            "slow query %.1fms in %s (%d rows): %s plan=%s",
+            entry["ms"], caller or "<unknown>", rows, entry["sql"], plan,
+        )
+
+    def record_transaction(self, elapsed, committed):
+        with self._lock:
+            self._counters["transactions"] += 1
+            self._counters["transaction_time"] += elapsed
+            if not committed:
+                self._counters["rollbacks"] += 1
+
+    # -- reporting ---------------------------------------------------------
+
+    def stats(self):
+        """Per (statement, caller) counters, hottest (by total time) first."""
+        with self._lock:
+            items = list(self._stats.items())
+        report = [
+            {
+                "sql": sql,
+                "caller": caller,
+                "count": s["count"],
+                "total_ms": round(s["total"] * 1000, 3),
+                "avg_ms": round(s["total"] * 1000 / s["count"], 3),
+                "max_ms": round(s["max"] * 1000, 3),
+                "rows": s["rows"],
+                "vm_steps": s["vm_steps"],
+            }
+            for (sql, caller), s in items
+        ]
+        report.sort(key=lambda row: row["total_ms"], reverse=True)
+        return report
+
+    def counters(self):
+        with self._lock:
+            return dict(self._counters)
+
+    def slow_queries(self):
+        with self._lock:
+            return list(self._slow)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._slow.clear()
+            for name in self._counters:
+                self._counters[name] = 0
+
+
+profiler = QueryProfiler()
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """
+    Cursor that times each statement from execute() until its rows are consumed.
+
+    A statement is finalized on the next execute, when a fetch comes back
+    short, on close(), or when the cursor is garbage-collected.
+    """
+
+    _pending = None
+
+    def _start(self, sql, params):
+        self._finish()
+        self._pending = {
+            "sql": sql,
+            "params": params,
+            "caller": _caller(),
+            "elapsed": 0.0,
+            "rows": 0,
+            "vm_start": profiler.vm_steps(self.connection),
+        }
+
+    def _finish(self):
+        pending, self._pending = self._pending, None
+        if pending is None:
+            return
+        rows = pending["rows"] or max(self.rowcount, 0)
+        vm_steps = profiler.vm_steps(self.connection) - pending["vm_start"]
+        profiler.record(self.connection, pending["sql"], pending["params"], pending["caller"],
+                        pending["elapsed"], rows, vm_steps)
+
+    def _timed(self, method, *args):
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            if self._pending is not None:
+                self._pending["elapsed"] += time.perf_counter() - start
+
+    def execute(self, sql, parameters=()):
+        self._start(sql, parameters)
+        self._timed(super().execute, sql, parameters)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._start(sql, None)
+        self._timed(super().executemany, sql, seq_of_parameters)
+        return self
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if self._pending is not None:
+            if row is None:
+                self._finish()
+            else:
+                self._pending["rows"] += 1
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        rows = self._timed(super().fetchmany, size)
+        if self._pending is not None:
+            self._pending["rows"] += len(rows)
+            if len(rows) < size:
+                self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        if self._pending is not None:
+            self._pending["rows"] += len(rows)
+            self._finish()
+        return rows
+
+    def __next__(self):
+        row = self.fetchone()
+        if row is None:
+            raise StopIteration
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+
+def enable_instrumentation(slow_query_ms=None, explain=True):
+    """
+    Start recording query timings for every pooled connection.
+
+    ``slow_query_ms`` sets the slow-query log threshold; ``explain`` controls
+    whether slow statements get an EXPLAIN QUERY PLAN attached.
+    """
+    if slow_query_ms is not None:
+        profiler.slow_query_ms = slow_query_ms
+    profiler.explain = explain
+    profiler.enabled = True
+
+
+def disable_instrumentation():
+    profiler.enabled = False
+
+
+def query_stats():
+    return profiler.stats()
+
+
+def slow_queries():
+    return profiler.slow_queries()
+
+
+def reset_query_stats():
+    profiler.reset()
@@ -0,0 +1,75 @@
+"""
+Versioned schema migrations.
+
+Version 1 is lib/db/schema.sql; later versions are ``NNNN_description.sql``
+files in lib/db/migrations/. The applied version is tracked in SQLite's
+``PRAGMA user_version``, and each migration runs in its own
+``BEGIN IMMEDIATE`` transaction so concurrent processes apply it only once.
+"""
+import os
+import re
+import sqlite3
+
+DB_DIR = os.path.dirname(os.path.abspath(__file__))
+SCHEMA_PATH = os.path.join(DB_DIR, "schema.sql")
+MIGRATIONS_DIR = os.path.join(DB_DIR, "migrations")
+
+
+def migrations():
+    """Return ``[(version, path), ...]`` for every known migration, in order."""
+    found = [(1, SCHEMA_PATH)]
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        match = re.match(r"(\d+)_\w+\.sql$", filename)
+        if match:
+            found.append((int(match.group(1)), os.path.join(MIGRATIONS_DIR, filename)))
+    return found
+
+
+def latest_version():
+    return migrations()[-1][0]
+
+
+def _statements(script):
+    """Split a SQL script into complete statements (trigger bodies included)."""
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            if statement.strip():
+                yield statement
+            statement = ""
+    if statement.strip() and not statement.lstrip().startswith("--"):
+        yield statement
+
+
+def current_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn, target=None):
+    """
+    Apply pending migrations up to ``target`` (default: the latest).
+
+    Returns the list of versions that were applied.
+    """
+    applied = []
+    for version, path in migrations():
+        if target is not None and version > target:
+            break
+        if current_version(conn) >= version:
+            continue
+        with open(path) as f:
+            script = f.read()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have migrated while we waited for the lock.
+            if current_version(conn) < version:
+                for statement in _statements(script):
+                    conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {version:d}")
+                applied.append(version)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return applied
@@ -0,0 +1,5 @@
+-- Single-column indexes whose implicit rowid suffix lets
+-- "WHERE author_id = ? AND id > ? ORDER BY id LIMIT ?" (keyset pagination and
+-- the streaming iterators) seek straight to the page without a sort.
+CREATE INDEX IF NOT EXISTS idx_articles_author_id ON articles(author_id);
+CREATE INDEX IF NOT EXISTS idx_articles_magazine_id ON articles(magazine_id);
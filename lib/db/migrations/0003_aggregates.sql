@@ -0,0 +1,102 @@
+-- Summary tables behind Author.top_author(), Magazine.article_counts() and
+-- Magazine.magazines_with_multiple_authors(), kept current by triggers on
+-- articles so every write path (save, bulk, transactional helpers, raw SQL)
+-- maintains them. Rows are removed when their count drops to zero.
+-- lib/db/aggregates.py can rebuild them from scratch.
+
+CREATE TABLE IF NOT EXISTS author_stats (
+    author_id INTEGER PRIMARY KEY,
+    article_count INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_author_stats_article_count ON author_stats(article_count);
+
+CREATE TABLE IF NOT EXISTS magazine_stats (
+    magazine_id INTEGER PRIMARY KEY,
+    article_count INTEGER NOT NULL,
+    author_count INTEGER NOT NULL
+);
+
+-- Per (magazine, author) article counts, so distinct-author counts can be
+-- maintained incrementally.
+CREATE TABLE IF NOT EXISTS magazine_author_stats (
+    magazine_id INTEGER NOT NULL,
+    author_id INTEGER NOT NULL,
+    article_count INTEGER NOT NULL,
+    PRIMARY KEY (magazine_id, author_id)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS articles_stats_insert AFTER INSERT ON articles
+BEGIN
+    INSERT INTO author_stats (author_id, article_count) VALUES (NEW.author_id, 1)
+        ON CONFLICT (author_id) DO UPDATE SET article_count = article_count + 1;
+    INSERT INTO magazine_stats (magazine_id, article_count, author_count) VALUES (NEW.magazine_id, 1, 0)
+        ON CONFLICT (magazine_id) DO UPDATE SET article_count = article_count + 1;
+    UPDATE magazine_stats SET author_count = author_count + 1
+        WHERE magazine_id = NEW.magazine_id
+        AND NOT EXISTS (
+            SELECT 1 FROM magazine_author_stats
+            WHERE magazine_id = NEW.magazine_id AND author_id = NEW.author_id
+        );
+    INSERT INTO magazine_author_stats (magazine_id, author_id, article_count)
+        VALUES (NEW.magazine_id, NEW.author_id, 1)
+        ON CONFLICT (magazine_id, author_id) DO UPDATE SET article_count = article_count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS articles_stats_delete AFTER DELETE ON articles
+BEGIN
+    UPDATE author_stats SET article_count = article_count - 1 WHERE author_id = OLD.author_id;
+    DELETE FROM author_stats WHERE author_id = OLD.author_id AND article_count <= 0;
+    UPDATE magazine_author_stats SET article_count = article_count - 1
+        WHERE magazine_id = OLD.magazine_id AND author_id = OLD.author_id;
+    UPDATE magazine_stats SET
+        article_count = article_count - 1,
+        author_count = author_count - (
+            SELECT COUNT(*) FROM magazine_author_stats
+            WHERE magazine_id = OLD.magazine_id AND author_id = OLD.author_id AND article_count <= 0
+        )
+        WHERE magazine_id = OLD.magazine_id;
+    DELETE FROM magazine_author_stats
+        WHERE magazine_id = OLD.magazine_id AND author_id = OLD.author_id AND article_count <= 0;
+    DELETE FROM magazine_stats WHERE magazine_id = OLD.magazine_id AND article_count <= 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS articles_stats_update AFTER UPDATE OF author_id, magazine_id ON articles
+WHEN OLD.author_id IS NOT NEW.author_id OR OLD.magazine_id IS NOT NEW.magazine_id
+BEGIN
+    UPDATE author_stats SET article_count = article_count - 1 WHERE author_id = OLD.author_id;
+    DELETE FROM author_stats WHERE author_id = OLD.author_id AND article_count <= 0;
+    UPDATE magazine_author_stats SET article_count = article_count - 1
+        WHERE magazine_id = OLD.magazine_id AND author_id = OLD.author_id;
+    UPDATE magazine_stats SET
+        article_count = article_count - 1,
+        author_count = author_count - (
+            SELECT COUNT(*) FROM magazine_author_stats
+            WHERE magazine_id = OLD.magazine_id AND author_id = OLD.author_id AND article_count <= 0
+        )
+        WHERE magazine_id = OLD.magazine_id;
+    DELETE FROM magazine_author_stats
+        WHERE magazine_id = OLD.magazine_id AND author_id = OLD.author_id AND article_count <= 0;
+    DELETE FROM magazine_stats WHERE magazine_id = OLD.magazine_id AND article_count <= 0;
+
+    INSERT INTO author_stats (author_id, article_count) VALUES (NEW.author_id, 1)
+        ON CONFLICT (author_id) DO UPDATE SET article_count = article_count + 1;
+    INSERT INTO magazine_stats (magazine_id, article_count, author_count) VALUES (NEW.magazine_id, 1, 0)
+        ON CONFLICT (magazine_id) DO UPDATE SET article_count = article_count + 1;
+    UPDATE magazine_stats SET author_count = author_count + 1
+        WHERE magazine_id = NEW.magazine_id
+        AND NOT EXISTS (
+            SELECT 1 FROM magazine_author_stats
+            WHERE magazine_id = NEW.magazine_id AND author_id = NEW.author_id
+        );
+    INSERT INTO magazine_author_stats (magazine_id, author_id, article_count)
+        VALUES (NEW.magazine_id, NEW.author_id, 1)
+        ON CONFLICT (magazine_id, author_id) DO UPDATE SET article_count = article_count + 1;
+END;
+
+-- Backfill from existing articles.
+INSERT INTO author_stats (author_id, article_count)
+    SELECT author_id, COUNT(*) FROM articles GROUP BY author_id;
+INSERT INTO magazine_author_stats (magazine_id, author_id, article_count)
+    SELECT magazine_id, author_id, COUNT(*) FROM articles GROUP BY magazine_id, author_id;
+INSERT INTO magazine_stats (magazine_id, article_count, author_count)
+    SELECT magazine_id, SUM(article_count), COUNT(*) FROM magazine_author_stats GROUP BY magazine_id;
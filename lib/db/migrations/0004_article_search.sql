@@ -0,0 +1,31 @@
+-- Full-text index over article titles for Article.search(). It is an
+-- external-content FTS5 table (the titles are stored once, in articles),
+-- kept in sync by triggers so every write path updates it. prefix='2 3'
+-- adds prefix indexes so short "term*" queries don't scan the term list.
+
+CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+    title,
+    content = 'articles',
+    content_rowid = 'id',
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS articles_fts_insert AFTER INSERT ON articles
+BEGIN
+    INSERT INTO articles_fts (rowid, title) VALUES (NEW.id, NEW.title);
+END;
+
+CREATE TRIGGER IF NOT EXISTS articles_fts_delete AFTER DELETE ON articles
+BEGIN
+    INSERT INTO articles_fts (articles_fts, rowid, title) VALUES ('delete', OLD.id, OLD.title);
+END;
+
+CREATE TRIGGER IF NOT EXISTS articles_fts_update AFTER UPDATE OF title ON articles
+BEGIN
+    INSERT INTO articles_fts (articles_fts, rowid, title) VALUES ('delete', OLD.id, OLD.title);
+    INSERT INTO articles_fts (rowid, title) VALUES (NEW.id, NEW.title);
+END;
+
+-- Index existing articles.
+INSERT INTO articles_fts (articles_fts) VALUES ('rebuild');
@@ -0,0 +1,62 @@
+-- Cross-process cache for the aggregate model queries (lib/db/query_cache.py).
+-- data_version holds one counter that triggers bump on every write to the
+-- tables the cached queries read, whichever process or code path makes it.
+-- query_cache rows are only served while their version is still current.
+
+CREATE TABLE IF NOT EXISTS data_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO data_version (id, version) VALUES (1, 0);
+
+CREATE TABLE IF NOT EXISTS query_cache (
+    key TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    columns TEXT NOT NULL,  -- JSON array of column names
+    rows TEXT NOT NULL      -- JSON array of row arrays
+);
+
+CREATE TRIGGER IF NOT EXISTS authors_version_insert AFTER INSERT ON authors
+BEGIN
+    UPDATE data_version SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS authors_version_update AFTER UPDATE ON authors
+BEGIN
+    UPDATE data_version SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS authors_version_delete AFTER DELETE ON authors
+BEGIN
+    UPDATE data_version SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS magazines_version_insert AFTER INSERT ON magazines
+BEGIN
+    UPDATE data_version SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS magazines_version_update AFTER UPDATE ON magazines
+BEGIN
+    UPDATE data_version SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS magazines_version_delete AFTER DELETE ON magazines
+BEGIN
+    UPDATE data_version SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS articles_version_insert AFTER INSERT ON articles
+BEGIN
+    UPDATE data_version SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS articles_version_update AFTER UPDATE ON articles
+BEGIN
+    UPDATE data_version SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS articles_version_delete AFTER DELETE ON articles
+BEGIN
+    UPDATE data_version SET version = version + 1;
+END;
@@ -0,0 +1,89 @@
+-- Change-data feed (lib/db/changes.py). Triggers log every insert, update
+-- and delete of authors, magazines and articles with a sequence number
+-- that only grows (AUTOINCREMENT never reuses one, even after pruning), so
+-- consumers can sync incrementally from the last seq they saw.
+--
+-- The highest seq also replaces data_version from 0005 as the version the
+-- aggregate cache checks, so each row write fires one trigger, not two.
+
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_name TEXT NOT NULL,
+    op TEXT NOT NULL,     -- 'insert', 'update' or 'delete'
+    row_id INTEGER NOT NULL,
+    data TEXT             -- JSON object of the new column values; NULL for deletes
+);
+
+DROP TRIGGER IF EXISTS authors_version_insert;
+DROP TRIGGER IF EXISTS authors_version_update;
+DROP TRIGGER IF EXISTS authors_version_delete;
+DROP TRIGGER IF EXISTS magazines_version_insert;
+DROP TRIGGER IF EXISTS magazines_version_update;
+DROP TRIGGER IF EXISTS magazines_version_delete;
+DROP TRIGGER IF EXISTS articles_version_insert;
+DROP TRIGGER IF EXISTS articles_version_update;
+DROP TRIGGER IF EXISTS articles_version_delete;
+
+DROP TABLE IF EXISTS data_version;
+
+-- Entries are tagged with the old counter, which the new seq starts below:
+-- kept, they would block newer stores and be served once seq caught up.
+DELETE FROM query_cache;
+
+CREATE TRIGGER IF NOT EXISTS authors_changes_insert AFTER INSERT ON authors
+BEGIN
+    INSERT INTO changes (table_name, op, row_id, data)
+        VALUES ('authors', 'insert', NEW.id, json_object('name', NEW.name));
+END;
+
+CREATE TRIGGER IF NOT EXISTS authors_changes_update AFTER UPDATE ON authors
+BEGIN
+    INSERT INTO changes (table_name, op, row_id, data)
+        VALUES ('authors', 'update', NEW.id, json_object('name', NEW.name));
+END;
+
+CREATE TRIGGER IF NOT EXISTS authors_changes_delete AFTER DELETE ON authors
+BEGIN
+    INSERT INTO changes (table_name, op, row_id, data)
+        VALUES ('authors', 'delete', OLD.id, NULL);
+END;
+
+CREATE TRIGGER IF NOT EXISTS magazines_changes_insert AFTER INSERT ON magazines
+BEGIN
+    INSERT INTO changes (table_name, op, row_id, data)
+        VALUES ('magazines', 'insert', NEW.id, json_object('name', NEW.name, 'category', NEW.category));
+END;
+
+CREATE TRIGGER IF NOT EXISTS magazines_changes_update AFTER UPDATE ON magazines
+BEGIN
+    INSERT INTO changes (table_name, op, row_id, data)
+        VALUES ('magazines', 'update', NEW.id, json_object('name', NEW.name, 'category', NEW.category));
+END;
+
+CREATE TRIGGER IF NOT EXISTS magazines_changes_delete AFTER DELETE ON magazines
+BEGIN
+    INSERT INTO changes (table_name, op, row_id, data)
+        VALUES ('magazines', 'delete', OLD.id, NULL);
+END;
+
+CREATE TRIGGER IF NOT EXISTS articles_changes_insert AFTER INSERT ON articles
+BEGIN
+    INSERT INTO changes (table_name, op, row_id, data)
+        VALUES ('articles', 'insert', NEW.id, json_object(
+            'title', NEW.title, 'author_id', NEW.author_id, 'magazine_id', NEW.magazine_id
+        ));
+END;
+
+CREATE TRIGGER IF NOT EXISTS articles_changes_update AFTER UPDATE ON articles
+BEGIN
+    INSERT INTO changes (table_name, op, row_id, data)
+        VALUES ('articles', 'update', NEW.id, json_object(
+            'title', NEW.title, 'author_id', NEW.author_id, 'magazine_id', NEW.magazine_id
+        ));
+END;
+
+CREATE TRIGGER IF NOT EXISTS articles_changes_delete AFTER DELETE ON articles
+BEGIN
+    INSERT INTO changes (table_name, op, row_id, data)
+        VALUES ('articles', 'delete', OLD.id, NULL);
+END;
@@ -0,0 +1,194 @@
+"""
+Every SQL statement the models run, in one place.
+
+Keeping the text of each statement fixed (no per-call string building)
+means sqlite3's per-connection statement cache gets a hit every time a
+pooled connection runs it again. Variable-length ``IN (...)`` lists are
+padded to a few bucket sizes by ``in_list()`` for the same reason, and
+partial UPDATEs come from a fixed table of column subsets.
+``HOT_QUERIES`` is what ``lib.db.connection`` prepares on every new
+connection so first requests don't pay the compile cost.
+"""
+from itertools import combinations
+
+# SELECT lists in the models' __init__ positional order, so rows map
+# straight onto the constructors (see the models' from_row).
+AUTHOR_COLUMNS = "name, id"
+MAGAZINE_COLUMNS = "name, category, id"
+ARTICLE_COLUMNS = "title, author_id, magazine_id, id"
+
+IN_BUCKETS = (1, 4, 16, 64, 256, 512)
+
+
+def _updates(table, columns):
+    """UPDATE statements for every non-empty subset of ``columns``, keyed by the subset."""
+    return {
+        subset: f"UPDATE {table} SET {', '.join(f'{c} = ?' for c in subset)} WHERE id = ?"
+        for n in range(1, len(columns) + 1)
+        for subset in combinations(columns, n)
+    }
+
+
+# -- authors ---------------------------------------------------------------
+
+AUTHOR_INSERT = "INSERT INTO authors (name) VALUES (?)"
+AUTHOR_INSERT_RETURNING_ID = "INSERT INTO authors (name) VALUES (?) RETURNING id"
+# Keyed by the changed columns, in FIELDS order; parameters are their values, then id.
+AUTHOR_UPDATES = _updates("authors", ("name",))
+AUTHOR_BY_ID = f"SELECT {AUTHOR_COLUMNS} FROM authors WHERE id = ?"
+AUTHOR_BY_NAME = f"SELECT {AUTHOR_COLUMNS} FROM authors WHERE name = ? ORDER BY id LIMIT 1"
+AUTHORS_BY_IDS = f"SELECT {AUTHOR_COLUMNS} FROM authors WHERE id IN ({{}})"
+AUTHOR_IDS_BY_NAMES = "SELECT name, MIN(id) FROM authors WHERE name IN ({}) GROUP BY name"
+AUTHOR_NAME_IDS = "SELECT name, MIN(id) FROM authors GROUP BY name"
+TOP_AUTHOR = """
+    SELECT a.name, a.id FROM author_stats s
+    JOIN authors a ON a.id = s.author_id
+    ORDER BY s.article_count DESC, s.author_id
+    LIMIT 1
+"""
+# Per-shard input to Author.top_author() when articles are sharded.
+AUTHOR_ARTICLE_COUNTS = "SELECT author_id, article_count FROM author_stats"
+
+# -- magazines -------------------------------------------------------------
+
+MAGAZINE_INSERT = "INSERT INTO magazines (name, category) VALUES (?, ?)"
+MAGAZINE_INSERT_RETURNING_ID = "INSERT INTO magazines (name, category) VALUES (?, ?) RETURNING id"
+MAGAZINE_UPDATES = _updates("magazines", ("name", "category"))
+MAGAZINE_UPDATE_CATEGORY = "UPDATE magazines SET category = ? WHERE id = ?"
+MAGAZINE_BY_ID = f"SELECT {MAGAZINE_COLUMNS} FROM magazines WHERE id = ?"
+MAGAZINE_BY_NAME = f"SELECT {MAGAZINE_COLUMNS} FROM magazines WHERE name = ? ORDER BY id LIMIT 1"
+MAGAZINES_BY_IDS = f"SELECT {MAGAZINE_COLUMNS} FROM magazines WHERE id IN ({{}})"
+MAGAZINE_IDS_BY_NAMES = "SELECT name, MIN(id) FROM magazines WHERE name IN ({}) GROUP BY name"
+MAGAZINE_NAME_IDS = "SELECT name, MIN(id) FROM magazines GROUP BY name"
+AUTHOR_ROWS_BY_IDS = "SELECT * FROM authors WHERE id IN ({}) ORDER BY id"
+MAGAZINE_CATEGORIES = "SELECT id, category FROM magazines"
+MAGAZINES_WITH_MULTIPLE_AUTHORS = """
+    SELECT m.* FROM magazines m
+    JOIN magazine_stats s ON s.magazine_id = m.id
+    WHERE s.author_count > 1
+"""
+MAGAZINE_ARTICLE_COUNTS = """
+    SELECT m.id, m.name, COALESCE(s.article_count, 0) as article_count
+    FROM magazines m
+    LEFT JOIN magazine_stats s ON s.magazine_id = m.id
+"""
+# The sharded versions of the two above: stats from each shard, rows from the main database.
+MULTI_AUTHOR_MAGAZINE_IDS = "SELECT magazine_id FROM magazine_stats WHERE author_count > 1"
+MAGAZINE_ARTICLE_TOTALS = "SELECT magazine_id, article_count FROM magazine_stats"
+MAGAZINE_ROWS_BY_IDS = "SELECT * FROM magazines WHERE id IN ({})"
+MAGAZINE_NAMES = "SELECT id, name, 0 AS article_count FROM magazines"
+
+# -- author/magazine adjacency ---------------------------------------------
+
+# One row per (author, magazine) pair with articles, kept by triggers.
+ADJACENCY_EDGES = "SELECT author_id, magazine_id FROM magazine_author_stats"
+# The same pairs straight from articles, to check the index and the triggers.
+ARTICLE_EDGES = "SELECT DISTINCT author_id, magazine_id FROM articles"
+
+# -- cross-process aggregate cache (lib/db/query_cache.py) ----------------
+
+# The last change-feed seq (see below): it moves on every row written.
+DATA_VERSION = "SELECT COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'changes'), 0)"
+QUERY_CACHE_GET = "SELECT columns, rows FROM query_cache WHERE key = ? AND version = ?"
+# Never replace an entry with one computed from older data.
+QUERY_CACHE_PUT = """
+    INSERT INTO query_cache (key, version, columns, rows) VALUES (?, ?, ?, ?)
+    ON CONFLICT (key) DO UPDATE SET
+        version = excluded.version, columns = excluded.columns, rows = excluded.rows
+    WHERE excluded.version >= query_cache.version
+"""
+QUERY_CACHE_CLEAR = "DELETE FROM query_cache"
+
+
+def json_rows(columns):
+    """
+    A query turning a JSON array of row arrays (its one parameter) back into rows.
+
+    The result columns are named ``columns``, so a hit in the aggregate
+    cache yields the same sqlite3.Row objects as the query it caches.
+    """
+    select = ", ".join(
+        f"json_extract(value, '$[{i}]') AS \"{name}\"" for i, name in enumerate(columns)
+    )
+    return f"SELECT {select} FROM json_each(?) ORDER BY key"
+
+
+# -- change-data feed (lib/db/changes.py) --------------------------------
+
+CHANGES_SINCE = "SELECT seq, table_name, op, row_id, data FROM changes WHERE seq > ? ORDER BY seq LIMIT ?"
+CHANGES_PRUNE = "DELETE FROM changes WHERE seq <= ?"
+
+# -- articles --------------------------------------------------------------
+
+ARTICLE_INSERT = "INSERT INTO articles (title, author_id, magazine_id) VALUES (?, ?, ?)"
+# Sharded: shard k of n assigns ids k + 1, k + 1 + n, ... so ids stay unique
+# across shards; the leading parameters are connection.article_id_params(k).
+ARTICLE_INSERT_SHARDED = """
+    INSERT INTO articles (id, title, author_id, magazine_id)
+    VALUES ((SELECT COALESCE(MAX(id), ?) + ? FROM articles), ?, ?, ?)
+"""
+ARTICLE_UPDATES = _updates("articles", ("title", "author_id", "magazine_id"))
+ARTICLE_BY_ID = f"SELECT {ARTICLE_COLUMNS} FROM articles WHERE id = ?"
+ARTICLE_BY_TITLE = f"SELECT {ARTICLE_COLUMNS} FROM articles WHERE title = ? ORDER BY id LIMIT 1"
+ARTICLES_BY_IDS = f"SELECT {ARTICLE_COLUMNS} FROM articles WHERE id IN ({{}})"
+ARTICLES_BY_AUTHOR = f"SELECT {ARTICLE_COLUMNS} FROM articles WHERE author_id = ?"
+ARTICLES_BY_AUTHOR_ORDERED = f"SELECT {ARTICLE_COLUMNS} FROM articles WHERE author_id = ? ORDER BY id"
+ARTICLES_BY_AUTHOR_PAGE = (
+    f"SELECT {ARTICLE_COLUMNS} FROM articles WHERE author_id = ? AND id > ? ORDER BY id LIMIT ?"
+)
+ARTICLES_BY_MAGAZINE = f"SELECT {ARTICLE_COLUMNS} FROM articles WHERE magazine_id = ?"
+ARTICLES_BY_MAGAZINE_ORDERED = (
+    f"SELECT {ARTICLE_COLUMNS} FROM articles WHERE magazine_id = ? ORDER BY id"
+)
+ARTICLES_BY_MAGAZINE_PAGE = (
+    f"SELECT {ARTICLE_COLUMNS} FROM articles WHERE magazine_id = ? AND id > ? ORDER BY id LIMIT ?"
+)
+
+_ARTICLE_SEARCH = """
+    SELECT a.title, a.author_id, a.magazine_id, a.id
+    FROM articles_fts JOIN articles a ON a.id = articles_fts.rowid
+    WHERE articles_fts MATCH ?{}
+    ORDER BY articles_fts.rank LIMIT ?
+"""
+# Keyed by (filter by magazine, filter by author); parameters are
+# (match, [magazine_id], [author_id], limit).
+ARTICLE_SEARCH = {
+    (False, False): _ARTICLE_SEARCH.format(""),
+    (True, False): _ARTICLE_SEARCH.format(" AND a.magazine_id = ?"),
+    (False, True): _ARTICLE_SEARCH.format(" AND a.author_id = ?"),
+    (True, True): _ARTICLE_SEARCH.format(" AND a.magazine_id = ? AND a.author_id = ?"),
+}
+
+
+def in_list(template, values):
+    """
+    Fill a ``... IN ({})`` template for ``values`` (at most 512 of them).
+
+    The placeholder count is rounded up to the next of ``IN_BUCKETS`` by
+    repeating the last value, so only a handful of distinct statements ever
+    reach the statement cache.
+
+    Returns:
+        tuple: ``(sql, params)``
+    """
+    values = list(values)
+    size = next((bucket for bucket in IN_BUCKETS if bucket >= len(values)), len(values))
+    params = values + values[-1:] * (size - len(values))
+    return template.format(",".join("?" * size)), params
+
+
+HOT_QUERIES = (
+    AUTHOR_BY_ID,
+    AUTHOR_BY_NAME,
+    MAGAZINE_BY_ID,
+    MAGAZINE_BY_NAME,
+    ARTICLE_BY_ID,
+    ARTICLE_BY_TITLE,
+    ARTICLES_BY_AUTHOR,
+    ARTICLES_BY_MAGAZINE,
+    TOP_AUTHOR,
+    MAGAZINES_WITH_MULTIPLE_AUTHORS,
+    MAGAZINE_ARTICLE_COUNTS,
+) + tuple(AUTHORS_BY_IDS.format(",".join("?" * n)) for n in IN_BUCKETS[:3]) + tuple(
+    MAGAZINES_BY_IDS.format(",".join("?" * n)) for n in IN_BUCKETS[:3]
+)
@@ -0,0 +1,98 @@
+"""
+Cross-process cache for the aggregate model queries.
+
+``Author.top_author()``, ``Magazine.article_counts()`` and
+``Magazine.magazines_with_multiple_authors()`` read the whole stats
+tables. Every worker process used to recompute them; now the first one to
+run a query stores its rows in the query_cache table (in the database
+itself, so every process shares it) tagged with the current data version:
+the last sequence number of the change feed (lib.db.changes), which
+triggers advance on any write to authors, magazines or articles. An entry
+is served until the data it was computed from changes, and a write from
+any process or code path retires it.
+
+With sharded articles the data version is the sum of the main database's
+and every shard's sequence; each only grows, so the sum changes whenever
+any of them does.
+"""
+import json
+import threading
+
+from lib.db import queries
+from lib.db.changes import latest_seq
+from lib.db.connection import (
+    PoolTimeoutError,
+    fan_out,
+    get_pool,
+    read_cursor,
+    shard_count,
+    transaction,
+)
+
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def data_version():
+    """The current data version: it changes whenever a cached query's answer could."""
+
+    if shard_count() == 1:
+        return latest_seq()
+    return latest_seq() + sum(fan_out(latest_seq))
+
+
+def cached_rows(key, columns, compute):
+    """
+    Return ``compute()``'s rows, from the shared cache when still current.
+
+    ``compute`` returns a list of rows (tuples or sqlite3.Row) with the given
+    ``columns``; a hit returns sqlite3.Row objects with the same columns.
+    """
+    version = data_version()
+    with read_cursor() as cursor:
+        hit = cursor.execute(queries.QUERY_CACHE_GET, (key, version)).fetchone()
+        if hit is not None and json.loads(hit["columns"]) == list(columns):
+            with _lock:
+                _stats["hits"] += 1
+            return cursor.execute(queries.json_rows(columns), (hit["rows"],)).fetchall()
+
+    rows = compute()
+    with _lock:
+        _stats["misses"] += 1
+    try:
+        # Storing is best-effort: a read never waits for another thread's write.
+        writer = get_pool().connection(timeout=0)
+    except PoolTimeoutError:
+        return rows
+    try:
+        if writer.in_transaction:
+            return rows  # may include this thread's uncommitted writes; don't share them
+        # Nor for another process's: skip the store unless the lock is free now.
+        if not writer.try_begin():
+            return rows
+        try:
+            writer.execute(queries.QUERY_CACHE_PUT, (
+                key, version, json.dumps(list(columns)), json.dumps([tuple(row) for row in rows]),
+            ))
+            writer.commit()
+        except Exception:
+            writer.rollback()
+            raise
+        # The cache is not model data; nothing in-process needs invalidating.
+        writer.acknowledge_changes()
+    finally:
+        writer.close()
+    return rows
+
+
+def clear_query_cache():
+    """Drop every cached result."""
+    with transaction() as conn:
+        conn.execute(queries.QUERY_CACHE_CLEAR)
+        conn.acknowledge_changes()
+
+
+def query_cache_stats():
+    """Hit/miss counters for this process."""
+    with _lock:
+        return dict(_stats)
@@ -0,0 +1,34 @@
+-- Baseline schema (migration version 1), applied by lib/db/migrate.py.
+--
+-- Journal mode (WAL) and the per-connection tuning pragmas (synchronous,
+-- cache_size, mmap_size, temp_store, foreign_keys) are not stored in the
+-- database file, so they live in CONNECTION_PRAGMAS in lib/db/connection.py
+-- and are set on every connection the pool opens.
+
+CREATE TABLE IF NOT EXISTS authors (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS magazines (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    category TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS articles (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    author_id INTEGER NOT NULL REFERENCES authors(id),
+    magazine_id INTEGER NOT NULL REFERENCES magazines(id)
+);
+
+-- find_by_name / find_by_title point lookups.
+CREATE INDEX IF NOT EXISTS idx_authors_name ON authors(name);
+CREATE INDEX IF NOT EXISTS idx_magazines_name ON magazines(name);
+CREATE INDEX IF NOT EXISTS idx_articles_title ON articles(title);
+
+-- Relationship lookups. The second column makes the DISTINCT joins in
+-- Author.magazines()/topic_areas() and Magazine.contributors() index-only.
+CREATE INDEX IF NOT EXISTS idx_articles_author_magazine ON articles(author_id, magazine_id);
+CREATE INDEX IF NOT EXISTS idx_articles_magazine_author ON articles(magazine_id, author_id);
@@ -0,0 +1,66 @@
+import random
+
+from lib.models.article import Article
+from lib.models.author import Author
+from lib.models.magazine import Magazine
+
+CATEGORIES = (
+    "Technology", "Science", "Health", "Business", "Culture",
+    "Sports", "Travel", "Food", "Politics", "Design",
+)
+TITLE_WORDS = (
+    "future", "guide", "state", "rise", "hidden", "cost", "art", "science",
+    "quiet", "new", "power", "case", "inside", "history", "data", "city",
+)
+
+
+def zipf_weights(n, skew):
+    """Cumulative weights for a Zipf-like distribution over ``n`` items."""
+    total = 0.0
+    cumulative = []
+    for rank in range(1, n + 1):
+        total += 1.0 / rank ** skew
+        cumulative.append(total)
+    return cumulative
+
+
+def seed(n_authors=1000, n_magazines=100, n_articles=50_000, skew=1.1, random_seed=42):
+    """
+    Populate the database with synthetic authors, magazines and articles.
+
+    Article authorship and placement follow a Zipf distribution with exponent
+    ``skew``: a few prolific authors and popular magazines account for most
+    articles, like real publication data. Everything is written through the
+    bulk paths, and ``random_seed`` makes runs reproducible.
+
+    Returns:
+        dict: ``author_ids``, ``magazine_ids`` and ``article_ids`` lists.
+    """
+    rng = random.Random(random_seed)
+    author_ids = Author.bulk_upsert(f"Author {i}" for i in range(n_authors))
+    magazine_ids = Magazine.bulk_upsert(
+        {"name": f"Magazine {i}", "category": CATEGORIES[i % len(CATEGORIES)]}
+        for i in range(n_magazines)
+    )
+    author_weights = zipf_weights(n_authors, skew)
+    magazine_weights = zipf_weights(n_magazines, skew)
+
+    def articles():
+        for i in range(n_articles):
+            words = " ".join(rng.sample(TITLE_WORDS, 3)).capitalize()
+            yield (
+                f"{words} {i}",
+                rng.choices(author_ids, cum_weights=author_weights)[0],
+                rng.choices(magazine_ids, cum_weights=magazine_weights)[0],
+            )
+
+    article_ids = Article.bulk_create(
+        {"title": title, "author_id": author_id, "magazine_id": magazine_id}
+        for title, author_id, magazine_id in articles()
+    )
+    return {"author_ids": author_ids, "magazine_ids": magazine_ids, "article_ids": article_ids}
+
+
+if __name__ == "__main__":
+    counts = {name: len(ids) for name, ids in seed().items()}
+    print(f"Seeded {counts}")
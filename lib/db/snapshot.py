@@ -0,0 +1,190 @@
+"""
+Columnar snapshots of the authors, magazines and articles tables.
+
+``export_snapshot()`` writes every column to its own flat file: integer
+columns as native int64 arrays, string columns as an int64 offsets array
+plus a UTF-8 blob. The files are memory-mapped by ``load_snapshot()``, so
+reporting jobs get whole-table columns without building model objects, and
+can share one export across processes. Columns come back as NumPy arrays
+when NumPy is installed, and as ``memoryview``s otherwise.
+
+    export_snapshot("snapshots/today")
+    snapshot = load_snapshot("snapshots/today")
+    author_ids = snapshot.column("articles", "author_id")
+"""
+import json
+import mmap
+import os
+import sys
+import time
+from array import array
+
+from lib.db.connection import STREAM_BATCH_SIZE, get_read_connection, require_unsharded
+
+try:
+    import numpy
+except ImportError:  # optional; memoryviews work everywhere
+    numpy = None
+
+SNAPSHOT_VERSION = 1
+MANIFEST = "manifest.json"
+
+# Table -> (column, type) in export order; "q" is int64, "str" is UTF-8 text.
+SNAPSHOT_TABLES = {
+    "authors": (("id", "q"), ("name", "str")),
+    "magazines": (("id", "q"), ("name", "str"), ("category", "str")),
+    "articles": (("id", "q"), ("author_id", "q"), ("magazine_id", "q"), ("title", "str")),
+}
+
+
+def _path(directory, table, column, part=None):
+    suffix = f".{part}" if part else ""
+    return os.path.join(directory, f"{table}.{column}{suffix}.bin")
+
+
+def export_snapshot(directory, batch_size=STREAM_BATCH_SIZE):
+    """
+    Write a consistent columnar snapshot of all three tables to ``directory``.
+
+    All tables are read inside one read transaction, so the snapshot is a
+    single point in time even while writers are active. Rows are ordered by
+    id.
+
+    Returns:
+        dict: The manifest, including the row count of each table.
+    """
+    require_unsharded("Snapshot export")
+    os.makedirs(directory, exist_ok=True)
+    manifest = {"version": SNAPSHOT_VERSION, "byteorder": sys.byteorder,
+                "created_at": time.time(), "tables": {}}
+    conn = get_read_connection()
+    began = not conn.in_transaction  # a caller holding the writer may already be in one
+    try:
+        if began:
+            conn.execute("BEGIN")
+        for table, columns in SNAPSHOT_TABLES.items():
+            names = ", ".join(name for name, _ in columns)
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute(f"SELECT {names} FROM {table} ORDER BY id")
+            manifest["tables"][table] = {
+                "rows": _write_columns(directory, table, columns, cursor, batch_size),
+                "columns": dict(columns),
+            }
+    finally:
+        if began:
+            conn.rollback()
+        conn.close()
+    with open(os.path.join(directory, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def _write_columns(directory, table, columns, cursor, batch_size):
+    ints = {name: array("q") for name, kind in columns if kind == "q"}
+    offsets = {name: array("q", [0]) for name, kind in columns if kind == "str"}
+    blobs = {name: open(_path(directory, table, name, "data"), "wb") for name in offsets}
+    rows = 0
+    try:
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            rows += len(batch)
+            for i, (name, kind) in enumerate(columns):
+                if kind == "q":
+                    ints[name].extend(row[i] for row in batch)
+                else:
+                    data = [(row[i] or "").encode("utf-8") for row in batch]
+                    end = offsets[name][-1]
+                    for value in data:
+                        end += len(value)
+                        offsets[name].append(end)
+                    blobs[name].write(b"".join(data))
+    finally:
+        for blob in blobs.values():
+            blob.close()
+    for name, values in ints.items():
+        with open(_path(directory, table, name), "wb") as f:
+            values.tofile(f)
+    for name, values in offsets.items():
+        with open(_path(directory, table, name, "offsets"), "wb") as f:
+            values.tofile(f)
+    return rows
+
+
+def _map_int64(path):
+    """Memory-map a file of native int64 values (empty files can't be mapped)."""
+    if numpy is not None:
+        if os.path.getsize(path) == 0:
+            return numpy.empty(0, dtype=numpy.int64)
+        return numpy.memmap(path, dtype=numpy.int64, mode="r")
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return memoryview(array("q"))
+        return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)).cast("q")
+
+
+def _map_bytes(path):
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class StringColumn:
+    """Read-only sequence of the strings in an offsets + UTF-8 blob column."""
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("string column index out of range")
+        return self.data[int(self.offsets[i]):int(self.offsets[i + 1])].decode("utf-8")
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+class Snapshot:
+    """A loaded snapshot: memory-mapped columns keyed by (table, column)."""
+
+    def __init__(self, directory, manifest):
+        self.directory = directory
+        self.manifest = manifest
+        self._columns = {}
+
+    def rows(self, table):
+        return self.manifest["tables"][table]["rows"]
+
+    def column(self, table, name):
+        """Return a column: int64 array/memoryview, or a StringColumn for text."""
+        key = (table, name)
+        if key not in self._columns:
+            kind = self.manifest["tables"][table]["columns"][name]
+            if kind == "q":
+                self._columns[key] = _map_int64(_path(self.directory, table, name))
+            else:
+                self._columns[key] = StringColumn(
+                    _map_int64(_path(self.directory, table, name, "offsets")),
+                    _map_bytes(_path(self.directory, table, name, "data")),
+                )
+        return self._columns[key]
+
+
+def load_snapshot(directory):
+    """Open a snapshot written by ``export_snapshot()``."""
+    with open(os.path.join(directory, MANIFEST)) as f:
+        manifest = json.load(f)
+    if manifest.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {manifest.get('version')!r}")
+    if manifest["byteorder"] != sys.byteorder:
+        raise ValueError(f"Snapshot was written on a {manifest['byteorder']}-endian machine")
+    return Snapshot(directory, manifest)
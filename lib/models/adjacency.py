@@ -0,0 +1,162 @@
+"""
+In-memory author <-> magazine adjacency index.
+
+``Author.magazines()``, ``Author.topic_areas()``, ``Magazine.contributors()``
+and ``Magazine.authors()`` all ask which magazines an author has written for
+(or the reverse). Instead of a DISTINCT join over articles on every call,
+the index loads every (author, magazine) pair once from the
+trigger-maintained magazine_author_stats table, along with each magazine's
+category. The model insert paths then add pairs as they commit articles.
+With sharded articles the pairs are read from every shard.
+
+Changes it can't apply incrementally drop it, and it is rebuilt on next
+use: article updates, raw SQL (through the write listener), and, after
+``ADJACENCY_TTL``, writes from other processes. ``verify()`` compares it
+with a fresh query over articles.
+"""
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from lib.db import queries
+from lib.db.connection import add_write_listener, fan_out, read_cursor
+
+ADJACENCY_TTL = 60.0  # seconds; bounds staleness from writes made by other processes
+
+
+class AdjacencyIndex:
+    """Bipartite author/magazine index plus magazine categories."""
+
+    def __init__(self, ttl=ADJACENCY_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._magazines_by_author = None
+        self._authors_by_magazine = None
+        self._categories = None
+        self._built_at = 0.0
+        self._generation = 0  # bumped by invalidate(), so a build it overtook isn't installed
+        self._stats = {"builds": 0, "lookups": 0, "invalidations": 0}
+
+    @contextmanager
+    def _built(self):
+        """
+        Hold the lock with a current index, building it first if missing or expired.
+
+        The database is read without the lock: leasing a connection can run
+        the write listeners, and so ``invalidate()``, on this same thread. A
+        build that an invalidation overtook is discarded and read again.
+        """
+        while True:
+            with self._lock:
+                if self._categories is not None and time.monotonic() - self._built_at < self.ttl:
+                    yield
+                    return
+                generation = self._generation
+            magazines_by_author = defaultdict(set)
+            authors_by_magazine = defaultdict(set)
+            for edges in fan_out(_edges(queries.ADJACENCY_EDGES)):
+                for author_id, magazine_id in edges:
+                    magazines_by_author[author_id].add(magazine_id)
+                    authors_by_magazine[magazine_id].add(author_id)
+            with read_cursor() as cursor:
+                categories = dict(cursor.execute(queries.MAGAZINE_CATEGORIES).fetchall())
+            with self._lock:
+                if self._generation == generation:
+                    self._magazines_by_author = magazines_by_author
+                    self._authors_by_magazine = authors_by_magazine
+                    self._categories = categories
+                    self._built_at = time.monotonic()
+                    self._stats["builds"] += 1
+                    yield
+                    return
+
+    def magazines_of(self, author_id):
+        """Ids of the magazines ``author_id`` has written for, ascending."""
+        with self._built():
+            self._stats["lookups"] += 1
+            return sorted(self._magazines_by_author.get(author_id, ()))
+
+    def authors_of(self, magazine_id):
+        """Ids of the authors who have written for ``magazine_id``, ascending."""
+        with self._built():
+            self._stats["lookups"] += 1
+            return sorted(self._authors_by_magazine.get(magazine_id, ()))
+
+    def categories_of(self, author_id):
+        """The distinct categories of the magazines ``author_id`` has written for, sorted."""
+        with self._built():
+            self._stats["lookups"] += 1
+            return sorted({
+                self._categories[magazine_id]
+                for magazine_id in self._magazines_by_author.get(author_id, ())
+            })
+
+    def add_articles(self, pairs):
+        """Record committed articles as ``(author_id, magazine_id)`` pairs."""
+        with self._lock:
+            if self._categories is None:
+                return  # the next build reads them from the database
+            for author_id, magazine_id in pairs:
+                self._magazines_by_author[author_id].add(magazine_id)
+                self._authors_by_magazine[magazine_id].add(author_id)
+
+    def set_categories(self, categories):
+        """Record committed ``{magazine_id: category}`` for new or updated magazines."""
+        with self._lock:
+            if self._categories is not None:
+                self._categories.update(categories)
+
+    def invalidate(self):
+        """Drop the index; it is rebuilt on next use."""
+        with self._lock:
+            self._magazines_by_author = self._authors_by_magazine = self._categories = None
+            self._generation += 1
+            self._stats["invalidations"] += 1
+
+    def verify(self):
+        """
+        Compare the index with the articles and magazines tables.
+
+        Returns:
+            dict: ``missing`` and ``extra`` (author_id, magazine_id) pairs and
+            magazine ids whose category differs; all empty when consistent.
+        """
+        expected = {tuple(row) for edges in fan_out(_edges(queries.ARTICLE_EDGES)) for row in edges}
+        with read_cursor() as cursor:
+            categories = dict(cursor.execute(queries.MAGAZINE_CATEGORIES).fetchall())
+        with self._built():
+            actual = {
+                (author_id, magazine_id)
+                for author_id, magazine_ids in self._magazines_by_author.items()
+                for magazine_id in magazine_ids
+            }
+            mismatched = sorted(
+                id for id, category in categories.items() if self._categories.get(id) != category
+            )
+        return {
+            "missing": sorted(expected - actual),
+            "extra": sorted(actual - expected),
+            "categories": mismatched,
+        }
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["authors"] = len(self._magazines_by_author or ())
+            stats["magazines"] = len(self._authors_by_magazine or ())
+        return stats
+
+
+def _edges(sql):
+    """A fan_out() callback reading ``(author_id, magazine_id)`` rows from one shard."""
+    def read(shard):
+        with read_cursor(shard=shard) as cursor:
+            return cursor.execute(sql).fetchall()
+    return read
+
+
+adjacency_index = AdjacencyIndex()
+
+# Raw-SQL writes may have changed any pair; rebuild from scratch.
+add_write_listener(adjacency_index.invalidate)
@@ -0,0 +1,226 @@
+"""
+Asyncio counterparts of the models.
+
+Blocking sqlite3 calls run on a dedicated thread pool sized to the
+connection pool, so an event loop never blocks on the database and the
+worker threads never wait for a connection. Concurrent ``find_by_id`` calls
+made within ``BATCH_WINDOW`` of each other are coalesced into a single
+``find_by_ids`` query.
+
+    author = await AsyncAuthor.find_by_id(1)
+    for article in await author.articles():
+        magazine = await article.magazine()
+"""
+import asyncio
+import functools
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from lib.db import connection
+from lib.models.article import Article
+from lib.models.author import Author
+from lib.models.magazine import Magazine
+
+BATCH_WINDOW = 0.002  # seconds to collect point lookups before issuing one query
+MAX_PENDING = 256  # blocking calls in flight per event loop before callers queue up
+
+_executor = None
+_executor_lock = threading.Lock()
+_loop_state = weakref.WeakKeyDictionary()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=connection.POOL_SIZE, thread_name_prefix="db"
+            )
+        return _executor
+
+
+def shutdown(wait=True):
+    """Stop the database thread pool; a new one is started on next use."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
+
+
+class _LoopState:
+    """Per-event-loop semaphore and batchers (asyncio primitives are loop-bound)."""
+
+    def __init__(self):
+        self.semaphore = asyncio.Semaphore(MAX_PENDING)
+        self.batchers = {}
+
+
+def _state():
+    loop = asyncio.get_running_loop()
+    state = _loop_state.get(loop)
+    if state is None:
+        state = _loop_state[loop] = _LoopState()
+    return state
+
+
+async def run_sync(fn, *args, **kwargs):
+    """Run a blocking data-access call on the database thread pool."""
+    async with _state().semaphore:
+        return await asyncio.get_running_loop().run_in_executor(
+            _get_executor(), functools.partial(fn, *args, **kwargs)
+        )
+
+
+class _Batcher:
+    """Coalesces concurrent point lookups into one ``loader(keys)`` call."""
+
+    def __init__(self, loader):
+        self.loader = loader
+        self.pending = {}
+        self.batches = 0
+        self.keys = 0
+
+    async def load(self, key):
+        loop = asyncio.get_running_loop()
+        future = self.pending.get(key)
+        if future is None:
+            if not self.pending:
+                loop.call_later(BATCH_WINDOW, lambda: loop.create_task(self._flush()))
+            future = self.pending[key] = loop.create_future()
+        # Shielded so one cancelled caller doesn't cancel the lookup for the others.
+        return await asyncio.shield(future)
+
+    async def _flush(self):
+        pending, self.pending = self.pending, {}
+        self.batches += 1
+        self.keys += len(pending)
+        try:
+            found = await run_sync(self.loader, list(pending))
+        except Exception as e:
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for key, future in pending.items():
+                if not future.done():
+                    future.set_result(found.get(key))
+
+
+def _batcher(model):
+    batchers = _state().batchers
+    if model not in batchers:
+        batchers[model] = _Batcher(model.find_by_ids)
+    return batchers[model]
+
+
+def batch_stats():
+    """Return ``{model: {"batches": n, "keys": n}}`` for the running event loop."""
+    return {
+        model.__name__: {"batches": b.batches, "keys": b.keys}
+        for model, b in _state().batchers.items()
+    }
+
+
+class AsyncModel:
+    """
+    Async wrapper around a model instance.
+
+    Plain attributes (``id``, ``name``, ...) read through to the wrapped
+    object; data-access methods are coroutines.
+    """
+
+    model = None
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __getattr__(self, name):
+        return getattr(self.obj, name)
+
+    def __repr__(self):
+        return f"<{type(self).__name__} id={self.obj.id}>"
+
+    @classmethod
+    def _wrap(cls, obj):
+        return cls(obj) if obj is not None else None
+
+    @classmethod
+    async def find_by_id(cls, id):
+        return cls._wrap(await _batcher(cls.model).load(id))
+
+    @classmethod
+    async def find_by_ids(cls, ids):
+        found = await run_sync(cls.model.find_by_ids, ids)
+        return {id: cls(obj) for id, obj in found.items()}
+
+    async def save(self):
+        await run_sync(self.obj.save)
+
+
+class AsyncArticle(AsyncModel):
+    model = Article
+
+    @classmethod
+    async def find_by_title(cls, title):
+        return cls._wrap(await run_sync(Article.find_by_title, title))
+
+    async def author(self):
+        author = self.obj._prefetched("author", "author_id")
+        if author is None:
+            author = await _batcher(Author).load(self.obj.author_id)
+        return AsyncAuthor._wrap(author)
+
+    async def magazine(self):
+        magazine = self.obj._prefetched("magazine", "magazine_id")
+        if magazine is None:
+            magazine = await _batcher(Magazine).load(self.obj.magazine_id)
+        return AsyncMagazine._wrap(magazine)
+
+
+class AsyncAuthor(AsyncModel):
+    model = Author
+
+    @classmethod
+    async def find_by_name(cls, name):
+        return cls._wrap(await run_sync(Author.find_by_name, name))
+
+    @classmethod
+    async def top_author(cls):
+        return cls._wrap(await run_sync(Author.top_author))
+
+    async def articles(self, include=()):
+        return [AsyncArticle(a) for a in await run_sync(self.obj.articles, include)]
+
+    async def magazines(self):
+        return [AsyncMagazine(m) for m in await run_sync(self.obj.magazines)]
+
+    async def topic_areas(self):
+        return await run_sync(self.obj.topic_areas)
+
+    async def add_article(self, magazine, title):
+        magazine = magazine.obj if isinstance(magazine, AsyncMagazine) else magazine
+        return AsyncArticle(await run_sync(self.obj.add_article, magazine, title))
+
+
+class AsyncMagazine(AsyncModel):
+    model = Magazine
+
+    @classmethod
+    async def find_by_name(cls, name):
+        return cls._wrap(await run_sync(Magazine.find_by_name, name))
+
+    @classmethod
+    async def article_counts(cls):
+        return await run_sync(Magazine.article_counts)
+
+    @classmethod
+    async def magazines_with_multiple_authors(cls):
+        return await run_sync(Magazine.magazines_with_multiple_authors)
+
+    async def articles(self, include=()):
+        return [AsyncArticle(a) for a in await run_sync(self.obj.articles, include)]
+
+    async def contributors(self):
+        return [AsyncAuthor(a) for a in await run_sync(self.obj.contributors)]
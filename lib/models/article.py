@@ -1,55 +1,327 @@
-from lib.db.connection import get_connection
+import re
+from collections import defaultdict
+from itertools import zip_longest
+
+from lib.db import queries
+from lib.db.connection import (
+    BULK_CHUNK_SIZE,
+    IN_CHUNK_SIZE,
+    article_id_params,
+    chunked,
+    fan_out,
+    inserted_ids,
+    read_cursor,
+    shard_count,
+    shard_for,
+    shard_of_article,
+    shard_transactions,
+    transaction,
+)
+from lib.models.adjacency import adjacency_index
+from lib.models.cache import model_cache
+from lib.models.dirty import DirtyTracking, slot_setters
+from lib.models.write_behind import current_queue
+
+
+class Article(DirtyTracking):
+    __slots__ = ("id", "title", "author_id", "magazine_id", "_related", "_saved", "__weakref__")
+
+    FIELDS = ("id", "title", "author_id", "magazine_id")
+    # SELECT list in __init__'s positional order, so rows map straight onto it.
+    COLUMNS = queries.ARTICLE_COLUMNS
+    INSERT = queries.ARTICLE_INSERT
+    UPDATES = queries.ARTICLE_UPDATES
 
-class Article:
     def __init__(self, title, author_id, magazine_id, id=None):
+        self._saved = None  # no known database values yet; must precede the columns, see dirty.py
         self.id = id
         self.title = title
         self.author_id = author_id
         self.magazine_id = magazine_id
+        self._related = None  # relation name -> object attached by prefetch()
+
+    @classmethod
+    def from_row(cls, cursor, row):
+        """
+        sqlite3 row factory: build an Article from a ``SELECT COLUMNS`` tuple.
+
+        Fills the slots directly; the object is clean until a column is
+        written (see dirty.py).
+        """
+        title, author_id, magazine_id, id = row
+        obj = object.__new__(cls)
+        _set_title(obj, title)
+        _set_author_id(obj, author_id)
+        _set_magazine_id(obj, magazine_id)
+        _set_id(obj, id)
+        return obj
 
     def save(self):
-        conn = get_connection()
-        cursor = conn.cursor()
-        if self.id:
-            cursor.execute(
-                "UPDATE articles SET title = ?, author_id = ?, magazine_id = ? WHERE id = ?",
-                (self.title, self.author_id, self.magazine_id, self.id)
-            )
-        else:
-            cursor.execute(
-                "INSERT INTO articles (title, author_id, magazine_id) VALUES (?, ?, ?)",
-                (self.title, self.author_id, self.magazine_id)
-            )
-            self.id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        """
+        Insert or update the article.
+
+        With write-behind enabled (see lib.models.write_behind) the write is
+        queued for the next group commit instead, and a Future resolving to
+        the article's id is returned.
+        """
+        write_behind = current_queue()
+        if write_behind is not None:
+            return write_behind.submit(self)
+        fields = self.dirty_fields()
+        if not fields:
+            return
+        inserted = not self.id
+        shard = shard_for(self.magazine_id)
+        if not inserted and shard != shard_of_article(self.id):
+            raise ValueError("Cannot move an article to a magazine on another shard.")
+        with transaction(shard) as conn:
+            cursor = conn.cursor()
+            if inserted:
+                sql, id_params = _insert_statement(shard)
+                cursor.execute(sql, id_params + self._insert_params())
+                self.id = cursor.lastrowid
+            else:
+                cursor.execute(self.UPDATES[fields], self._update_params(fields))
+            conn.acknowledge_changes()
+        self._after_save(inserted)
+
+    def _after_save(self, inserted):
+        """Mark the article clean and refresh in-process caches once its save has committed."""
+        changed = self.dirty_fields()
+        self._mark_clean()
+        model_cache.put(self, replace=True)
+        # Titles aren't unique, so only find_by_title() (lowest id wins) sets the pointer.
+        model_cache.invalidate(Article, title=self.title)
+        if inserted:
+            adjacency_index.add_articles([(self.author_id, self.magazine_id)])
+        elif "author_id" in changed or "magazine_id" in changed:
+            # The old author/magazine pair may be gone; only a rebuild can tell.
+            adjacency_index.invalidate()
 
     @classmethod
     def find_by_id(cls, id):
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM articles WHERE id = ?", (id,))
-        row = cursor.fetchone()
-        conn.close()
-        if row:
-            return cls(row["title"], row["author_id"], row["magazine_id"], row["id"])
-        return None
+        cached = model_cache.get(cls, id)
+        if cached is not None:
+            return cached
+        with read_cursor(cls.from_row, shard_of_article(id)) as cursor:
+            cursor.execute(queries.ARTICLE_BY_ID, (id,))
+            article = cursor.fetchone()
+        return model_cache.put(article) if article else None
 
     @classmethod
     def find_by_title(cls, title):
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM articles WHERE title = ?", (title,))
-        row = cursor.fetchone()
-        conn.close()
-        if row:
-            return cls(row["title"], row["author_id"], row["magazine_id"], row["id"])
+        cached = model_cache.get_by(cls, "title", title)
+        if cached is not None:
+            return cached
+
+        def find(shard):
+            with read_cursor(cls.from_row, shard) as cursor:
+                cursor.execute(queries.ARTICLE_BY_TITLE, (title,))
+                return cursor.fetchone()
+
+        found = [article for article in fan_out(find) if article is not None]
+        article = min(found, key=lambda article: article.id, default=None)
+        return model_cache.put(article, "title") if article else None
+
+    @classmethod
+    def find_by_ids(cls, ids):
+        """Return a dict of id -> Article for the given ids, batching the misses."""
+        found = {}
+        missing = []
+        for id in set(ids):
+            cached = model_cache.get(cls, id)
+            if cached is not None:
+                found[id] = cached
+            elif id is not None:
+                missing.append(id)
+        if not missing:
+            return found
+        by_shard = defaultdict(list)
+        for id in missing:
+            by_shard[shard_of_article(id)].append(id)
+
+        def find(shard):
+            articles = []
+            with read_cursor(cls.from_row, shard) as cursor:
+                for chunk in chunked(by_shard.get(shard, ()), IN_CHUNK_SIZE):
+                    cursor.execute(*queries.in_list(queries.ARTICLES_BY_IDS, chunk))
+                    articles.extend(cursor.fetchall())
+            return articles
+
+        for articles in fan_out(find):
+            for article in articles:
+                found[article.id] = model_cache.put(article)
+        return found
+
+    @classmethod
+    def search(cls, query, limit=20, magazine_id=None, author_id=None):
+        """
+        Full-text search over article titles, best matches first.
+
+        ``query`` is plain text: every word must appear, ``"quoted words"``
+        must appear as a phrase and ``word*`` matches any word starting with
+        ``word``. Results can be narrowed to one magazine and/or author.
+
+        With sharded articles an unnarrowed search runs on every shard and
+        takes each shard's best match in turn, then each one's second, etc.
+        """
+        match = fts_query(query)
+        if not match:
+            return []
+        sql = queries.ARTICLE_SEARCH[(magazine_id is not None, author_id is not None)]
+        params = [match]
+        if magazine_id is not None:
+            params.append(magazine_id)
+        if author_id is not None:
+            params.append(author_id)
+        params.append(limit)
+
+        def search(shard):
+            with read_cursor(cls.from_row, shard) as cursor:
+                cursor.execute(sql, params)
+                return cursor.fetchall()
+
+        if magazine_id is not None:
+            return search(shard_for(magazine_id))
+        ranked = zip_longest(*fan_out(search))
+        return [article for rank in ranked for article in rank if article is not None][:limit]
+
+    @classmethod
+    def bulk_create(cls, articles, chunk_size=BULK_CHUNK_SIZE):
+        """
+        Insert many articles in a single transaction (one per shard) using executemany.
+
+        ``articles`` may be any iterable, including a generator, of Article
+        instances or dicts with 'title', 'author_id' and 'magazine_id'. It is
+        consumed ``chunk_size`` rows at a time, so large imports never sit in
+        memory. Article instances get their ``id`` set.
+
+        Returns:
+            list[int]: The new ids, in input order.
+        """
+        ids = []
+        pairs = set()
+        with shard_transactions(range(shard_count())) as conns:
+            for chunk in chunked(articles, chunk_size):
+                rows = [
+                    (a.title, a.author_id, a.magazine_id) if isinstance(a, Article)
+                    else (a["title"], a["author_id"], a["magazine_id"])
+                    for a in chunk
+                ]
+                pairs.update((author_id, magazine_id) for _, author_id, magazine_id in rows)
+                new_ids = insert_articles(conns, rows)
+                for article, id in zip(chunk, new_ids):
+                    if isinstance(article, Article):
+                        article.id = id
+                        article._mark_clean()
+                ids.extend(new_ids)
+            # New rows can't make any cached lookup stale.
+            for conn in conns.values():
+                conn.acknowledge_changes()
+        adjacency_index.add_articles(pairs)
+        return ids
+
+    def _attach(self, relation, obj):
+        if getattr(self, "_related", None) is None:  # from_row leaves it unset
+            self._related = {}
+        self._related[relation] = obj
+
+    def _prefetched(self, relation, foreign_key):
+        related = getattr(self, "_related", None)
+        related = related.get(relation) if related else None
+        if related is not None and related.id == getattr(self, foreign_key):
+            return related
         return None
 
     def author(self):
+        related = self._prefetched("author", "author_id")
+        if related is not None:
+            return related
         from lib.models.author import Author  # Lazy import to avoid circular import
         return Author.find_by_id(self.author_id)
 
     def magazine(self):
+        related = self._prefetched("magazine", "magazine_id")
+        if related is not None:
+            return related
         from lib.models.magazine import Magazine  # Lazy import to avoid circular import
         return Magazine.find_by_id(self.magazine_id)
+
+
+def fts_query(text):
+    """
+    Turn user search text into an FTS5 MATCH expression.
+
+    Words and ``"phrases"`` are quoted so punctuation and FTS operators in
+    user input can't break the query; a trailing ``*`` on a word is kept as
+    a prefix search.
+    """
+    terms = []
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', text):
+        if phrase.strip():
+            terms.append('"' + " ".join(phrase.split()) + '"')
+        elif word:
+            prefix = word.endswith("*")
+            word = word.rstrip("*").replace('"', "")
+            if word:
+                terms.append(f'"{word}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+
+def _relation(name):
+    from lib.models.author import Author
+    from lib.models.magazine import Magazine
+    relations = {"author": (Author, "author_id"), "magazine": (Magazine, "magazine_id")}
+    if name not in relations:
+        raise ValueError(f"Unknown relation {name!r}; expected one of {sorted(relations)}")
+    return relations[name]
+
+
+def _insert_statement(shard):
+    """The article INSERT for ``shard`` and the id parameters it starts with."""
+    if shard_count() == 1:
+        return queries.ARTICLE_INSERT, ()
+    return queries.ARTICLE_INSERT_SHARDED, article_id_params(shard)
+
+
+def insert_articles(conns, rows):
+    """
+    Insert ``(title, author_id, magazine_id)`` rows, each into its magazine's shard.
+
+    ``conns`` maps shard -> a connection inside a write transaction (see
+    ``shard_transactions()``). Returns the new ids in input order.
+    """
+    by_shard = defaultdict(list)
+    for position, row in enumerate(rows):
+        by_shard[shard_for(row[2])].append(position)
+    ids = [None] * len(rows)
+    for shard, positions in by_shard.items():
+        conn = conns[shard]
+        sql, id_params = _insert_statement(shard)
+        conn.executemany(sql, [id_params + tuple(rows[position]) for position in positions])
+        for position, id in zip(positions, inserted_ids(conn, len(positions), shard_count())):
+            ids[position] = id
+    return ids
+
+
+def prefetch(articles, *relations):
+    """
+    Eagerly load related objects for many articles at once.
+
+    Each relation ("author", "magazine") is resolved with a single batched
+    ``IN`` query instead of one query per article, and the results are
+    attached so that ``article.author()`` / ``article.magazine()`` don't touch
+    the database. Returns the articles as a list.
+    """
+    articles = list(articles)
+    for name in relations:
+        model, foreign_key = _relation(name)
+        found = model.find_by_ids(getattr(a, foreign_key) for a in articles)
+        for article in articles:
+            article._attach(name, found.get(getattr(article, foreign_key)))
+    return articles
+
+
+_set_title, _set_author_id, _set_magazine_id, _set_id = slot_setters(
+    Article, ("title", "author_id", "magazine_id", "id")
+)
@@ -1,77 +1,237 @@
-from lib.db.connection import get_connection, transaction
-from lib.models.article import Article
+import heapq
+from collections import Counter
 
+from lib.db import queries
+from lib.db.connection import (
+    BULK_CHUNK_SIZE,
+    IN_CHUNK_SIZE,
+    PoolTimeoutError,
+    STREAM_BATCH_SIZE,
+    chunked,
+    fan_out,
+    inserted_ids,
+    is_busy_error,
+    iter_rows,
+    merge_by_id,
+    read_cursor,
+    shard_count,
+    shard_for,
+    shard_transactions,
+    transaction,
+)
+from lib.db.aggregates import rebuild_aggregates
+from lib.db.query_cache import cached_rows
+from lib.models.adjacency import adjacency_index
+from lib.models.article import Article, insert_articles, prefetch
+from lib.models.cache import model_cache
+from lib.models.dirty import DirtyTracking, slot_setters
+
+
+class Author(DirtyTracking):
+    __slots__ = ("id", "name", "_saved", "__weakref__")
+
+    FIELDS = ("id", "name")
+    # SELECT list in __init__'s positional order, so rows map straight onto it.
+    COLUMNS = queries.AUTHOR_COLUMNS
+    INSERT = queries.AUTHOR_INSERT
+    UPDATES = queries.AUTHOR_UPDATES
 
-class Author:
     def __init__(self, name, id=None):
+        self._saved = None  # no known database values yet; must precede the columns, see dirty.py
         self.id = id
         self.name = name
 
+    @classmethod
+    def from_row(cls, cursor, row):
+        """
+        sqlite3 row factory: build an Author from a ``SELECT COLUMNS`` tuple.
+
+        Fills the slots directly; the object is clean until a column is
+        written (see dirty.py).
+        """
+        name, id = row
+        obj = object.__new__(cls)
+        _set_name(obj, name)
+        _set_id(obj, id)
+        return obj
+
+    def _after_save(self, inserted):
+        """Mark the author clean and refresh in-process caches once its save has committed."""
+        self._mark_clean()
+        model_cache.put(self, replace=True)
+        # Names aren't unique, so only find_by_name() (lowest id wins) sets the pointer.
+        model_cache.invalidate(Author, name=self.name)
+
     def save(self):
         """Insert or update the author in the database."""
-        conn = get_connection()
-        cursor = conn.cursor()
-        if self.id:
-            cursor.execute(
-                "UPDATE authors SET name = ? WHERE id = ?", (self.name, self.id)
-            )
-        else:
-            cursor.execute("INSERT INTO authors (name) VALUES (?)", (self.name,))
-            self.id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        fields = self.dirty_fields()
+        if not fields:
+            return
+        inserted = not self.id
+        with transaction() as conn:
+            cursor = conn.cursor()
+            if inserted:
+                cursor.execute(self.INSERT, self._insert_params())
+                self.id = cursor.lastrowid
+            else:
+                cursor.execute(self.UPDATES[fields], self._update_params(fields))
+            conn.acknowledge_changes()
+        self._after_save(inserted)
 
     @classmethod
     def find_by_id(cls, id):
         """Find an author by ID."""
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM authors WHERE id = ?", (id,))
-        row = cursor.fetchone()
-        conn.close()
-        return cls(row["name"], row["id"]) if row else None
+        cached = model_cache.get(cls, id)
+        if cached is not None:
+            return cached
+        with read_cursor(cls.from_row) as cursor:
+            cursor.execute(queries.AUTHOR_BY_ID, (id,))
+            author = cursor.fetchone()
+        return model_cache.put(author) if author else None
+
+    @classmethod
+    def bulk_upsert(cls, authors, chunk_size=BULK_CHUNK_SIZE):
+        """
+        Insert any authors that don't exist yet, matching existing ones by name.
+
+        ``authors`` may be any iterable, including a generator, of names,
+        Author instances or dicts with a 'name'. Rows are written with
+        executemany in ``chunk_size`` batches inside one transaction. Author
+        instances get their ``id`` set; one that already has an id keeps it,
+        and a changed name is written to that row instead of being matched.
+
+        Returns:
+            list[int]: The id for each input author, in input order.
+        """
+        ids = []
+        instances = []
+        renamed = []
+        with transaction() as conn:
+            cursor = conn.cursor()
+            for chunk in chunked(authors, chunk_size):
+                names = [
+                    a.name if isinstance(a, Author) else a["name"] if isinstance(a, dict) else a
+                    for a in chunk
+                ]
+                saved = [a for a in chunk if isinstance(a, Author) and a.id]
+                changed = [a for a in saved if a.is_dirty()]
+                cursor.executemany(cls.UPDATES[("name",)], [a._update_params(("name",)) for a in changed])
+                renamed.extend(a.name for a in changed)
+                unique = list(dict.fromkeys(
+                    name for a, name in zip(chunk, names) if not (isinstance(a, Author) and a.id)
+                ))
+                known = {}
+                if unique:
+                    cursor.execute(*queries.in_list(queries.AUTHOR_IDS_BY_NAMES, unique))
+                    known.update(cursor.fetchall())
+                new = [name for name in unique if name not in known]
+                cursor.executemany(queries.AUTHOR_INSERT, [(name,) for name in new])
+                known.update(zip(new, inserted_ids(conn, len(new))))
+                for author, name in zip(chunk, names):
+                    if isinstance(author, Author):
+                        if not author.id:
+                            author.id = known[name]
+                        author._mark_clean()
+                        instances.append(author)
+                        ids.append(author.id)
+                    else:
+                        ids.append(known[name])
+            conn.acknowledge_changes()
+        for name in renamed:
+            model_cache.invalidate(Author, name=name)
+        for author in instances:
+            model_cache.put(author, replace=True)
+        return ids
+
+    @classmethod
+    def find_by_ids(cls, ids):
+        """Return a dict of id -> Author for the given ids, batching the misses."""
+        found = {}
+        missing = []
+        for id in set(ids):
+            cached = model_cache.get(cls, id)
+            if cached is not None:
+                found[id] = cached
+            elif id is not None:
+                missing.append(id)
+        if not missing:
+            return found
+        with read_cursor(cls.from_row) as cursor:
+            for chunk in chunked(missing, IN_CHUNK_SIZE):
+                cursor.execute(*queries.in_list(queries.AUTHORS_BY_IDS, chunk))
+                for author in cursor.fetchall():
+                    found[author.id] = model_cache.put(author)
+        return found
 
     @classmethod
     def find_by_name(cls, name):
         """Find an author by name."""
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM authors WHERE name = ?", (name,))
-        row = cursor.fetchone()
-        conn.close()
-        return cls(row["name"], row["id"]) if row else None
-
-    def articles(self):
-        """Return all Article objects written by this author."""
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM articles WHERE author_id = ?", (self.id,))
-        rows = cursor.fetchall()
-        conn.close()
-        return [
-            Article(row["title"], row["author_id"], row["magazine_id"], id=row["id"])
-            for row in rows
+        cached = model_cache.get_by(cls, "name", name)
+        if cached is not None:
+            return cached
+        with read_cursor(cls.from_row) as cursor:
+            cursor.execute(queries.AUTHOR_BY_NAME, (name,))
+            author = cursor.fetchone()
+        return model_cache.put(author, "name") if author else None
+
+    def articles(self, include=()):
+        """
+        Return all Article objects written by this author.
+
+        ``include`` names relations to eager-load (see ``prefetch``); "author"
+        is always this instance.
+        """
+
+        def find(shard):
+            with read_cursor(Article.from_row, shard) as cursor:
+                cursor.execute(queries.ARTICLES_BY_AUTHOR, (self.id,))
+                return cursor.fetchall()
+
+        articles = [article for found in fan_out(find) for article in found]
+        for article in articles:
+            article._attach("author", self)
+        return prefetch(articles, *(name for name in include if name != "author"))
+
+    def iter_articles(self, batch_size=STREAM_BATCH_SIZE):
+        """Lazily yield this author's articles in id order, fetching ``batch_size`` rows at a time."""
+        streams = [
+            iter_rows(queries.ARTICLES_BY_AUTHOR_ORDERED, (self.id,), batch_size, Article.from_row, shard)
+            for shard in range(shard_count())
         ]
+        for article in heapq.merge(*streams, key=lambda article: article.id):
+            article._attach("author", self)
+            yield article
+
+    def articles_page(self, after_id=0, limit=50):
+        """
+        Return up to ``limit`` of this author's articles with ids above ``after_id``.
+
+        Keyset pagination: pass the last id of one page as ``after_id`` to get
+        the next, which stays an index seek however deep the page is.
+        """
+
+        def page(shard):
+            with read_cursor(Article.from_row, shard) as cursor:
+                cursor.execute(queries.ARTICLES_BY_AUTHOR_PAGE, (self.id, after_id, limit))
+                return cursor.fetchall()
+
+        return merge_by_id(fan_out(page), limit)
 
     def magazines(self):
         """Return all Magazine objects this author has written for."""
         from lib.models.magazine import Magazine  # Avoid circular import
 
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            SELECT DISTINCT m.* FROM magazines m
-            JOIN articles a ON m.id = a.magazine_id
-            WHERE a.author_id = ?
-            """,
-            (self.id,),
-        )
-        rows = cursor.fetchall()
-        conn.close()
-        return [
-            Magazine(row["name"], row["category"], id=row["id"]) for row in rows
-        ]
+        ids = adjacency_index.magazines_of(self.id)
+        found = Magazine.find_by_ids(ids)
+        return [found[id] for id in ids if id in found]
+
+    def iter_magazines(self, batch_size=STREAM_BATCH_SIZE):
+        """Lazily yield the magazines this author has written for, in id order."""
+        from lib.models.magazine import Magazine  # Avoid circular import
+
+        for ids in chunked(adjacency_index.magazines_of(self.id), batch_size):
+            found = Magazine.find_by_ids(ids)
+            yield from (found[id] for id in ids if id in found)
 
     def add_article(self, magazine, title):
         """Create and save a new article for this author in the given magazine."""
@@ -81,65 +241,86 @@ class Author:
 
     def topic_areas(self):
         """Return a list of unique magazine categories this author has written in."""
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            SELECT DISTINCT m.category FROM magazines m
-            JOIN articles a ON m.id = a.magazine_id
-            WHERE a.author_id = ?
-            """,
-            (self.id,),
-        )
-        rows = cursor.fetchall()
-        conn.close()
-        return [row["category"] for row in rows]
+        return adjacency_index.categories_of(self.id)
 
     @classmethod
-    def top_author(cls):
-        """Return the Author who has written the most articles."""
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            SELECT a.*, COUNT(ar.id) as article_count FROM authors a
-            JOIN articles ar ON a.id = ar.author_id
-            GROUP BY a.id
-            ORDER BY article_count DESC
-            LIMIT 1
-            """
-        )
-        row = cursor.fetchone()
-        conn.close()
-        return cls(row["name"], row["id"]) if row else None
+    def top_author(cls, rebuild=False):
+        """
+        Return the Author who has written the most articles.
+
+        Reads the trigger-maintained author_stats table; ``rebuild=True``
+        recomputes the summary tables from scratch first. The answer is
+        shared with other processes until the data changes (see
+        lib.db.query_cache). With sharded articles the per-shard counts are
+        summed.
+        """
+        if rebuild:
+            rebuild_aggregates()
+        rows = cached_rows("Author.top_author", ("name", "id"), cls._top_author_rows)
+        return cls.from_row(None, tuple(rows[0])) if rows else None
+
+    @classmethod
+    def _top_author_rows(cls):
+        if shard_count() == 1:
+            with read_cursor() as cursor:
+                return cursor.execute(queries.TOP_AUTHOR).fetchall()
+
+        def counts(shard):
+            with read_cursor(shard=shard) as cursor:
+                return cursor.execute(queries.AUTHOR_ARTICLE_COUNTS).fetchall()
+
+        totals = Counter()
+        for rows in fan_out(counts):
+            for author_id, count in rows:
+                totals[author_id] += count
+        # Ties go to the lower id, as in the unsharded query.
+        for author_id, _ in sorted(totals.items(), key=lambda item: (-item[1], item[0])):
+            author = cls.find_by_id(author_id)
+            if author is not None:
+                return [(author.name, author.id)]
+        return []
 
     @staticmethod
     def add_author_with_articles(author_name, articles_data):
         """
         Insert an author and related articles atomically in a transaction.
 
+        With sharded articles each database commits separately; see
+        ``shard_transactions()``.
+
         Parameters:
         - author_name (str): Name of the author
         - articles_data (list of dict): Each dict must have 'title' and 'magazine_id'
 
         Returns:
         - True if success, False if any error
+
+        A database still locked by another process after the transaction's
+        retries (see ``PooledConnection.begin()``) raises instead, so the
+        write isn't silently dropped.
         """
         try:
-            with transaction() as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    "INSERT INTO authors (name) VALUES (?) RETURNING id",
-                    (author_name,),
-                )
+            shards = {shard_for(article["magazine_id"]) for article in articles_data}
+            with shard_transactions({None} | shards) as conns:
+                cursor = conns[None].cursor()
+                cursor.execute(queries.AUTHOR_INSERT_RETURNING_ID, (author_name,))
                 author_id = cursor.fetchone()[0]
 
+                insert_articles(conns, [
+                    (article["title"], author_id, article["magazine_id"]) for article in articles_data
+                ])
                 for article in articles_data:
-                    cursor.execute(
-                        "INSERT INTO articles (title, author_id, magazine_id) VALUES (?, ?, ?)",
-                        (article["title"], author_id, article["magazine_id"]),
-                    )
+                    model_cache.invalidate(Article, title=article["title"])
+                model_cache.invalidate(Author, author_id, name=author_name)
+                for conn in conns.values():
+                    conn.acknowledge_changes()
+            adjacency_index.add_articles((author_id, a["magazine_id"]) for a in articles_data)
             return True
         except Exception as e:
+            if is_busy_error(e) or isinstance(e, PoolTimeoutError):
+                raise  # contention (see the pool's stats()), not a bad input
             print(f"Transaction failed: {e}")
             return False
+
+
+_set_name, _set_id = slot_setters(Author, ("name", "id"))
@@ -0,0 +1,162 @@
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+from lib.db.connection import add_write_listener
+
+CACHE_SIZE = 2048
+CACHE_TTL = 60.0  # seconds; bounds staleness from writes made by other processes
+
+
+class ModelCache:
+    """
+    Shared identity map plus a bounded LRU/TTL cache for model lookups.
+
+    Objects are cached under ``(model, "id", id)``. Lookups by ``name`` (authors
+    and magazines) or ``title`` (articles) are cached as ``(model, attr,
+    value) -> id`` pointers, so an object is only ever stored once and a
+    renamed object can't be returned for its old name. Names aren't unique,
+    so pointers are only set by the by-name lookups, which resolve to the
+    lowest id; saves drop the pointer for the name they wrote.
+
+    The identity map is a weak mapping ``(model, id) -> instance`` that
+    guarantees every load of the same row returns the same live instance,
+    even after its LRU entry has been evicted.
+    """
+
+    def __init__(self, max_size=CACHE_SIZE, ttl=CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._identity = weakref.WeakValueDictionary()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def _get(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _set(self, key, value, now):
+        self._entries[key] = (now + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def get(self, model, id):
+        """Return the cached instance of ``model`` with this id, or None."""
+        with self._lock:
+            obj = self._get((model.__name__, "id", id), time.monotonic())
+            self._stats["hits" if obj is not None else "misses"] += 1
+            return obj
+
+    def get_by(self, model, attr, value):
+        """Return the cached instance of ``model`` whose ``attr`` equals ``value``."""
+        with self._lock:
+            now = time.monotonic()
+            obj = None
+            id = self._get((model.__name__, attr, value), now)
+            if id is not None:
+                obj = self._get((model.__name__, "id", id), now)
+                if obj is not None and getattr(obj, attr) != value:
+                    obj = None
+            self._stats["hits" if obj is not None else "misses"] += 1
+            return obj
+
+    def put(self, obj, *attrs, replace=False):
+        """
+        Cache ``obj`` (and pointers to it for the given ``attrs``).
+
+        If another live instance of the same row is already in the identity
+        map, it is refreshed from ``obj`` (keeping its unsaved edits; see
+        ``_refresh``) and returned instead, so callers
+        should always use the return value. With ``replace=True`` (used by
+        ``save()``, where ``obj`` is authoritative) ``obj`` itself becomes the
+        canonical instance.
+        """
+        if obj.id is None:
+            return obj
+        name = type(obj).__name__
+        with self._lock:
+            canonical = self._identity.get((name, obj.id))
+            if canonical is None or replace:
+                canonical = self._identity[(name, obj.id)] = obj
+            elif canonical is not obj:
+                self._refresh(canonical, obj)
+            now = time.monotonic()
+            self._set((name, "id", obj.id), canonical, now)
+            for attr in attrs:
+                self._set((name, attr, getattr(canonical, attr)), canonical.id, now)
+        return canonical
+
+    @staticmethod
+    def _refresh(canonical, loaded):
+        """
+        Bring ``canonical`` up to date with ``loaded``, a fresh copy of its row.
+
+        Columns with unsaved local edits keep them (they stay dirty against
+        the new values); the rest take the loaded values. Either way the
+        loaded values become what ``save()`` compares against.
+        """
+        known = getattr(canonical, "_saved", ()) is not None  # unset (clean) or a snapshot
+        dirty = set(canonical.dirty_fields()) if known else set()
+        for field in loaded.FIELDS:
+            if field not in dirty:
+                setattr(canonical, field, getattr(loaded, field))
+        if dirty:
+            canonical._saved = loaded._values()
+        else:
+            canonical._mark_clean()
+
+    def invalidate(self, model, id=None, **unique):
+        """Drop the cached entry for ``model`` ``id`` and any ``attr=value`` pointers."""
+        name = model.__name__
+        with self._lock:
+            if id is not None:
+                self._entries.pop((name, "id", id), None)
+            for attr, value in unique.items():
+                self._entries.pop((name, attr, value), None)
+            self._stats["invalidations"] += 1
+
+    def clear(self):
+        """Forget every cached object (live instances stay in the identity map)."""
+        with self._lock:
+            self._entries.clear()
+            self._stats["invalidations"] += 1
+
+    def stats(self):
+        """Return hit/miss counters and the current hit rate."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+model_cache = ModelCache()
+
+# Writes that bypass the models (raw SQL through get_connection()) can't be
+# invalidated precisely, so they flush the whole cache.
+add_write_listener(model_cache.clear)
+
+
+def configure_cache(max_size=None, ttl=None):
+    """Resize the shared model cache or change its TTL; clears it either way."""
+    if max_size is not None:
+        model_cache.max_size = max_size
+    if ttl is not None:
+        model_cache.ttl = ttl
+    model_cache.clear()
+
+
+def cache_stats():
+    return model_cache.stats()
@@ -0,0 +1,70 @@
+"""
+Dirty-field tracking shared by the models.
+
+Each instance remembers the column values it was loaded with or last
+saved, so ``save()`` can UPDATE just the columns that changed and skip an
+unchanged object without touching the database. An instance built by
+hand with an ``id`` has no such record and writes every column.
+
+The record is taken lazily: a clean instance (just loaded by a
+``from_row`` row factory, or just saved) leaves ``_saved`` unset, and
+the first write to one of its columns snapshots the values beforehand.
+Loading a row then costs no more than setting its slots.
+"""
+
+_setattr = object.__setattr__
+_delattr = object.__delattr__
+
+
+def slot_setters(cls, names):
+    """The slot descriptors' setters for ``names``, for row factories that skip ``__init__``."""
+    return tuple(getattr(cls, name).__set__ for name in names)
+
+
+class DirtyTracking:
+    """
+    Mixin for models with ``FIELDS`` (id first), ``UPDATES`` and a ``_saved`` slot.
+
+    ``__init__`` must set ``_saved`` (to None) before any column.
+    """
+
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        if name in self.FIELDS:
+            try:
+                self._saved
+            except AttributeError:
+                _setattr(self, "_saved", self._values())
+        _setattr(self, name, value)
+
+    def _values(self):
+        return tuple(getattr(self, field) for field in self.FIELDS[1:])
+
+    def _mark_clean(self):
+        """Record that the database holds the current column values."""
+        try:
+            _delattr(self, "_saved")
+        except AttributeError:
+            pass
+
+    def dirty_fields(self):
+        """Columns changed since the last load or save, in FIELDS order; all of them if unknown."""
+        columns = self.FIELDS[1:]
+        try:
+            saved = self._saved
+        except AttributeError:
+            return ()  # no column written since
+        if not self.id or saved is None:
+            return columns
+        return tuple(column for column, value in zip(columns, saved) if getattr(self, column) != value)
+
+    def is_dirty(self):
+        return bool(self.dirty_fields())
+
+    def _insert_params(self):
+        return self._values()
+
+    def _update_params(self, fields):
+        """Parameters for ``UPDATES[fields]``: the new values, then the id."""
+        return tuple(getattr(self, field) for field in fields) + (self.id,)
@@ -1,121 +1,347 @@
 # lib/models/magazine.py
 
-from lib.db.connection import get_connection, transaction
-from lib.models.article import Article
+import sqlite3
+from bisect import bisect_right
+
+from lib.db import queries
+from lib.db.connection import (
+    BULK_CHUNK_SIZE,
+    IN_CHUNK_SIZE,
+    PoolTimeoutError,
+    STREAM_BATCH_SIZE,
+    chunked,
+    fan_out,
+    inserted_ids,
+    is_busy_error,
+    iter_rows,
+    read_cursor,
+    shard_count,
+    shard_for,
+    shard_transactions,
+    transaction,
+)
+from lib.db.aggregates import rebuild_aggregates
+from lib.db.query_cache import cached_rows
+from lib.models.adjacency import adjacency_index
+from lib.models.article import Article, insert_articles, prefetch
+from lib.models.cache import model_cache
+from lib.models.dirty import DirtyTracking, slot_setters
+
+class Magazine(DirtyTracking):
+    __slots__ = ("id", "name", "category", "_saved", "__weakref__")
+
+    FIELDS = ("id", "name", "category")
+    # SELECT list in __init__'s positional order, so rows map straight onto it.
+    COLUMNS = queries.MAGAZINE_COLUMNS
+    INSERT = queries.MAGAZINE_INSERT
+    UPDATES = queries.MAGAZINE_UPDATES
 
-class Magazine:
     def __init__(self, name, category, id=None):
+        self._saved = None  # no known database values yet; must precede the columns, see dirty.py
         self.id = id
         self.name = name
         self.category = category
 
+    @classmethod
+    def from_row(cls, cursor, row):
+        """
+        sqlite3 row factory: build a Magazine from a ``SELECT COLUMNS`` tuple.
+
+        Fills the slots directly; the object is clean until a column is
+        written (see dirty.py).
+        """
+        name, category, id = row
+        obj = object.__new__(cls)
+        _set_name(obj, name)
+        _set_category(obj, category)
+        _set_id(obj, id)
+        return obj
+
+    def _after_save(self, inserted):
+        """Mark the magazine clean and refresh in-process caches once its save has committed."""
+        recategorized = "category" in self.dirty_fields()
+        self._mark_clean()
+        model_cache.put(self, replace=True)
+        # Names aren't unique, so only find_by_name() (lowest id wins) sets the pointer.
+        model_cache.invalidate(Magazine, name=self.name)
+        if recategorized:
+            adjacency_index.set_categories({self.id: self.category})
+
     def save(self):
         """Insert or update a magazine record in the database."""
-        conn = get_connection()
-        cursor = conn.cursor()
-        if self.id:
-            cursor.execute(
-                "UPDATE magazines SET name = ?, category = ? WHERE id = ?",
-                (self.name, self.category, self.id)
-            )
-        else:
-            cursor.execute(
-                "INSERT INTO magazines (name, category) VALUES (?, ?)",
-                (self.name, self.category)
-            )
-            self.id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        fields = self.dirty_fields()
+        if not fields:
+            return
+        inserted = not self.id
+        with transaction() as conn:
+            cursor = conn.cursor()
+            if inserted:
+                cursor.execute(self.INSERT, self._insert_params())
+                self.id = cursor.lastrowid
+            else:
+                cursor.execute(self.UPDATES[fields], self._update_params(fields))
+            conn.acknowledge_changes()
+        self._after_save(inserted)
 
     @classmethod
     def find_by_id(cls, id):
         """Find a magazine by its ID."""
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM magazines WHERE id = ?", (id,))
-        row = cursor.fetchone()
-        conn.close()
-        return cls(row["name"], row["category"], row["id"]) if row else None
+        cached = model_cache.get(cls, id)
+        if cached is not None:
+            return cached
+        with read_cursor(cls.from_row) as cursor:
+            cursor.execute(queries.MAGAZINE_BY_ID, (id,))
+            magazine = cursor.fetchone()
+        return model_cache.put(magazine) if magazine else None
+
+    @classmethod
+    def bulk_upsert(cls, magazines, chunk_size=BULK_CHUNK_SIZE):
+        """
+        Insert new magazines and update the category of existing ones (by name).
+
+        ``magazines`` may be any iterable, including a generator, of Magazine
+        instances or dicts with 'name' and 'category'. Rows are written with
+        executemany in ``chunk_size`` batches inside one transaction. Magazine
+        instances get their ``id`` set; one that already has an id keeps it,
+        and its changes are written to that row instead of being matched.
+
+        Returns:
+            list[int]: The id for each input magazine, in input order.
+        """
+        ids = []
+        categories = {}
+        instances = []
+        renamed = []
+        with transaction() as conn:
+            cursor = conn.cursor()
+            for chunk in chunked(magazines, chunk_size):
+                for magazine in chunk:
+                    if isinstance(magazine, Magazine) and magazine.id:
+                        fields = magazine.dirty_fields()
+                        if fields:
+                            cursor.execute(cls.UPDATES[fields], magazine._update_params(fields))
+                            renamed.append(magazine.name)
+                        categories[magazine.id] = magazine.category
+                rows = [
+                    (m.name, m.category) if isinstance(m, Magazine) else (m["name"], m["category"])
+                    for m in chunk
+                    if not (isinstance(m, Magazine) and m.id)
+                ]
+                latest = dict(rows)  # the last category given for a name wins
+                known = {}
+                if latest:
+                    cursor.execute(*queries.in_list(queries.MAGAZINE_IDS_BY_NAMES, latest))
+                    known.update(cursor.fetchall())
+                cursor.executemany(
+                    queries.MAGAZINE_UPDATE_CATEGORY,
+                    [(latest[name], id) for name, id in known.items()],
+                )
+                for id in known.values():
+                    model_cache.invalidate(Magazine, id)
+                new = [name for name in latest if name not in known]
+                cursor.executemany(
+                    queries.MAGAZINE_INSERT,
+                    [(name, latest[name]) for name in new],
+                )
+                known.update(zip(new, inserted_ids(conn, len(new))))
+                categories.update((id, latest[name]) for name, id in known.items())
+                for magazine in chunk:
+                    if isinstance(magazine, Magazine):
+                        if not magazine.id:
+                            magazine.id = known[magazine.name]
+                            # Another entry for the same name may have set the category written.
+                            magazine.category = latest[magazine.name]
+                        magazine._mark_clean()
+                        instances.append(magazine)
+                        ids.append(magazine.id)
+                    else:
+                        ids.append(known[magazine["name"]])
+            conn.acknowledge_changes()
+        for name in renamed:
+            model_cache.invalidate(Magazine, name=name)
+        for magazine in instances:
+            model_cache.put(magazine, replace=True)
+        adjacency_index.set_categories(categories)
+        return ids
+
+    @classmethod
+    def find_by_ids(cls, ids):
+        """Return a dict of id -> Magazine for the given ids, batching the misses."""
+        found = {}
+        missing = []
+        for id in set(ids):
+            cached = model_cache.get(cls, id)
+            if cached is not None:
+                found[id] = cached
+            elif id is not None:
+                missing.append(id)
+        if not missing:
+            return found
+        with read_cursor(cls.from_row) as cursor:
+            for chunk in chunked(missing, IN_CHUNK_SIZE):
+                cursor.execute(*queries.in_list(queries.MAGAZINES_BY_IDS, chunk))
+                for magazine in cursor.fetchall():
+                    found[magazine.id] = model_cache.put(magazine)
+        return found
 
     @classmethod
     def find_by_name(cls, name):
         """Find a magazine by its name."""
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM magazines WHERE name = ?", (name,))
-        row = cursor.fetchone()
-        conn.close()
-        return cls(row["name"], row["category"], row["id"]) if row else None
-
-    def articles(self):
-        """Return all articles published in this magazine."""
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM articles WHERE magazine_id = ?", (self.id,))
-        rows = cursor.fetchall()
-        conn.close()
-        return [Article(row["title"], row["author_id"], row["magazine_id"], id=row["id"]) for row in rows]
+        cached = model_cache.get_by(cls, "name", name)
+        if cached is not None:
+            return cached
+        with read_cursor(cls.from_row) as cursor:
+            cursor.execute(queries.MAGAZINE_BY_NAME, (name,))
+            magazine = cursor.fetchone()
+        return model_cache.put(magazine, "name") if magazine else None
+
+    def articles(self, include=()):
+        """
+        Return all articles published in this magazine.
+
+        ``include`` names relations to eager-load (see ``prefetch``), e.g.
+        ``magazine.articles(include=["author"])``.
+        """
+        with read_cursor(Article.from_row, shard_for(self.id)) as cursor:
+            cursor.execute(queries.ARTICLES_BY_MAGAZINE, (self.id,))
+            articles = cursor.fetchall()
+        for article in articles:
+            article._attach("magazine", self)
+        return prefetch(articles, *(name for name in include if name != "magazine"))
+
+    def iter_articles(self, batch_size=STREAM_BATCH_SIZE):
+        """Lazily yield this magazine's articles in id order, fetching ``batch_size`` rows at a time."""
+        for article in iter_rows(
+            queries.ARTICLES_BY_MAGAZINE_ORDERED, (self.id,), batch_size, Article.from_row,
+            shard_for(self.id),
+        ):
+            article._attach("magazine", self)
+            yield article
+
+    def articles_page(self, after_id=0, limit=50):
+        """
+        Return up to ``limit`` of this magazine's articles with ids above ``after_id``.
+
+        Keyset pagination: pass the last id of one page as ``after_id`` to get
+        the next page.
+        """
+        with read_cursor(Article.from_row, shard_for(self.id)) as cursor:
+            cursor.execute(queries.ARTICLES_BY_MAGAZINE_PAGE, (self.id, after_id, limit))
+            articles = cursor.fetchall()
+        return articles
 
     def contributors(self):
         """Return distinct authors who have written for this magazine."""
         from lib.models.author import Author
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT DISTINCT a.* FROM authors a
-            JOIN articles ar ON a.id = ar.author_id
-            WHERE ar.magazine_id = ?
-        """, (self.id,))
-        rows = cursor.fetchall()
-        conn.close()
-        return [Author(row["name"], row["id"]) for row in rows]
+        ids = adjacency_index.authors_of(self.id)
+        found = Author.find_by_ids(ids)
+        return [found[id] for id in ids if id in found]
+
+    def iter_contributors(self, batch_size=STREAM_BATCH_SIZE):
+        """Lazily yield the distinct authors who have written for this magazine, in id order."""
+        from lib.models.author import Author
+        for ids in chunked(adjacency_index.authors_of(self.id), batch_size):
+            found = Author.find_by_ids(ids)
+            yield from (found[id] for id in ids if id in found)
+
+    def contributors_page(self, after_id=0, limit=50):
+        """Return up to ``limit`` contributors with ids above ``after_id`` (keyset pagination)."""
+        from lib.models.author import Author
+        ids = adjacency_index.authors_of(self.id)
+        ids = ids[bisect_right(ids, after_id):][:limit]
+        found = Author.find_by_ids(ids)
+        return [found[id] for id in ids if id in found]
 
     def authors(self):
         """Return raw rows of authors who wrote for this magazine (internal use)."""
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT DISTINCT a.* FROM authors a
-            JOIN articles ar ON a.id = ar.author_id
-            WHERE ar.magazine_id = ?
-        """, (self.id,))
-        return cursor.fetchall()
+        ids = adjacency_index.authors_of(self.id)
+        rows = []
+        with read_cursor() as cursor:
+            for chunk in chunked(ids, IN_CHUNK_SIZE):
+                cursor.execute(*queries.in_list(queries.AUTHOR_ROWS_BY_IDS, chunk))
+                rows.extend(cursor.fetchall())
+        return rows
 
     @classmethod
-    def magazines_with_multiple_authors(cls):
+    def magazines_with_multiple_authors(cls, rebuild=False):
         """
         Return magazines that have articles written by more than one unique author.
+
+        Reads the trigger-maintained magazine_stats table; ``rebuild=True``
+        recomputes the summary tables from scratch first. The rows are shared
+        with other processes until the data changes (see lib.db.query_cache).
         """
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT m.* FROM magazines m
-            JOIN articles a ON m.id = a.magazine_id
-            GROUP BY m.id
-            HAVING COUNT(DISTINCT a.author_id) > 1
-        """)
-        return cursor.fetchall()
+        if rebuild:
+            rebuild_aggregates()
+        return cached_rows(
+            "Magazine.magazines_with_multiple_authors", ("id", "name", "category"),
+            cls._multiple_author_rows,
+        )
+
+    @classmethod
+    def _multiple_author_rows(cls):
+        if shard_count() == 1:
+            with read_cursor() as cursor:
+                cursor.execute(queries.MAGAZINES_WITH_MULTIPLE_AUTHORS)
+                return cursor.fetchall()
+
+        # A magazine's articles, and so its stats, are all on one shard.
+        def multi_author(shard):
+            with read_cursor(shard=shard) as cursor:
+                return [row[0] for row in cursor.execute(queries.MULTI_AUTHOR_MAGAZINE_IDS)]
+
+        ids = sorted(id for ids in fan_out(multi_author) for id in ids)
+        rows = []
+        with read_cursor() as cursor:
+            for chunk in chunked(ids, IN_CHUNK_SIZE):
+                cursor.execute(*queries.in_list(queries.MAGAZINE_ROWS_BY_IDS, chunk))
+                rows.extend(cursor.fetchall())
+        return rows
 
     @classmethod
-    def article_counts(cls):
+    def article_counts(cls, rebuild=False):
         """
         Return a list of magazines and the number of articles they contain.
+
+        Reads the trigger-maintained magazine_stats table; ``rebuild=True``
+        recomputes the summary tables from scratch first. The rows are shared
+        with other processes until the data changes (see lib.db.query_cache).
         """
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT m.id, m.name, COUNT(a.id) as article_count
-            FROM magazines m
-            LEFT JOIN articles a ON m.id = a.magazine_id
-            GROUP BY m.id
-        """)
-        return cursor.fetchall()
+        if rebuild:
+            rebuild_aggregates()
+        return cached_rows(
+            "Magazine.article_counts", ("id", "name", "article_count"), cls._article_count_rows
+        )
+
+    @classmethod
+    def _article_count_rows(cls):
+        if shard_count() == 1:
+            with read_cursor() as cursor:
+                cursor.execute(queries.MAGAZINE_ARTICLE_COUNTS)
+                return cursor.fetchall()
+
+        def totals(shard):
+            with read_cursor(shard=shard) as cursor:
+                return cursor.execute(queries.MAGAZINE_ARTICLE_TOTALS).fetchall()
+
+        counts = {id: count for rows in fan_out(totals) for id, count in rows}
+        with read_cursor() as cursor:
+            cursor.execute(queries.MAGAZINE_NAMES)
+            # Same columns as MAGAZINE_ARTICLE_COUNTS, with the counts filled in.
+            return [
+                sqlite3.Row(cursor, (id, name, counts.get(id, 0)))
+                for id, name, _ in cursor.fetchall()
+            ]
 
     @staticmethod
     def add_magazine_with_articles(name, category, articles_data):
         """
         Adds a new magazine along with its associated articles in a single transaction.
 
+        With sharded articles they go to the magazine's shard in a second
+        transaction, after the magazine has committed; if that one fails the
+        magazine is left in place without the articles (and False returned).
+
         Args:
             name (str): Name of the magazine.
             category (str): Category of the magazine.
@@ -123,22 +349,40 @@ class Magazine:
 
         Returns:
             bool: True if successful, False otherwise.
+
+        Raises:
+            sqlite3.OperationalError: The database was still locked by another
+                process after the transaction's retries.
         """
         try:
+            sharded = shard_count() > 1
             with transaction() as conn:
                 cursor = conn.cursor()
-                cursor.execute(
-                    "INSERT INTO magazines (name, category) VALUES (?, ?) RETURNING id",
-                    (name, category)
-                )
+                cursor.execute(queries.MAGAZINE_INSERT_RETURNING_ID, (name, category))
                 magazine_id = cursor.fetchone()[0]
+                rows = [
+                    (article['title'], article['author_id'], magazine_id) for article in articles_data
+                ]
+                if not sharded:
+                    insert_articles({shard_for(magazine_id): conn}, rows)
+                model_cache.invalidate(Magazine, magazine_id, name=name)
+                conn.acknowledge_changes()
+            adjacency_index.set_categories({magazine_id: category})
 
-                for article in articles_data:
-                    cursor.execute(
-                        "INSERT INTO articles (title, author_id, magazine_id) VALUES (?, ?, ?)",
-                        (article['title'], article['author_id'], magazine_id)
-                    )
+            if sharded:
+                shard = shard_for(magazine_id)
+                with shard_transactions([shard]) as conns:
+                    insert_articles(conns, rows)
+                    conns[shard].acknowledge_changes()
+            for article in articles_data:
+                model_cache.invalidate(Article, title=article['title'])
+            adjacency_index.add_articles((a['author_id'], magazine_id) for a in articles_data)
             return True
         except Exception as e:
+            if is_busy_error(e) or isinstance(e, PoolTimeoutError):
+                raise  # contention (see the pool's stats()), not a bad input
             print(f"Transaction failed: {e}")
             return False
+
+
+_set_name, _set_category, _set_id = slot_setters(Magazine, ("name", "category", "id"))
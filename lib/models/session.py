@@ -0,0 +1,152 @@
+"""
+Unit of work over one pooled connection.
+
+A session leases the writer connection for the whole ``with`` block, so
+every model read and write in it shares that connection instead of taking
+a lease per call, and reads see the session's own committed work. Objects
+passed to ``add()`` are written together at ``commit()``: one transaction,
+one executemany per model and statement, started with BEGIN IMMEDIATE so
+it waits out (and retries) another process's write lock up front; see
+``PooledConnection.begin()``. Unchanged objects are skipped
+and changed ones only write the columns that changed (see dirty.py). A
+block that raises writes nothing, and the connection is released however
+the block ends.
+
+    with Session() as session:
+        author = Author("Jane Doe")
+        session.add(author)
+        session.add(Article("Hello", author, magazine_id))
+
+An Article may reference an Author or Magazine added to the same session;
+its ``author_id``/``magazine_id`` is filled in at commit. Sessions belong to
+the thread that opened them, and with sharded articles (see
+``lib.db.connection.configure``) only save authors and magazines.
+"""
+from collections import defaultdict
+
+from lib.db.connection import get_connection, inserted_ids, require_unsharded
+from lib.models.article import Article
+from lib.models.author import Author
+from lib.models.magazine import Magazine
+
+# Parents first, so articles can point at authors and magazines inserted in the same flush.
+FLUSH_ORDER = (Author, Magazine, Article)
+
+
+class Session:
+    """Collect model saves and write them in one transaction on one connection."""
+
+    def __init__(self):
+        self._conn = None
+        self._pending = {}
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.commit()
+            else:
+                self.rollback()
+        finally:
+            self.close()
+
+    def open(self):
+        """Lease the writer connection for the session, if not already held."""
+        if self._conn is None:
+            self._conn = get_connection()
+        return self._conn
+
+    def add(self, obj):
+        """Schedule ``obj`` (an Author, Magazine or Article) to be saved at commit."""
+        if type(obj) not in FLUSH_ORDER:
+            raise TypeError(f"Cannot add {type(obj).__name__} to a session.")
+        self._pending[id(obj)] = obj
+
+    def add_all(self, objs):
+        for obj in objs:
+            self.add(obj)
+
+    def commit(self):
+        """Insert or update every pending object in one transaction."""
+        if not self._pending:
+            return
+        pending, self._pending = list(self._pending.values()), {}
+        if any(type(obj) is Article for obj in pending):
+            require_unsharded("Saving articles in a Session")
+        conn = self.open()
+        saved = []  # (obj, inserted), appended as soon as each statement runs
+        resolved = []  # (article, author_id, magazine_id) as they were before the flush
+        try:
+            conn.begin()
+            for model in FLUSH_ORDER:
+                objs = [obj for obj in pending if type(obj) is model]
+                if objs:
+                    self._flush(conn, model, objs, saved, resolved)
+            conn.acknowledge_changes()
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            # Nothing was written, so undo everything the flush did to the objects.
+            for obj, inserted in saved:
+                if inserted:
+                    obj.id = None
+            for article, author_id, magazine_id in resolved:
+                article.author_id, article.magazine_id = author_id, magazine_id
+            raise
+        for obj, inserted in saved:
+            obj._after_save(inserted)
+
+    def rollback(self):
+        """Discard pending objects without writing them."""
+        self._pending = {}
+
+    def close(self):
+        """Discard pending objects and release the connection."""
+        self._pending = {}
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            conn.close()
+
+    @staticmethod
+    def _flush(conn, model, objs, saved, resolved):
+        """Write ``objs`` of one model, recording what it changes in ``saved`` and ``resolved``."""
+        if model is Article:
+            for article in objs:
+                resolved.append((article, article.author_id, article.magazine_id))
+                article.author_id = _resolve(article.author_id)
+                article.magazine_id = _resolve(article.magazine_id)
+        new = []
+        dirty = defaultdict(list)  # changed columns -> objects, one executemany each
+        for obj in objs:
+            if not obj.id:
+                new.append(obj)
+            else:
+                fields = obj.dirty_fields()
+                if fields:
+                    dirty[fields].append(obj)
+        if new:
+            conn.executemany(model.INSERT, [obj._insert_params() for obj in new])
+            for obj, id in zip(new, inserted_ids(conn, len(new))):
+                obj.id = id
+                saved.append((obj, True))
+        for fields, group in dirty.items():
+            conn.executemany(model.UPDATES[fields], [obj._update_params(fields) for obj in group])
+            saved.extend((obj, False) for obj in group)
+
+
+def save_all(objs):
+    """Save many Authors, Magazines and Articles in one transaction (see Session)."""
+    with Session() as session:
+        session.add_all(objs)
+
+
+def _resolve(ref):
+    """An Author/Magazine reference becomes its id; it must have been saved by now."""
+    if isinstance(ref, (Author, Magazine)):
+        if not ref.id:
+            raise ValueError(f"{type(ref).__name__} {ref.name!r} has not been saved or added.")
+        return ref.id
+    return ref
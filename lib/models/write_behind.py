@@ -0,0 +1,197 @@
+"""
+Write-behind buffering for ``Article.save()``.
+
+With write-behind enabled, ``save()`` hands the article to a background
+writer thread and returns a ``concurrent.futures.Future`` that resolves to
+its id. The writer drains the queue in group commits: up to
+``WRITE_BEHIND_BATCH`` saves, or however many arrive within
+``WRITE_BEHIND_WINDOW`` of the first, share one transaction (and one
+fsync). Each save runs under its own savepoint, so a bad row fails only its
+own future. Queued saves are flushed by ``flush()``,
+``disable_write_behind()`` and at interpreter exit.
+
+    enable_write_behind()
+    futures = [Article(title, author_id, magazine_id).save() for title in titles]
+    ids = [f.result() for f in futures]
+"""
+import atexit
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+from lib.db.connection import require_unsharded, transaction
+
+WRITE_BEHIND_BATCH = 500  # saves per group commit
+WRITE_BEHIND_WINDOW = 0.01  # seconds to wait for more saves after the first
+MAX_QUEUED = 10_000  # save() blocks once this many are waiting
+
+_FLUSH = object()
+_STOP = object()
+
+
+class WriteBehindQueue:
+    """Background writer that group-commits queued Article saves."""
+
+    def __init__(self, batch_size=WRITE_BEHIND_BATCH, window=WRITE_BEHIND_WINDOW,
+                 max_queued=MAX_QUEUED):
+        self.batch_size = batch_size
+        self.window = window
+        self._queue = queue.Queue(max_queued)
+        # Held across a blocking put() so close() can't slip a _STOP in ahead
+        # of a save; the writer thread must never need it, or a full queue
+        # would deadlock. It takes _stats_lock instead.
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+        self._stats = {"saves": 0, "failed": 0, "commits": 0}
+
+    def submit(self, article):
+        """Queue ``article`` for the next group commit; returns a Future of its id."""
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Write-behind queue is closed.")
+            if self._thread is None:
+                # A daemon thread, so interpreter shutdown reaches the atexit flush.
+                self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                self._thread.start()
+            self._queue.put((article, future))
+        return future
+
+    def flush(self, timeout=None):
+        """Block until every save submitted so far has been committed or has failed."""
+        with self._lock:
+            if self._thread is None or self._closed:
+                return
+            marker = Future()
+            self._queue.put((_FLUSH, marker))
+        marker.result(timeout)
+
+    def close(self, timeout=None):
+        """Flush what is queued and stop the writer thread."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+            if thread is not None:
+                self._queue.put((_STOP, None))
+        if thread is not None:
+            thread.join(timeout)
+
+    def stats(self):
+        """Return save/commit counters; saves per commit is the group-commit factor."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["queued"] = self._queue.qsize()
+        return stats
+
+    def _run(self):
+        while True:
+            batch, markers, stop = self._collect()
+            if batch:
+                self._commit(batch)
+            for marker in markers:
+                marker.set_result(None)
+            if stop:
+                return
+
+    def _collect(self):
+        """Take the next group: until batch_size saves, the window closes, or a flush/stop."""
+        batch, markers = [], []
+        item = self._queue.get()
+        deadline = time.monotonic() + self.window
+        while True:
+            article, future = item
+            if article is _STOP:
+                return batch, markers, True
+            if article is _FLUSH:
+                markers.append(future)
+                return batch, markers, False
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                return batch, markers, False
+            try:
+                item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                return batch, markers, False
+
+    def _commit(self, batch):
+        saved, failed, inserted = [], [], []
+        try:
+            with transaction() as conn:
+                cursor = conn.cursor()
+                for article, future in batch:
+                    cursor.execute("SAVEPOINT write_behind")
+                    try:
+                        if article.id:
+                            fields = article.dirty_fields()
+                            if fields:
+                                cursor.execute(article.UPDATES[fields], article._update_params(fields))
+                            saved.append((article, future, False))
+                        else:
+                            cursor.execute(article.INSERT, article._insert_params())
+                            # Set now so a second queued save of the same object updates.
+                            article.id = cursor.lastrowid
+                            inserted.append(article)
+                            saved.append((article, future, True))
+                    except sqlite3.Error as e:
+                        cursor.execute("ROLLBACK TO write_behind")
+                        failed.append((future, e))
+                    cursor.execute("RELEASE write_behind")
+                conn.acknowledge_changes()
+        except Exception as e:
+            for article in inserted:
+                article.id = None
+            for _, future in batch:
+                future.set_exception(e)
+            with self._stats_lock:
+                self._stats["failed"] += len(batch)
+            return
+
+        for article, future, was_inserted in saved:
+            article._after_save(was_inserted)
+            future.set_result(article.id)
+        for future, e in failed:
+            future.set_exception(e)
+        with self._stats_lock:
+            self._stats["saves"] += len(saved)
+            self._stats["failed"] += len(failed)
+            self._stats["commits"] += 1
+
+
+_write_behind = None
+_write_behind_lock = threading.Lock()
+
+
+def enable_write_behind(batch_size=None, window=None):
+    """Route ``Article.save()`` through a background group-commit writer."""
+    global _write_behind
+    require_unsharded("Write-behind")
+    with _write_behind_lock:
+        if _write_behind is None:
+            _write_behind = WriteBehindQueue(
+                WRITE_BEHIND_BATCH if batch_size is None else batch_size,
+                WRITE_BEHIND_WINDOW if window is None else window,
+            )
+        return _write_behind
+
+
+def disable_write_behind():
+    """Flush queued saves, stop the writer thread and make ``save()`` synchronous again."""
+    global _write_behind
+    with _write_behind_lock:
+        write_behind, _write_behind = _write_behind, None
+    if write_behind is not None:
+        write_behind.close()
+
+
+def current_queue():
+    """Return the active WriteBehindQueue, or None when saves are synchronous."""
+    return _write_behind
+
+
+atexit.register(disable_write_behind)
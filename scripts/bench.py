@@ -0,0 +1,147 @@
+"""
+Benchmark the model layer against a synthetic dataset.
+
+Seeds a fresh database (lib/db/seed.py), times each model operation and
+prints p50/p95/p99 latency and throughput as JSON. Pass --compare with the
+JSON of an earlier run to print per-operation p50 ratios.
+
+Usage: python -m scripts.bench [--articles N] [--output run.json] [--compare base.json]
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from lib.db.connection import configure, pool_stats, warm_up
+from lib.db.seed import seed
+from lib.models.article import Article
+from lib.models.author import Author
+from lib.models.cache import cache_stats, configure_cache
+from lib.models.magazine import Magazine
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def time_operation(fn, iterations):
+    timings = []
+    start = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        fn(i)
+        timings.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+    timings.sort()
+    return {
+        "iterations": iterations,
+        "p50_ms": round(percentile(timings, 50) * 1000, 4),
+        "p95_ms": round(percentile(timings, 95) * 1000, 4),
+        "p99_ms": round(percentile(timings, 99) * 1000, 4),
+        "ops_per_sec": round(iterations / elapsed, 1) if elapsed else None,
+    }
+
+
+def operations(data, rng):
+    """Return ``{name: (fn(i), iterations_scale)}`` for every benchmarked call."""
+    author_ids, magazine_ids, article_ids = data["author_ids"], data["magazine_ids"], data["article_ids"]
+    authors = Author.find_by_ids(author_ids[:50])
+    magazines = Magazine.find_by_ids(magazine_ids[:20])
+
+    def pick_author(i):
+        return authors[author_ids[i % len(authors)]]
+
+    def pick_magazine(i):
+        return magazines[magazine_ids[i % len(magazines)]]
+
+    def add_author(i):
+        Author.add_author_with_articles(
+            f"Bench Author {time.perf_counter_ns()}",
+            [{"title": f"Bench {i}.{n}", "magazine_id": rng.choice(magazine_ids)} for n in range(5)],
+        )
+
+    def add_magazine(i):
+        Magazine.add_magazine_with_articles(
+            f"Bench Magazine {time.perf_counter_ns()}",
+            "Bench",
+            [{"title": f"Bench {i}.{n}", "author_id": rng.choice(author_ids)} for n in range(5)],
+        )
+
+    return {
+        "author.find_by_id": (lambda i: Author.find_by_id(rng.choice(author_ids)), 1.0),
+        "magazine.find_by_id": (lambda i: Magazine.find_by_id(rng.choice(magazine_ids)), 1.0),
+        "article.find_by_id": (lambda i: Article.find_by_id(rng.choice(article_ids)), 1.0),
+        "author.find_by_name": (lambda i: Author.find_by_name(f"Author {rng.randrange(len(author_ids))}"), 1.0),
+        "magazine.find_by_name": (lambda i: Magazine.find_by_name(f"Magazine {rng.randrange(len(magazine_ids))}"), 1.0),
+        "author.articles": (lambda i: pick_author(i).articles(), 0.2),
+        "author.magazines": (lambda i: pick_author(i).magazines(), 0.2),
+        "author.topic_areas": (lambda i: pick_author(i).topic_areas(), 0.2),
+        "magazine.articles": (lambda i: pick_magazine(i).articles(), 0.1),
+        "magazine.contributors": (lambda i: pick_magazine(i).contributors(), 0.1),
+        "author.top_author": (lambda i: Author.top_author(), 0.1),
+        "magazine.article_counts": (lambda i: Magazine.article_counts(), 0.1),
+        "magazine.magazines_with_multiple_authors": (lambda i: Magazine.magazines_with_multiple_authors(), 0.1),
+        "author.add_author_with_articles": (add_author, 0.1),
+        "magazine.add_magazine_with_articles": (add_magazine, 0.1),
+    }
+
+
+def compare(report, baseline):
+    """Print the p50 ratio (current / baseline) for each shared operation."""
+    for name, result in report["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if base and base["p50_ms"]:
+            print(f"{name:45s} p50 x{result['p50_ms'] / base['p50_ms']:.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--authors", type=int, default=1000)
+    parser.add_argument("--magazines", type=int, default=100)
+    parser.add_argument("--articles", type=int, default=50_000)
+    parser.add_argument("--skew", type=float, default=1.1)
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--cache", action="store_true", help="keep the model cache enabled")
+    parser.add_argument("--db", help="database file to seed (default: a temporary file)")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    parser.add_argument("--compare", help="JSON report of an earlier run to compare against")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        configure(database_path=args.db or os.path.join(tmp, "bench.db"))
+        configure_cache(max_size=None if args.cache else 0)
+
+        start = time.perf_counter()
+        data = seed(args.authors, args.magazines, args.articles, args.skew)
+        seed_seconds = time.perf_counter() - start
+        warm_up()
+
+        rng = random.Random(7)
+        results = {
+            name: time_operation(fn, max(1, int(args.iterations * scale)))
+            for name, (fn, scale) in operations(data, rng).items()
+        }
+        report = {
+            "config": vars(args) | {"seed_seconds": round(seed_seconds, 3)},
+            "results": results,
+            "pool": pool_stats(),
+            "cache": cache_stats(),
+        }
+        configure()  # close the pool before the temporary directory goes away
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+    return report
+
+
+if __name__ == "__main__":
+    main()
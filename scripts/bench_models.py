@@ -0,0 +1,87 @@
+"""
+Compare the old dict-backed model representation with the __slots__ one.
+
+Loads N article rows from an in-memory database both ways (sqlite3.Row +
+name lookups vs. the tuple row factory) and reports load throughput and the
+memory held by the resulting objects, as JSON.
+
+Usage: python -m scripts.bench_models [--rows N]
+"""
+import argparse
+import json
+import sqlite3
+import time
+import tracemalloc
+
+from lib.db.migrate import migrate
+from lib.models.article import Article
+
+
+class DictArticle:
+    """The pre-__slots__ Article: a plain instance __dict__ per object."""
+
+    def __init__(self, title, author_id, magazine_id, id=None):
+        self.id = id
+        self.title = title
+        self.author_id = author_id
+        self.magazine_id = magazine_id
+        self._related = {}
+
+
+def load_dict_backed(conn):
+    conn.row_factory = sqlite3.Row
+    rows = conn.execute("SELECT * FROM articles").fetchall()
+    return [DictArticle(row["title"], row["author_id"], row["magazine_id"], id=row["id"]) for row in rows]
+
+
+def load_slots(conn):
+    cursor = conn.cursor()
+    cursor.row_factory = Article.from_row
+    cursor.execute(f"SELECT {Article.COLUMNS} FROM articles")
+    return cursor.fetchall()
+
+
+def measure(loader, conn):
+    start = time.perf_counter()
+    objects = loader(conn)
+    elapsed = time.perf_counter() - start
+    del objects
+
+    tracemalloc.start()
+    objects = loader(conn)
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return {
+        "rows": len(objects),
+        "seconds": round(elapsed, 4),
+        "rows_per_sec": round(len(objects) / elapsed) if elapsed else None,
+        "bytes_held": held,
+        "bytes_per_object": round(held / len(objects), 1) if objects else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=200_000)
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(":memory:")
+    migrate(conn)
+    conn.execute("INSERT INTO authors (id, name) VALUES (1, 'Bench Author')")
+    conn.execute("INSERT INTO magazines (id, name, category) VALUES (1, 'Bench Mag', 'Bench')")
+    conn.executemany(
+        "INSERT INTO articles (title, author_id, magazine_id) VALUES (?, 1, 1)",
+        ((f"Article {i}",) for i in range(args.rows)),
+    )
+    conn.commit()
+
+    report = {
+        "dict_backed": measure(load_dict_backed, conn),
+        "slots_tuple_rows": measure(load_slots, conn),
+    }
+    print(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Import articles from a CSV or JSONL catalog.
+
+Rows need title, author, magazine and category; authors and magazines are
+matched by name and created when missing. Progress goes to stderr and the
+final report (including rows/sec) to stdout as JSON.
+
+Usage: python -m scripts.import_articles CATALOG [--db PATH] [--workers N] [--batch-size N]
+"""
+import argparse
+import json
+import sys
+
+from lib.db.connection import configure
+from lib.db.importer import IMPORT_BATCH_SIZE, import_file
+
+
+def print_progress(report):
+    print(f"\r{report['rows']:,} rows ({report['rejected']:,} rejected)",
+          end="", file=sys.stderr, flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("catalog", help="a .csv, .jsonl or .ndjson file")
+    parser.add_argument("--db", help="database file (default: articles.db)")
+    parser.add_argument("--workers", type=int, help="parser processes (default: one per CPU)")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    if args.db:
+        configure(database_path=args.db)
+    report = import_file(args.catalog, args.workers, args.batch_size, progress=print_progress)
+    print(file=sys.stderr)
+    print(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == "__main__":
+    main()
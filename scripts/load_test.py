@@ -0,0 +1,271 @@
+"""
+Load-test the model layer with concurrent readers and writers.
+
+Seeds a database (lib/db/seed.py), then runs a weighted mix of point
+lookups, relationship reads and add_*_with_articles transactions from
+--threads threads in each of --processes worker processes for --duration
+seconds. Prints JSON with throughput, p50/p95/p99 latency and
+"database is locked" error and retry counts per --interval, totals per
+operation, and each process's writer lock-wait/busy-retry counters.
+
+Usage: python -m scripts.load_test [--threads 50] [--processes 4] [--duration 30] [--output run.json]
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from lib.db.connection import configure, pool_stats, warm_up
+from lib.db.seed import seed
+from lib.models.article import Article
+from lib.models.author import Author
+from lib.models.cache import configure_cache
+from lib.models.magazine import Magazine
+from scripts.bench import percentile
+
+# Relative weight of each operation in the default mix.
+DEFAULT_MIX = {
+    "author.find_by_id": 20,
+    "magazine.find_by_id": 10,
+    "article.find_by_id": 20,
+    "author.find_by_name": 10,
+    "magazine.find_by_name": 5,
+    "author.articles": 8,
+    "author.magazines": 5,
+    "magazine.contributors": 5,
+    "magazine.articles": 2,
+    "author.add_author_with_articles": 10,
+    "magazine.add_magazine_with_articles": 5,
+}
+ARTICLES_PER_WRITE = 5
+RETRY_DELAY = 0.01  # seconds before the first client-side retry of a locked operation; doubles each time
+
+
+class WriteFailed(Exception):
+    """An add_*_with_articles call returned False (it prints the error instead of raising)."""
+
+
+def is_locked(exc):
+    return isinstance(exc, sqlite3.OperationalError) and "locked" in str(exc)
+
+
+def operations(data):
+    """Return ``{name: fn(rng, token)}`` for every operation in the mix."""
+    author_ids, magazine_ids, article_ids = data["author_ids"], data["magazine_ids"], data["article_ids"]
+
+    def checked(ok):
+        if not ok:
+            raise WriteFailed()
+
+    def add_author(rng, token):
+        checked(Author.add_author_with_articles(
+            f"Load Author {token}",
+            [{"title": f"Load {token}.{n}", "magazine_id": rng.choice(magazine_ids)}
+             for n in range(ARTICLES_PER_WRITE)],
+        ))
+
+    def add_magazine(rng, token):
+        checked(Magazine.add_magazine_with_articles(
+            f"Load Magazine {token}",
+            "Load",
+            [{"title": f"Load {token}.{n}", "author_id": rng.choice(author_ids)}
+             for n in range(ARTICLES_PER_WRITE)],
+        ))
+
+    return {
+        "author.find_by_id": lambda rng, token: Author.find_by_id(rng.choice(author_ids)),
+        "magazine.find_by_id": lambda rng, token: Magazine.find_by_id(rng.choice(magazine_ids)),
+        "article.find_by_id": lambda rng, token: Article.find_by_id(rng.choice(article_ids)),
+        "author.find_by_name": lambda rng, token: Author.find_by_name(f"Author {rng.randrange(len(author_ids))}"),
+        "magazine.find_by_name": lambda rng, token: Magazine.find_by_name(f"Magazine {rng.randrange(len(magazine_ids))}"),
+        "author.articles": lambda rng, token: Author(None, rng.choice(author_ids)).articles(),
+        "author.magazines": lambda rng, token: Author(None, rng.choice(author_ids)).magazines(),
+        "magazine.contributors": lambda rng, token: Magazine(None, None, rng.choice(magazine_ids)).contributors(),
+        "magazine.articles": lambda rng, token: Magazine(None, None, rng.choice(magazine_ids)).articles(),
+        "author.add_author_with_articles": add_author,
+        "magazine.add_magazine_with_articles": add_magazine,
+    }
+
+
+def run_worker(database_path, data, mix, threads, started_at, duration, retries, pool_size, cache, random_seed):
+    """
+    Drive the mix from ``threads`` threads in this process until ``duration`` is up.
+
+    Runs in each worker process (and in the parent when --processes is 0).
+    A "database is locked" error is retried up to ``retries`` times with
+    exponential backoff before it counts as an error.
+
+    Returns:
+        tuple: The samples, one ``(seconds since started_at, operation,
+        latency, outcome, retries)`` per operation where outcome is "ok",
+        "locked", "failed" or "error", and this process's writer pool stats
+        (lock waits and the data layer's own busy retries).
+    """
+    configure(database_path=database_path, pool_size=pool_size)
+    configure_cache(max_size=None if cache else 0)
+    warm_up()
+    ops = operations(data)
+    names = list(mix)
+    weights = list(itertools.accumulate(mix[name] for name in names))
+    tokens = itertools.count()
+    token_lock = threading.Lock()
+    deadline = started_at + duration
+    time.sleep(max(0.0, started_at - time.time()))
+
+    def loop(index):
+        rng = random.Random(random_seed * 1000 + index)
+        samples = []
+        while (now := time.time()) < deadline:
+            name = rng.choices(names, cum_weights=weights)[0]
+            with token_lock:
+                token = f"{os.getpid()}.{next(tokens)}"
+            attempts = 0
+            t0 = time.perf_counter()
+            while True:
+                try:
+                    ops[name](rng, token)
+                    outcome = "ok"
+                except WriteFailed:
+                    outcome = "failed"
+                except Exception as e:
+                    if is_locked(e) and attempts < retries:
+                        time.sleep(RETRY_DELAY * 2 ** attempts * rng.random())
+                        attempts += 1
+                        continue
+                    outcome = "locked" if is_locked(e) else "error"
+                break
+            samples.append((now - started_at, name, time.perf_counter() - t0, outcome, attempts))
+        return samples
+
+    # The add_*_with_articles helpers print their errors; keep them out of the report.
+    with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(threads) as executor:
+        results = list(executor.map(loop, range(threads)))
+    writer = pool_stats()["writer"]
+    configure()
+    return [sample for samples in results for sample in samples], writer
+
+
+def summarize(samples, elapsed):
+    """Throughput, latency percentiles and outcome counts for a list of samples."""
+    latencies = sorted(latency for _, _, latency, _, _ in samples)
+    outcomes = Counter(outcome for _, _, _, outcome, _ in samples)
+    summary = {
+        "operations": len(samples),
+        "ops_per_sec": round(outcomes["ok"] / elapsed, 1) if elapsed else None,
+        "ok": outcomes["ok"],
+        "locked": outcomes["locked"],
+        "failed": outcomes["failed"],
+        "errors": outcomes["error"],
+        "retries": sum(attempts for *_, attempts in samples),
+    }
+    if latencies:
+        summary.update(
+            p50_ms=round(percentile(latencies, 50) * 1000, 3),
+            p95_ms=round(percentile(latencies, 95) * 1000, 3),
+            p99_ms=round(percentile(latencies, 99) * 1000, 3),
+        )
+    return summary
+
+
+def report(samples, duration, interval):
+    """Group samples into ``interval``-second buckets and per-operation totals."""
+    buckets = defaultdict(list)
+    by_operation = defaultdict(list)
+    for sample in samples:
+        buckets[int(sample[0] // interval)].append(sample)
+        by_operation[sample[1]].append(sample)
+    return {
+        "total": summarize(samples, duration),
+        "timeline": [
+            {"t": round(bucket * interval, 3)} | summarize(buckets[bucket], interval)
+            for bucket in sorted(buckets)
+        ],
+        "operations": {name: summarize(found, duration) for name, found in sorted(by_operation.items())},
+    }
+
+
+def parse_mix(spec):
+    """``"author.find_by_id=5,author.articles=1"`` -> weights; unknown names are an error."""
+    if not spec:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for item in spec.split(","):
+        name, _, weight = item.partition("=")
+        if name not in DEFAULT_MIX:
+            raise SystemExit(f"Unknown operation {name!r}; choose from {', '.join(DEFAULT_MIX)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--authors", type=int, default=1000)
+    parser.add_argument("--magazines", type=int, default=100)
+    parser.add_argument("--articles", type=int, default=50_000)
+    parser.add_argument("--skew", type=float, default=1.1)
+    parser.add_argument("--threads", type=int, default=50, help="threads per process")
+    parser.add_argument("--processes", type=int, default=0,
+                        help="worker processes; 0 runs the threads in this process")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds to run")
+    parser.add_argument("--interval", type=float, default=1.0, help="timeline bucket in seconds")
+    parser.add_argument("--mix", help="comma-separated name=weight pairs (default: DEFAULT_MIX)")
+    parser.add_argument("--retries", type=int, default=0,
+                        help="client-side retries of a 'database is locked' error, on top of the "
+                             "data layer's own BEGIN retries")
+    parser.add_argument("--pool-size", type=int, default=None, help="read connections per process")
+    parser.add_argument("--cache", action="store_true", help="keep the model cache enabled")
+    parser.add_argument("--db", help="database file to seed (default: a temporary file)")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args(argv)
+    mix = parse_mix(args.mix)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_path = args.db or os.path.join(tmp, "load.db")
+        configure(database_path=database_path)
+        start = time.perf_counter()
+        data = seed(args.authors, args.magazines, args.articles, args.skew)
+        seed_seconds = time.perf_counter() - start
+        configure()  # workers open their own pools
+
+        if args.processes:
+            # spawn, not fork: children must not inherit the parent's sqlite connections.
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(args.processes, mp_context=context) as executor:
+                started_at = time.time() + 2.0  # let the workers start and warm up before the clock runs
+                futures = [
+                    executor.submit(run_worker, database_path, data, mix, args.threads, started_at,
+                                    args.duration, args.retries, args.pool_size, args.cache, n)
+                    for n in range(args.processes)
+                ]
+                results = [future.result() for future in futures]
+        else:
+            started_at = time.time()
+            results = [run_worker(database_path, data, mix, args.threads, started_at,
+                                  args.duration, args.retries, args.pool_size, args.cache, 0)]
+        samples = [sample for worker_samples, _ in results for sample in worker_samples]
+
+        result = {
+            "config": vars(args) | {"seed_seconds": round(seed_seconds, 3), "mix": mix},
+            **report(samples, args.duration, args.interval),
+            "writers": [writer for _, writer in results],
+        }
+
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    return result
+
+
+if __name__ == "__main__":
+    main()
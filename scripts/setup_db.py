@@ -0,0 +1,23 @@
+"""
+Create or upgrade the database schema.
+
+Usage: python -m scripts.setup_db [path/to/articles.db]
+"""
+import sys
+
+from lib.db.connection import DATABASE_PATH, configure, get_connection
+from lib.db.migrate import current_version
+
+
+def setup_db(database_path=DATABASE_PATH):
+    """Apply all pending migrations to ``database_path`` and return its schema version."""
+    configure(database_path=database_path)
+    conn = get_connection()  # the pool migrates when it opens its first connection
+    version = current_version(conn)
+    conn.close()
+    return version
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else DATABASE_PATH
+    print(f"{path} is at schema version {setup_db(path)}")
@@ -0,0 +1,97 @@
+import pytest
+from lib.db.connection import get_connection, transaction
+from lib.models.adjacency import adjacency_index
+from lib.models.article import Article
+from lib.models.author import Author
+from lib.models.magazine import Magazine
+
+
+@pytest.fixture(autouse=True)
+def setup_and_teardown():
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM articles")
+    cursor.execute("DELETE FROM authors")
+    cursor.execute("DELETE FROM magazines")
+    conn.commit()
+    conn.close()
+    yield
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM articles")
+    cursor.execute("DELETE FROM authors")
+    cursor.execute("DELETE FROM magazines")
+    conn.commit()
+    conn.close()
+
+def consistent():
+    return adjacency_index.verify() == {"missing": [], "extra": [], "categories": []}
+
+def test_model_inserts_update_the_index_incrementally():
+    author = Author("Graph Author")
+    author.save()
+    tech = Magazine("Graph Tech", "Tech")
+    tech.save()
+    assert tech.contributors() == []
+    builds = adjacency_index.stats()["builds"]
+
+    author.add_article(tech, "Edge One")
+    health = Magazine("Graph Health", "Health")
+    health.save()
+    Article.bulk_create([Article("Edge Two", author.id, health.id)])
+    Author.add_author_with_articles("Second Author", [{"title": "Edge Three", "magazine_id": tech.id}])
+
+    assert [m.id for m in author.magazines()] == [tech.id, health.id]
+    assert author.topic_areas() == ["Health", "Tech"]
+    assert [a.name for a in tech.contributors()] == ["Graph Author", "Second Author"]
+    assert [row["name"] for row in tech.authors()] == ["Graph Author", "Second Author"]
+    assert adjacency_index.stats()["builds"] == builds
+    assert consistent()
+
+def test_category_change_is_reflected():
+    author = Author("Category Author")
+    author.save()
+    magazine = Magazine("Shifting Mag", "Old")
+    magazine.save()
+    author.add_article(magazine, "Category Article")
+    assert author.topic_areas() == ["Old"]
+
+    magazine.category = "New"
+    magazine.save()
+    assert author.topic_areas() == ["New"]
+    assert consistent()
+
+def test_updates_and_raw_sql_rebuild_the_index():
+    author = Author("Moving Author")
+    author.save()
+    first = Magazine("First Mag", "One")
+    second = Magazine("Second Mag", "Two")
+    first.save()
+    second.save()
+    article = author.add_article(first, "Moving Article")
+    assert [m.id for m in author.magazines()] == [first.id]
+
+    article.magazine_id = second.id
+    article.save()
+    assert [m.id for m in author.magazines()] == [second.id]
+
+    conn = get_connection()
+    conn.execute("DELETE FROM articles")
+    conn.commit()
+    conn.close()
+    assert author.magazines() == []
+    assert consistent()
+
+def test_lookup_with_unacknowledged_writes_in_an_open_transaction():
+    author = Author("Raw Writer")
+    author.save()
+    magazine = Magazine("Raw Mag", "Tech")
+    magazine.save()
+    adjacency_index.invalidate()
+    with transaction() as conn:
+        conn.execute("INSERT INTO articles (title, author_id, magazine_id) VALUES ('Raw', ?, ?)",
+                     (author.id, magazine.id))
+        # Building the index leases this thread's writer, whose unacknowledged
+        # write runs the listeners, which invalidate the index being built.
+        assert [m.name for m in author.magazines()] == ["Raw Mag"]
+    assert consistent()
@@ -0,0 +1,81 @@
+import pytest
+from lib.db.aggregates import rebuild_aggregates
+from lib.models.article import Article
+from lib.models.author import Author
+from lib.models.magazine import Magazine
+from lib.db.connection import get_connection
+
+@pytest.fixture(autouse=True)
+def setup_and_teardown():
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM articles")
+    cursor.execute("DELETE FROM authors")
+    cursor.execute("DELETE FROM magazines")
+    conn.commit()
+    conn.close()
+    yield
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM articles")
+    cursor.execute("DELETE FROM authors")
+    cursor.execute("DELETE FROM magazines")
+    conn.commit()
+    conn.close()
+
+def summary_snapshot():
+    conn = get_connection()
+    snapshot = {
+        table: sorted(tuple(row) for row in conn.execute(f"SELECT * FROM {table}"))
+        for table in ("author_stats", "magazine_stats", "magazine_author_stats")
+    }
+    conn.close()
+    return snapshot
+
+def test_summaries_follow_inserts_updates_and_deletes():
+    authors = [Author(f"Stats Author {i}") for i in range(3)]
+    for author in authors:
+        author.save()
+    mags = [Magazine(f"Stats Mag {i}", "Stats") for i in range(2)]
+    for mag in mags:
+        mag.save()
+
+    articles = [Article(f"Stats {i}", authors[i % 3].id, mags[i % 2].id) for i in range(7)]
+    Article.bulk_create(articles[:5])
+    for article in articles[5:]:
+        article.save()
+    articles[0].author_id = authors[2].id
+    articles[0].save()
+    articles[1].magazine_id = mags[0].id
+    articles[1].save()
+    conn = get_connection()
+    conn.execute("DELETE FROM articles WHERE id = ?", (articles[2].id,))
+    conn.commit()
+    conn.close()
+
+    incremental = summary_snapshot()
+    rebuild_aggregates()
+    assert summary_snapshot() == incremental
+
+def test_aggregate_methods_read_summaries():
+    prolific = Author("Prolific")
+    prolific.save()
+    casual = Author("Casual")
+    casual.save()
+    shared = Magazine("Shared", "News")
+    solo = Magazine("Solo", "News")
+    empty = Magazine("Empty", "News")
+    for mag in (shared, solo, empty):
+        mag.save()
+
+    Article.bulk_create([
+        Article("P1", prolific.id, shared.id),
+        Article("P2", prolific.id, solo.id),
+        Article("P3", prolific.id, solo.id),
+        Article("C1", casual.id, shared.id),
+    ])
+
+    assert Author.top_author().id == prolific.id
+    assert [row["id"] for row in Magazine.magazines_with_multiple_authors()] == [shared.id]
+    counts = {row["name"]: row["article_count"] for row in Magazine.article_counts(rebuild=True)}
+    assert counts == {"Shared": 2, "Solo": 2, "Empty": 0}
@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+from lib.models.aio import AsyncArticle, AsyncAuthor, AsyncMagazine, batch_stats
+from lib.models.article import Article
+from lib.models.author import Author
+from lib.models.cache import model_cache
+from lib.models.magazine import Magazine
+from lib.db.connection import get_connection
+
+@pytest.fixture(autouse=True)
+def setup_and_teardown():
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM articles")
+    cursor.execute("DELETE FROM authors")
+    cursor.execute("DELETE FROM magazines")
+    conn.commit()
+    conn.close()
+    yield
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM articles")
+    cursor.execute("DELETE FROM authors")
+    cursor.execute("DELETE FROM magazines")
+    conn.commit()
+    conn.close()
+
+def test_concurrent_point_lookups_are_coalesced():
+    authors = [Author(f"Async Author {i}") for i in range(10)]
+    for author in authors:
+        author.save()
+    model_cache.clear()
+
+    async def lookup():
+        found = await asyncio.gather(*(AsyncAuthor.find_by_id(a.id) for a in authors))
+        return found, batch_stats()
+
+    found, stats = asyncio.run(lookup())
+    assert [a.name for a in found] == [a.name for a in authors]
+    assert stats["Author"] == {"batches": 1, "keys": 10}
+
+def test_relationships_are_awaitable():
+    author = Author("Async Writer")
+    author.save()
+    mag = Magazine("Async Mag", "Tech")
+    mag.save()
+    Article("Async Article", author.id, mag.id).save()
+
+    async def walk():
+        magazine = await AsyncMagazine.find_by_name("Async Mag")
+        articles = await magazine.articles()
+        return (
+            [a.title for a in articles],
+            (await articles[0].author()).name,
+            [c.name for c in await magazine.contributors()],
+            await AsyncArticle.find_by_id(12345),
+        )
+
+    titles, author_name, contributors, missing = asyncio.run(walk())
+    assert titles == ["Async Article"]
+    assert author_name == "Async Writer"
+    assert contributors == ["Async Writer"]
+    assert missing is None
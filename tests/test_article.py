@@ -1,8 +1,11 @@
+import sqlite3
+
 import pytest
 from lib.models.article import Article
 from lib.models.author import Author
 from lib.models.magazine import Magazine
 from lib.db.connection import get_connection
+from lib.db.instrument import disable_instrumentation, enable_instrumentation, query_stats, reset_query_stats
 
 @pytest.fixture(autouse=True)
 def setup_and_teardown():
@@ -35,6 +38,17 @@ def test_article_save_and_find_by_id():
     assert found.author_id == author.id
     assert found.magazine_id == 1
 
+def test_unsharded_lookups_and_saves_accept_any_id():
+    author = Author("Author Two")
+    author.save()
+    article = Article("Loose Ids", author.id, 1)
+    article.save()
+
+    assert Article.find_by_id(None) is None
+    assert Article.find_by_id(str(article.id)).title == "Loose Ids"
+    with pytest.raises(sqlite3.IntegrityError):
+        Article("No Magazine", author.id, None).save()
+
 def test_find_by_title():
     author = Author("Author Two")
     author.save()
@@ -73,3 +87,117 @@ def test_author_and_magazine_relationships():
 
     assert article.author().name == "Rel Author"
     assert article.magazine().name == "Rel Mag"
+
+def test_prefetch_resolves_relations_in_batches():
+    from lib.models.article import prefetch
+    from lib.models.cache import model_cache
+
+    authors = [Author(f"Prefetch Author {i}") for i in range(3)]
+    for author in authors:
+        author.save()
+    articles = [Article(f"Prefetched {i}", authors[i % 3].id, 1) for i in range(6)]
+    for article in articles:
+        article.save()
+
+    model_cache.clear()
+    loaded = Magazine.find_by_id(1).articles(include=["author"])
+    misses = model_cache.stats()["misses"]
+    assert {a.author().name for a in loaded} == {a.name for a in authors}
+    assert all(a.magazine().id == 1 for a in loaded)
+    assert model_cache.stats()["misses"] == misses
+
+    prefetched = prefetch([Article.find_by_id(a.id) for a in articles], "author", "magazine")
+    assert [a.author().id for a in prefetched] == [a.author_id for a in articles]
+
+def test_bulk_create_streams_generator_and_returns_ids():
+    author = Author("Bulk Author")
+    author.save()
+
+    rows = ({"title": f"Bulk {i}", "author_id": author.id, "magazine_id": 1} for i in range(25))
+    ids = Article.bulk_create(rows, chunk_size=10)
+
+    assert len(ids) == 25
+    assert len(set(ids)) == 25
+    assert Article.find_by_id(ids[7]).title == "Bulk 7"
+    assert Article.find_by_id(ids[-1]).title == "Bulk 24"
+
+    article = Article("Bulk Instance", author.id, 1)
+    Article.bulk_create([article])
+    assert Article.find_by_title("Bulk Instance").id == article.id
+
+def test_models_are_slotted_and_built_from_tuples():
+    article = Article.from_row(None, ("Tuple Title", 2, 3, 4))
+    assert (article.id, article.title, article.author_id, article.magazine_id) == (4, "Tuple Title", 2, 3)
+    for obj in (article, Author("Slotted"), Magazine("Slotted", "Mag")):
+        assert not hasattr(obj, "__dict__")
+
+def test_search_ranks_and_filters():
+    author = Author("Search Author")
+    author.save()
+    other = Author("Other Author")
+    other.save()
+
+    Article("Quantum computing for beginners", author.id, 1).save()
+    Article.bulk_create([
+        Article("Computing history", other.id, 1),
+        Article("Quantum physics explained", author.id, 1),
+    ])
+    Author.add_author_with_articles("Helper", [{"title": "Quantum leap in computing", "magazine_id": 1}])
+
+    titles = [a.title for a in Article.search("quantum computing")]
+    assert set(titles) == {"Quantum computing for beginners", "Quantum leap in computing"}
+    assert [a.title for a in Article.search('"quantum computing"')] == ["Quantum computing for beginners"]
+    assert len(Article.search("comput*")) == 3
+    assert [a.author_id for a in Article.search("quantum", author_id=other.id)] == []
+    assert Article.search("", limit=5) == []
+    assert Article.search('quantum" OR') is not None
+
+def test_search_index_follows_updates():
+    author = Author("Renamer")
+    author.save()
+    article = Article("Original headline", author.id, 1)
+    article.save()
+    article.title = "Rewritten headline"
+    article.save()
+
+    assert Article.search("original") == []
+    assert [a.id for a in Article.search("rewritten")] == [article.id]
+
+def test_save_writes_only_changed_columns():
+    author = Author("Dirty Author")
+    author.save()
+    article = Article("Tracked", author.id, 1)
+    article.save()
+    assert article.dirty_fields() == ()
+
+    reset_query_stats()
+    enable_instrumentation()
+    try:
+        article.save()
+        Article.find_by_title("Tracked").save()
+        assert not [row for row in query_stats() if row["caller"] == "Article.save"]
+
+        article.title = "Retitled"
+        assert article.dirty_fields() == ("title",)
+        article.save()
+        updates = [row["sql"] for row in query_stats()
+                   if row["caller"] == "Article.save" and row["sql"].startswith("UPDATE")]
+        assert updates == ["UPDATE articles SET title = ? WHERE id = ?"]
+    finally:
+        disable_instrumentation()
+    assert not article.is_dirty()
+    assert Article.find_by_id(article.id).title == "Retitled"
+
+
+def test_loaded_article_tracks_its_first_write():
+    author = Author("Loader")
+    author.save()
+    saved = Article("Loaded", author.id, 1)
+    saved.save()
+    article = Article.find_by_id(saved.id)
+    assert article.dirty_fields() == ()
+
+    article.magazine_id = 2
+    assert article.dirty_fields() == ("magazine_id",)
+    article.magazine_id = 1
+    assert article.dirty_fields() == ()
@@ -95,3 +95,60 @@ def test_top_author(setup_db):
 
     top = Author.top_author()
     assert top.name == "Prolific Writer"
+
+def test_top_author_ties_go_to_the_lower_id(setup_db):
+    first, second = Author("First"), Author("Second")
+    first.save()
+    second.save()
+    magazine = Magazine("Tie Mag", "Even")
+    magazine.save()
+    for author in (second, first, second, first):
+        Article(f"By {author.name}", author.id, magazine.id).save()
+
+    assert Author.top_author().id == first.id
+
+def test_bulk_upsert_matches_existing_by_name(setup_db):
+    existing = Author("Existing Author")
+    existing.save()
+
+    new = Author("Object Author")
+    ids = Author.bulk_upsert(
+        iter(["Existing Author", "Fresh Author", new, "Fresh Author"]), chunk_size=2
+    )
+
+    assert ids[0] == existing.id
+    assert ids[1] == ids[3] == Author.find_by_name("Fresh Author").id
+    assert new.id == ids[2]
+    assert Author.find_by_id(new.id).name == "Object Author"
+
+def test_bulk_upsert_keeps_the_id_of_saved_instances(setup_db):
+    first, second = Author("X"), Author("Y")
+    first.save()
+    second.save()
+    first = Author.find_by_id(first.id)
+    first.name = "Y"
+
+    assert Author.bulk_upsert([first, "Z"])[0] == first.id
+    assert Author.find_by_id(first.id) is first
+    assert Author.find_by_ids([first.id])[first.id].name == "Y"
+    assert Author.find_by_id(second.id).name == "Y"
+    assert not first.is_dirty()
+
+def test_iter_articles_and_keyset_pages(setup_db):
+    author = Author("Streaming Author")
+    author.save()
+    Article.bulk_create(
+        {"title": f"Stream {i}", "author_id": author.id, "magazine_id": 1 + i % 2} for i in range(12)
+    )
+
+    streamed = author.iter_articles(batch_size=5)
+    assert not isinstance(streamed, list)
+    assert [a.title for a in streamed] == [f"Stream {i}" for i in range(12)]
+
+    first = author.articles_page(limit=5)
+    second = author.articles_page(after_id=first[-1].id, limit=5)
+    last = author.articles_page(after_id=second[-1].id, limit=5)
+    assert [len(first), len(second), len(last)] == [5, 5, 2]
+    assert first[-1].id < second[0].id
+
+    assert sorted(m.id for m in author.iter_magazines()) == [1, 2]
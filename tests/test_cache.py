@@ -0,0 +1,119 @@
+import pytest
+from lib.models.article import Article
+from lib.models.author import Author
+from lib.models.magazine import Magazine
+from lib.models.cache import model_cache
+from lib.db.connection import get_connection
+
+@pytest.fixture(autouse=True)
+def setup_and_teardown():
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM articles")
+    cursor.execute("DELETE FROM authors")
+    cursor.execute("DELETE FROM magazines")
+    conn.commit()
+    conn.close()
+    yield
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM articles")
+    cursor.execute("DELETE FROM authors")
+    cursor.execute("DELETE FROM magazines")
+    conn.commit()
+    conn.close()
+
+def test_find_by_id_returns_same_instance():
+    author = Author("Cached Author")
+    author.save()
+
+    hits = model_cache.stats()["hits"]
+    assert Author.find_by_id(author.id) is author
+    assert Author.find_by_id(author.id) is author
+    assert model_cache.stats()["hits"] == hits + 2
+
+def test_identity_map_survives_cache_clear():
+    mag = Magazine("Identity Mag", "Tech")
+    mag.save()
+    model_cache.clear()
+
+    assert Magazine.find_by_id(mag.id) is mag
+    assert Magazine.find_by_name("Identity Mag") is mag
+
+def test_rename_invalidates_old_name():
+    author = Author("Old Name")
+    author.save()
+    assert Author.find_by_name("Old Name") is author
+
+    author.name = "New Name"
+    author.save()
+    assert Author.find_by_name("Old Name") is None
+    assert Author.find_by_name("New Name") is author
+
+def test_raw_writes_flush_cache():
+    author = Author("Raw Author")
+    author.save()
+    Author.find_by_id(author.id)
+
+    conn = get_connection()
+    conn.execute("UPDATE authors SET name = 'Renamed Raw' WHERE id = ?", (author.id,))
+    conn.commit()
+    conn.close()
+
+    assert Author.find_by_id(author.id).name == "Renamed Raw"
+
+def test_article_parent_lookups_are_cached():
+    author = Author("Parent Author")
+    author.save()
+    mag = Magazine("Parent Mag", "News")
+    mag.save()
+    article = Article("Child", author.id, mag.id)
+    article.save()
+
+    misses = model_cache.stats()["misses"]
+    assert article.author() is author
+    assert article.magazine() is mag
+    assert model_cache.stats()["misses"] == misses
+
+def test_transactional_helper_invalidates_name():
+    mag = Magazine("Helper Mag", "News")
+    mag.save()
+    assert Author.find_by_name("Helper Author") is None
+
+    Author.add_author_with_articles("Helper Author", [{"title": "Helped", "magazine_id": mag.id}])
+    assert Author.find_by_name("Helper Author") is not None
+    assert Article.find_by_title("Helped").magazine_id == mag.id
+
+def test_refreshed_instance_tracks_the_loaded_values():
+    mag = Magazine("Refreshed Mag", "Old")
+    mag.save()
+    Magazine.bulk_upsert([{"name": "Refreshed Mag", "category": "New"}])
+    assert Magazine.find_by_id(mag.id) is mag
+    assert mag.category == "New" and not mag.is_dirty()
+
+    mag.category = "Old"
+    mag.save()
+    model_cache.clear()
+    assert Magazine.find_by_name("Refreshed Mag").category == "Old"
+
+    mag.name = "Local Edit"
+    Magazine.bulk_upsert([{"name": "Refreshed Mag", "category": "Newer"}])
+    Magazine.find_by_id(mag.id)
+    assert (mag.name, mag.category) == ("Local Edit", "Newer")
+    assert mag.dirty_fields() == ("name",)
+
+def test_duplicate_names_resolve_to_the_lowest_id():
+    first, second = Author("Dup"), Author("Dup")
+    first.save()
+    second.save()
+    Author.find_by_id(second.id)
+    assert Author.find_by_name("Dup") is first
+    model_cache.clear()
+    assert Author.find_by_name("Dup") is first
+
+    renamed = Author("Other")
+    renamed.save()
+    assert Author.find_by_name("Other") is renamed
+    first.name = "Other"
+    first.save()
+    assert Author.find_by_name("Other") is first
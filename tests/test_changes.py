@@ -0,0 +1,69 @@
+import pytest
+from lib.db.changes import iter_changes, latest_seq, prune_changes
+from lib.db.connection import get_connection
+from lib.models.article import Article
+from lib.models.author import Author
+from lib.models.magazine import Magazine
+
+
+@pytest.fixture(autouse=True)
+def setup_and_teardown():
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM articles")
+    cursor.execute("DELETE FROM authors")
+    cursor.execute("DELETE FROM magazines")
+    conn.commit()
+    conn.close()
+    yield
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM articles")
+    cursor.execute("DELETE FROM authors")
+    cursor.execute("DELETE FROM magazines")
+    conn.commit()
+    conn.close()
+
+def test_model_writes_are_logged_in_order():
+    start = latest_seq()
+    author = Author("Feed Author")
+    author.save()
+    magazine = Magazine("Feed Mag", "News")
+    magazine.save()
+    article = author.add_article(magazine, "First")
+    Article.bulk_create([Article("Second", author.id, magazine.id)])
+    Author.add_author_with_articles("Other Author", [{"title": "Third", "magazine_id": magazine.id}])
+    Magazine.add_magazine_with_articles("Other Mag", "Sport", [{"title": "Fourth", "author_id": author.id}])
+    article.title = "First, revised"
+    article.save()
+
+    changes = list(iter_changes(start, batch_size=2))
+    assert [c.seq for c in changes] == list(range(start + 1, start + len(changes) + 1))
+    assert [(c.table, c.op) for c in changes] == [
+        ("authors", "insert"), ("magazines", "insert"), ("articles", "insert"),
+        ("articles", "insert"), ("authors", "insert"), ("articles", "insert"),
+        ("magazines", "insert"), ("articles", "insert"), ("articles", "update"),
+    ]
+    assert changes[0].row_id == author.id
+    assert changes[0].data == {"name": "Feed Author"}
+    assert changes[-1].data == {"title": "First, revised", "author_id": author.id,
+                                "magazine_id": magazine.id}
+    assert latest_seq() == changes[-1].seq
+
+def test_consumer_resumes_and_pruning_keeps_sequence():
+    author = Author("Resumed")
+    author.save()
+    position = latest_seq()
+    conn = get_connection()
+    conn.execute("DELETE FROM authors WHERE id = ?", (author.id,))
+    conn.commit()
+    conn.close()
+
+    [deleted] = list(iter_changes(position))
+    assert (deleted.table, deleted.op, deleted.row_id, deleted.data) == ("authors", "delete", author.id, None)
+
+    assert prune_changes(deleted.seq) >= 2
+    assert list(iter_changes(0)) == []
+    Author("After Prune").save()
+    [change] = list(iter_changes(0))
+    assert change.seq == deleted.seq + 1
@@ -0,0 +1,317 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+from lib.db import connection
+from lib.db.connection import ConnectionPool, PoolTimeoutError, configure, get_read_connection, transaction
+from lib.models.article import Article
+from lib.models.author import Author
+from lib.models.cache import model_cache
+from lib.models.magazine import Magazine
+from lib.models.write_behind import enable_write_behind
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), max_size=2, timeout=0.2)
+    yield pool
+    pool.close()
+
+@pytest.fixture
+def split_db(tmp_path):
+    default = connection.DATABASE_PATH
+    configure(database_path=str(tmp_path / "split.db"))
+    model_cache.clear()
+    yield
+    configure(database_path=default)
+    model_cache.clear()
+
+@pytest.fixture
+def sharded_db(tmp_path):
+    default = connection.DATABASE_PATH
+    configure(database_path=str(tmp_path / "home.db"), shards=3)
+    yield
+    configure(database_path=default, shards=1)
+
+def test_close_returns_connection_to_pool(pool):
+    conn = pool.connection()
+    raw = conn.raw
+    conn.close()
+
+    again = pool.connection()
+    assert again.raw is raw
+    again.close()
+
+    stats = pool.stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] == 1
+    assert stats["idle"] == 1
+
+def test_nested_leases_in_one_thread_share_a_connection(pool):
+    outer = pool.connection()
+    inner = pool.connection()
+    assert inner.raw is outer.raw
+    inner.close()
+    assert pool.stats()["in_use"] == 1
+    outer.close()
+    assert pool.stats()["in_use"] == 0
+
+def test_closed_lease_cannot_be_used(pool):
+    conn = pool.connection()
+    conn.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
+
+def test_pool_is_bounded_and_times_out(pool):
+    release = threading.Event()
+    checked_out = threading.Barrier(3)
+
+    def hold():
+        conn = pool.connection()
+        checked_out.wait()
+        release.wait()
+        conn.close()
+
+    holders = [threading.Thread(target=hold) for _ in range(2)]
+    for t in holders:
+        t.start()
+    checked_out.wait()
+
+    with pytest.raises(PoolTimeoutError):
+        pool.connection()
+    assert pool.stats()["waits"] == 1
+
+    release.set()
+    for t in holders:
+        t.join()
+    conn = pool.connection()
+    assert pool.stats()["size"] == 2
+    conn.close()
+
+def test_slow_connect_does_not_block_the_pool(pool, monkeypatch):
+    first = pool.connection()
+    connect = pool._connect
+    connecting = threading.Event()
+
+    def slow_connect():
+        connecting.set()
+        time.sleep(0.5)
+        return connect()
+
+    monkeypatch.setattr(pool, "_connect", slow_connect)
+    opener = threading.Thread(target=lambda: pool.connection().close())
+    opener.start()
+    connecting.wait(5)
+    start = time.monotonic()
+    first.close()
+    assert pool.stats()["idle"] == 1
+    assert time.monotonic() - start < 0.25
+    opener.join()
+
+
+def test_failed_connect_frees_its_slot(tmp_path, monkeypatch):
+    pool = ConnectionPool(str(tmp_path / "fail.db"), max_size=1, timeout=0.2)
+    connect = pool._connect
+
+    def failing_connect():
+        raise sqlite3.OperationalError("unable to open database file")
+
+    monkeypatch.setattr(pool, "_connect", failing_connect)
+    with pytest.raises(sqlite3.OperationalError, match="unable to open"):
+        pool.connection()
+    assert pool.stats()["size"] == 0
+
+    monkeypatch.setattr(pool, "_connect", connect)
+    pool.connection().close()
+    pool.close()
+
+def test_released_transaction_is_rolled_back(pool):
+    conn = pool.connection()
+    conn.execute("CREATE TABLE t (x INTEGER)")
+    conn.commit()
+    conn.execute("INSERT INTO t VALUES (1)")
+    conn.close()
+
+    conn = pool.connection()
+    assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+    conn.close()
+
+def test_readonly_pool_rejects_writes(tmp_path):
+    path = str(tmp_path / "ro.db")
+    writer = ConnectionPool(path, max_size=1)
+    writer.connection().close()  # creates and migrates the database
+    readers = ConnectionPool(path, max_size=2, readonly=True)
+
+    conn = readers.connection()
+    assert conn.execute("SELECT COUNT(*) FROM authors").fetchone()[0] == 0
+    with pytest.raises(sqlite3.OperationalError):
+        conn.execute("INSERT INTO authors (name) VALUES ('Nope')")
+    conn.close()
+    readers.close()
+    writer.close()
+
+def test_reads_are_not_blocked_by_open_write_transaction(split_db):
+    Author("Committed Author").save()
+    model_cache.clear()
+    started = threading.Event()
+    finish = threading.Event()
+
+    def write():
+        with transaction() as conn:
+            conn.execute("INSERT INTO authors (name) VALUES ('Pending Author')")
+            started.set()
+            finish.wait(5)
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    started.wait(5)
+    try:
+        assert Author.find_by_name("Committed Author") is not None
+        assert Author.find_by_name("Pending Author") is None
+    finally:
+        finish.set()
+        writer.join()
+    assert Author.find_by_name("Pending Author") is not None
+
+def test_thread_holding_writer_reads_its_own_writes(split_db):
+    with transaction() as conn:
+        conn.execute("INSERT INTO authors (name) VALUES ('Own Write')")
+        read = get_read_connection()
+        assert read.raw is conn.raw
+        read.close()
+        assert Author.find_by_name("Own Write") is not None
+    assert connection.pool_stats()["writer"]["max_size"] == 1
+
+def test_sharded_articles_are_routed_by_magazine(sharded_db, tmp_path):
+    alice, bob = Author("Alice"), Author("Bob")
+    alice.save()
+    bob.save()
+    magazines = [Magazine(f"Shard Mag {i}", "Tech" if i % 2 else "Science") for i in range(4)]
+    for magazine in magazines:
+        magazine.save()
+    alice.add_article(magazines[0], "A0")
+    Article.bulk_create(Article(f"A{i}", alice.id, magazines[i].id) for i in (1, 2, 3))
+    Author.add_author_with_articles("Carol", [{"title": "C1", "magazine_id": magazines[1].id}])
+    Magazine.add_magazine_with_articles("Late Mag", "Tech", [{"title": "B1", "author_id": bob.id}])
+
+    for magazine in magazines:
+        shard = connection.shard_for(magazine.id)
+        assert (tmp_path / f"home.shard{shard}.db").exists()
+        for article in magazine.articles():
+            assert connection.shard_of_article(article.id) == shard
+    with connection.read_cursor() as cursor:
+        assert cursor.execute("SELECT COUNT(*) FROM articles").fetchone()[0] == 0
+
+    model_cache.clear()
+    ids = [a.id for a in alice.articles()]
+    assert len(set(ids)) == 4
+    assert [a.id for a in alice.iter_articles(batch_size=1)] == sorted(ids)
+    assert [a.id for a in alice.articles_page(limit=3)] == sorted(ids)[:3]
+    assert {a.title for a in Article.find_by_ids(ids).values()} == {"A0", "A1", "A2", "A3"}
+    assert Article.find_by_title("C1").magazine_id == magazines[1].id
+    assert Author.top_author().id == alice.id
+    assert [a.name for a in magazines[1].contributors()] == ["Alice", "Carol"]
+    assert alice.topic_areas() == ["Science", "Tech"]
+
+    counts = {row["name"]: row["article_count"] for row in Magazine.article_counts(rebuild=True)}
+    assert counts == {"Shard Mag 0": 1, "Shard Mag 1": 2, "Shard Mag 2": 1, "Shard Mag 3": 1, "Late Mag": 1}
+    assert [row["id"] for row in Magazine.magazines_with_multiple_authors()] == [magazines[1].id]
+    assert len(connection.pool_stats()["shards"]) == 3
+
+def test_sharded_mode_rejects_single_database_features(sharded_db):
+    author = Author("Mover")
+    author.save()
+    first, second = Magazine("From", "One"), Magazine("To", "Two")
+    first.save()
+    second.save()
+    article = author.add_article(first, "Stays Put")
+    article.magazine_id = second.id
+    with pytest.raises(ValueError):
+        article.save()
+    with pytest.raises(RuntimeError):
+        enable_write_behind()
+
+def test_writes_retry_while_another_process_holds_the_lock(split_db, tmp_path, monkeypatch):
+    Author("Warm Up").save()
+    conn = connection.get_connection()
+    conn.execute("PRAGMA busy_timeout = 10")  # fail fast instead of waiting the default 2 s
+    conn.close()
+    other = sqlite3.connect(str(tmp_path / "split.db"), isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+
+    def release_then_retry(attempt):
+        other.execute("COMMIT")
+        return 0
+    monkeypatch.setattr(connection, "backoff_delay", release_then_retry)
+    author = Author("Waited For Lock")
+    author.save()
+    assert Author.find_by_id(author.id).name == "Waited For Lock"
+    stats = connection.pool_stats()["writer"]
+    assert stats["busy_retries"] == 1 and stats["lock_waits"] >= 1
+
+    monkeypatch.setattr(connection, "backoff_delay", lambda attempt: 0)
+    other.execute("BEGIN IMMEDIATE")
+    try:
+        with pytest.raises(sqlite3.OperationalError, match="locked"):
+            Author.add_author_with_articles("Locked Out", [])
+    finally:
+        other.execute("ROLLBACK")
+        other.close()
+    assert connection.pool_stats()["writer"]["busy_errors"] == 1
+    assert Author.find_by_name("Locked Out") is None
+
+def test_pool_timeouts_in_writes_are_raised_and_counted(split_db):
+    started, finish = threading.Event(), threading.Event()
+
+    def write():
+        with transaction():
+            started.set()
+            finish.wait(5)
+
+    default = connection.POOL_TIMEOUT
+    configure(timeout=0.05)
+    writer = threading.Thread(target=write)
+    writer.start()
+    started.wait(5)
+    try:
+        with pytest.raises(PoolTimeoutError):
+            Author.add_author_with_articles("Crowded Out", [])
+        with pytest.raises(PoolTimeoutError):
+            Magazine.add_magazine_with_articles("Crowded Out", "None", [])
+        assert connection.pool_stats()["writer"]["timeouts"] == 2
+    finally:
+        finish.set()
+        writer.join()
+        configure(timeout=default)
+    assert Author.find_by_name("Crowded Out") is None
+
+def test_sharded_top_author_ties_go_to_the_lower_id(sharded_db):
+    first, second = Author("First"), Author("Second")
+    first.save()
+    second.save()
+    magazines = {}
+    while len(magazines) < 2:
+        magazine = Magazine(f"Mag {len(magazines)}", "Even")
+        magazine.save()
+        magazines.setdefault(connection.shard_for(magazine.id), magazine)
+    low, high = (magazines[shard] for shard in sorted(magazines))
+    # The higher id's count comes first in the shard fan-out.
+    second.add_article(low, "Early")
+    first.add_article(high, "Late")
+
+    assert Author.top_author().id == first.id
+
+def test_sharded_magazine_commits_before_its_articles(sharded_db, capsys):
+    author = Author("Contributor")
+    author.save()
+    assert Magazine.add_magazine_with_articles("Kept", "Tech", [
+        {"title": "Fine", "author_id": author.id},
+        {"title": None, "author_id": author.id},
+    ]) is False
+    assert "Transaction failed" in capsys.readouterr().out
+
+    magazine = Magazine.find_by_name("Kept")
+    assert magazine is not None
+    assert magazine.articles() == []
+    assert Article.find_by_title("Fine") is None
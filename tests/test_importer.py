@@ -0,0 +1,81 @@
+import json
+
+import pytest
+from lib.db.connection import get_connection
+from lib.db.importer import import_file, read_batches
+from lib.models.article import Article
+from lib.models.author import Author
+from lib.models.magazine import Magazine
+
+
+@pytest.fixture(autouse=True)
+def setup_and_teardown():
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM articles")
+    cursor.execute("DELETE FROM authors")
+    cursor.execute("DELETE FROM magazines")
+    conn.commit()
+    conn.close()
+    yield
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM articles")
+    cursor.execute("DELETE FROM authors")
+    cursor.execute("DELETE FROM magazines")
+    conn.commit()
+    conn.close()
+
+@pytest.fixture
+def catalog(tmp_path):
+    path = tmp_path / "catalog.csv"
+    path.write_text(
+        "Title,Author,Magazine,Category\n"
+        "Quantum Basics,Jane Doe,Science Weekly,Science\n"
+        "\"Data, Explained\",John Roe,Tech Monthly,Technology\n"
+        "Untitled,,Tech Monthly,Technology\n"
+        "Quantum Advanced,Jane Doe,Science Weekly,Science\n"
+        "Too,Few,Columns\n"
+    )
+    return str(path)
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_import_csv_resolves_names_and_reports_rejects(catalog, workers):
+    existing = Author("Jane Doe")
+    existing.save()
+
+    report = import_file(catalog, workers=workers, batch_size=2)
+
+    assert report["rows"] == 5
+    assert report["imported"] == 3
+    assert report["rejected"] == 2
+    assert sorted(line for line, _ in report["errors"]) == [4, 6]
+    assert report["authors_created"] == 1
+    assert report["magazines_created"] == 2
+
+    quantum = Article.find_by_title("Quantum Advanced")
+    assert quantum.author_id == existing.id
+    assert quantum.magazine().name == "Science Weekly"
+    assert Article.find_by_title("Data, Explained").author().name == "John Roe"
+    assert Magazine.find_by_name("Tech Monthly").category == "Technology"
+
+def test_import_jsonl_skips_malformed_lines(tmp_path):
+    path = tmp_path / "catalog.jsonl"
+    rows = [
+        {"title": "Line One", "author": "A. Writer", "magazine": "Weekly", "category": "News"},
+        {"title": "Line Two", "author": "A. Writer", "magazine": "Weekly", "category": "News"},
+    ]
+    path.write_text(json.dumps(rows[0]) + "\n{not json\n\n" + json.dumps(rows[1]) + "\n[1, 2]\n")
+
+    report = import_file(str(path), workers=0)
+
+    assert report["imported"] == 2
+    assert [line for line, _ in report["errors"]] == [2, 5]
+    assert report["authors_created"] == 1
+    assert len(Author.find_by_name("A. Writer").articles()) == 2
+
+def test_unsupported_format_is_rejected(tmp_path):
+    path = tmp_path / "catalog.xml"
+    path.write_text("<articles/>")
+    with pytest.raises(ValueError):
+        next(read_batches(str(path)))
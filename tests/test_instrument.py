@@ -0,0 +1,66 @@
+import logging
+
+import pytest
+from lib.db.instrument import (
+    disable_instrumentation,
+    enable_instrumentation,
+    profiler,
+    query_stats,
+    reset_query_stats,
+    slow_queries,
+)
+from lib.models.article import Article
+from lib.models.author import Author
+from lib.models.cache import model_cache
+from lib.db.connection import get_connection
+
+@pytest.fixture(autouse=True)
+def setup_and_teardown():
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM articles")
+    cursor.execute("DELETE FROM authors")
+    cursor.execute("DELETE FROM magazines")
+    cursor.execute("INSERT INTO magazines (id, name, category) VALUES (1, 'Profiled Mag', 'General')")
+    conn.commit()
+    conn.close()
+    reset_query_stats()
+    enable_instrumentation(slow_query_ms=1000)
+    yield
+    disable_instrumentation()
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM articles")
+    cursor.execute("DELETE FROM authors")
+    cursor.execute("DELETE FROM magazines")
+    conn.commit()
+    conn.close()
+
+def test_statements_are_attributed_to_model_methods():
+    author = Author("Profiled Author")
+    author.save()
+    Article.bulk_create({"title": f"P{i}", "author_id": author.id, "magazine_id": 1} for i in range(3))
+    model_cache.clear()
+    Author.find_by_id(author.id)
+    assert len(author.articles()) == 3
+
+    stats = {row["caller"]: row for row in query_stats()}
+    assert stats["Author.find_by_id"]["count"] == 1
+    assert stats["Author.find_by_id"]["rows"] == 1
+    assert stats["Author.articles"]["rows"] == 3
+    assert "WHERE author_id = ?" in stats["Author.articles"]["sql"]
+
+    counters = profiler.counters()
+    assert counters["transactions"] == 2  # author.save() and bulk_create()
+    # The stats triggers on articles make SQLite run more statements than we issued.
+    assert counters["statements_traced"] > sum(row["count"] for row in query_stats())
+
+def test_slow_queries_are_logged_with_plan(caplog):
+    enable_instrumentation(slow_query_ms=0)
+    with caplog.at_level(logging.WARNING, logger="lib.db.slow_query"):
+        Author.find_by_name("Nobody")
+
+    slow = [q for q in slow_queries() if q["caller"] == "Author.find_by_name"]
+    assert slow
+    assert any("idx_authors_name" in step for step in slow[0]["plan"])
+    assert "Author.find_by_name" in caplog.text
@@ -1,4 +1,5 @@
 import pytest
+from lib.models.cache import model_cache
 from lib.models.magazine import Magazine
 from lib.models.author import Author
 from lib.models.article import Article
@@ -73,3 +74,51 @@ def test_article_counts():
 
     assert counts["Article Count Mag"] == 2
     assert counts["Empty Mag"] == 0
+
+def test_bulk_upsert_inserts_and_updates():
+    mag = Magazine("Upsert Mag", "Old Category")
+    mag.save()
+
+    ids = Magazine.bulk_upsert([
+        {"name": "Upsert Mag", "category": "New Category"},
+        {"name": "Brand New Mag", "category": "Science"},
+    ])
+
+    assert ids[0] == mag.id
+    assert Magazine.find_by_id(mag.id).category == "New Category"
+    assert Magazine.find_by_id(ids[1]).name == "Brand New Mag"
+
+def test_bulk_upsert_writes_saved_instances_to_their_own_row():
+    kept, other = Magazine("Kept Mag", "Tech"), Magazine("Other Mag", "Science")
+    kept.save()
+    other.save()
+    kept.name, kept.category = "Other Mag", "Design"
+
+    assert Magazine.bulk_upsert([kept]) == [kept.id]
+    model_cache.clear()
+    assert (Magazine.find_by_id(kept.id).name, Magazine.find_by_id(kept.id).category) == ("Other Mag", "Design")
+    assert Magazine.find_by_id(other.id).category == "Science"
+
+def test_bulk_upsert_instances_take_the_category_written_for_their_name():
+    first, second = Magazine("Dup Mag", "Tech"), Magazine("Dup Mag", "Science")
+    Magazine.bulk_upsert([first, second])
+    assert first.id == second.id
+    assert first.category == second.category == "Science"
+    assert not first.is_dirty()
+
+def test_iter_contributors_and_pages():
+    mag = Magazine("Paged Mag", "Various")
+    mag.save()
+    authors = [Author(f"Paged Author {i}") for i in range(4)]
+    for author in authors:
+        author.save()
+        Article(f"By {author.name}", author.id, mag.id).save()
+        Article(f"Also by {author.name}", author.id, mag.id).save()
+
+    assert [a.id for a in mag.iter_contributors(batch_size=2)] == [a.id for a in authors]
+    assert len(list(mag.iter_articles(batch_size=3))) == 8
+
+    page = mag.contributors_page(limit=3)
+    rest = mag.contributors_page(after_id=page[-1].id, limit=3)
+    assert [a.id for a in page + rest] == [a.id for a in authors]
+    assert len(mag.articles_page(after_id=0, limit=5)) == 5
@@ -0,0 +1,37 @@
+import sqlite3
+
+from lib.db.migrate import current_version, latest_version, migrate
+
+
+def test_migrate_creates_schema_and_is_idempotent(tmp_path):
+    conn = sqlite3.connect(tmp_path / "migrate.db")
+
+    assert migrate(conn) == list(range(1, latest_version() + 1))
+    assert current_version(conn) == latest_version()
+    assert migrate(conn) == []
+
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {"idx_authors_name", "idx_magazines_name", "idx_articles_title"} <= indexes
+    conn.close()
+
+def test_change_feed_migration_drops_cache_entries_tagged_with_the_old_version(tmp_path):
+    conn = sqlite3.connect(tmp_path / "upgrade.db")
+    migrate(conn, target=5)
+    conn.execute("INSERT INTO query_cache VALUES ('Magazine.article_counts', 4, '[]', '[]')")
+    conn.commit()
+
+    assert 6 in migrate(conn)
+    assert conn.execute("SELECT COUNT(*) FROM query_cache").fetchone()[0] == 0
+    conn.close()
+
+def test_relationship_queries_use_indexes(tmp_path):
+    conn = sqlite3.connect(tmp_path / "plan.db")
+    migrate(conn)
+
+    plan = " ".join(
+        row[3] for row in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM articles WHERE author_id = ?", (1,)
+        )
+    )
+    assert "USING INDEX" in plan
+    conn.close()
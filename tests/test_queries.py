@@ -0,0 +1,50 @@
+import sqlite3
+
+import pytest
+from lib.db import queries
+from lib.db.connection import ConnectionPool
+from lib.db.migrate import migrate
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "queries.db"), max_size=3, timeout=0.2)
+    yield pool
+    pool.close()
+
+def test_in_list_pads_to_bucket_size():
+    sql, params = queries.in_list(queries.AUTHORS_BY_IDS, [7, 8, 9])
+    assert sql.count("?") == 4
+    assert params == [7, 8, 9, 9]
+
+    sql_five, _ = queries.in_list(queries.AUTHORS_BY_IDS, range(5))
+    sql_sixteen, _ = queries.in_list(queries.AUTHORS_BY_IDS, range(16))
+    assert sql_five == sql_sixteen
+
+def test_in_list_beyond_largest_bucket_uses_exact_size():
+    values = list(range(queries.IN_BUCKETS[-1] + 1))
+    sql, params = queries.in_list(queries.ARTICLES_BY_IDS, values)
+    assert sql.count("?") == len(values)
+    assert params == values
+
+def test_hot_queries_compile_against_schema():
+    conn = sqlite3.connect(":memory:")
+    migrate(conn)
+    for sql in queries.HOT_QUERIES:
+        conn.execute(sql, (0,) * sql.count("?")).fetchall()
+    for sql in queries.ARTICLE_SEARCH.values():
+        conn.execute(sql, ("word",) + (0,) * (sql.count("?") - 1)).fetchall()
+    conn.close()
+
+def test_prefill_opens_idle_connections(pool):
+    assert pool.prefill(2) == 2
+    stats = pool.stats()
+    assert stats["size"] == 2
+    assert stats["idle"] == 2
+
+    conn = pool.connection()
+    conn.close()
+    assert pool.stats()["misses"] == 0
+
+    assert pool.prefill() == 1
+    assert pool.prefill() == 0
@@ -0,0 +1,135 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+from lib.db import connection
+from lib.db.connection import configure, get_connection, transaction
+from lib.db.query_cache import clear_query_cache, data_version, query_cache_stats
+from lib.models.author import Author
+from lib.models.magazine import Magazine
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(autouse=True)
+def setup_and_teardown():
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM articles")
+    cursor.execute("DELETE FROM authors")
+    cursor.execute("DELETE FROM magazines")
+    conn.commit()
+    conn.close()
+    clear_query_cache()
+    yield
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM articles")
+    cursor.execute("DELETE FROM authors")
+    cursor.execute("DELETE FROM magazines")
+    conn.commit()
+    conn.close()
+
+def populate():
+    alice, bob = Author("Alice"), Author("Bob")
+    alice.save()
+    bob.save()
+    tech = Magazine("Tech Weekly", "Tech")
+    tech.save()
+    alice.add_article(tech, "One")
+    alice.add_article(tech, "Two")
+    bob.add_article(tech, "Three")
+    return alice, tech
+
+def test_results_are_reused_until_the_data_changes():
+    alice, tech = populate()
+    before = query_cache_stats()
+    first = Magazine.article_counts()
+    assert [tuple(row) for row in Magazine.article_counts()] == [tuple(row) for row in first]
+    assert Magazine.article_counts()[0]["article_count"] == 3
+    assert Author.top_author().id == alice.id
+    assert Author.top_author().name == "Alice"
+    assert [row["name"] for row in Magazine.magazines_with_multiple_authors()] == ["Tech Weekly"]
+    assert [row["name"] for row in Magazine.magazines_with_multiple_authors()] == ["Tech Weekly"]
+    after = query_cache_stats()
+    assert after["misses"] - before["misses"] == 3
+    assert after["hits"] - before["hits"] == 4
+
+    version = data_version()
+    conn = get_connection()
+    conn.execute("INSERT INTO articles (title, author_id, magazine_id) VALUES ('Raw', ?, ?)",
+                 (alice.id, tech.id))
+    conn.commit()
+    conn.close()
+    assert data_version() > version
+    assert Magazine.article_counts()[0]["article_count"] == 4
+
+def test_other_processes_reuse_cached_results():
+    populate()
+    script = "from lib.models.magazine import Magazine; print(Magazine.article_counts()[0]['article_count'])"
+    result = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True,
+                            text=True, check=True)
+    assert result.stdout.strip() == "3"
+
+    before = query_cache_stats()
+    assert Magazine.article_counts()[0]["article_count"] == 3
+    assert query_cache_stats()["hits"] == before["hits"] + 1
+
+def test_results_seen_inside_a_transaction_are_not_shared():
+    alice, tech = populate()
+    with pytest.raises(RuntimeError):
+        with transaction() as conn:
+            conn.execute("INSERT INTO articles (title, author_id, magazine_id) VALUES ('Pending', ?, ?)",
+                         (alice.id, tech.id))
+            assert Magazine.article_counts()[0]["article_count"] == 4
+            raise RuntimeError("roll back")
+    assert Magazine.article_counts()[0]["article_count"] == 3
+
+def test_reads_do_not_wait_for_another_threads_write():
+    populate()
+    started, finish = threading.Event(), threading.Event()
+
+    def write():
+        with transaction():
+            started.set()
+            finish.wait(5)
+
+    default = connection.POOL_TIMEOUT
+    configure(timeout=1)
+    writer = threading.Thread(target=write)
+    writer.start()
+    started.wait(5)
+    try:
+        start = time.monotonic()
+        assert Magazine.article_counts()[0]["article_count"] == 3
+        assert time.monotonic() - start < 0.5
+    finally:
+        finish.set()
+        writer.join()
+        configure(timeout=default)
+
+def test_store_is_skipped_while_another_process_holds_the_lock():
+    populate()
+    conn = get_connection()
+    conn.execute("PRAGMA busy_timeout = 1500")
+    conn.close()
+    other = sqlite3.connect(connection.get_pool().database_path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    try:
+        start = time.monotonic()
+        assert Magazine.article_counts()[0]["article_count"] == 3
+        assert time.monotonic() - start < 0.5
+    finally:
+        other.rollback()
+        other.close()
+    conn = get_connection()
+    assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 1500
+    conn.execute(f"PRAGMA busy_timeout = {connection.BUSY_TIMEOUT_MS}")
+    conn.close()
+    before = query_cache_stats()
+    Magazine.article_counts()
+    assert query_cache_stats()["misses"] == before["misses"] + 1
@@ -0,0 +1,42 @@
+import pytest
+from lib.db.seed import seed
+from lib.db.connection import get_connection
+
+@pytest.fixture(autouse=True)
+def setup_and_teardown():
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM articles")
+    cursor.execute("DELETE FROM authors")
+    cursor.execute("DELETE FROM magazines")
+    conn.commit()
+    conn.close()
+    yield
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM articles")
+    cursor.execute("DELETE FROM authors")
+    cursor.execute("DELETE FROM magazines")
+    conn.commit()
+    conn.close()
+
+def test_seed_is_skewed_and_reproducible():
+    data = seed(n_authors=50, n_magazines=10, n_articles=2000)
+    assert [len(data[k]) for k in ("author_ids", "magazine_ids", "article_ids")] == [50, 10, 2000]
+
+    conn = get_connection()
+    counts = [row[0] for row in conn.execute(
+        "SELECT COUNT(*) FROM articles GROUP BY author_id ORDER BY COUNT(*) DESC"
+    )]
+    titles = [row[0] for row in conn.execute("SELECT title FROM articles ORDER BY id LIMIT 5")]
+    conn.close()
+    assert counts[0] > 10 * counts[-1]
+
+    conn = get_connection()
+    conn.execute("DELETE FROM articles")
+    conn.commit()
+    conn.close()
+    seed(n_authors=50, n_magazines=10, n_articles=5)
+    conn = get_connection()
+    assert [row[0] for row in conn.execute("SELECT title FROM articles ORDER BY id")] == titles
+    conn.close()
@@ -0,0 +1,121 @@
+import sqlite3
+
+import pytest
+from lib.db.connection import get_connection, pool_stats
+from lib.db.instrument import disable_instrumentation, enable_instrumentation, profiler
+from lib.db.query_cache import data_version
+from lib.models.article import Article
+from lib.models.author import Author
+from lib.models.magazine import Magazine
+from lib.models.session import Session, save_all
+
+
+@pytest.fixture(autouse=True)
+def setup_and_teardown():
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM articles")
+    cursor.execute("DELETE FROM authors")
+    cursor.execute("DELETE FROM magazines")
+    conn.commit()
+    conn.close()
+    yield
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM articles")
+    cursor.execute("DELETE FROM authors")
+    cursor.execute("DELETE FROM magazines")
+    conn.commit()
+    conn.close()
+
+def test_session_commits_pending_objects_in_one_transaction():
+    existing = Author("Renamed Later")
+    existing.save()
+    enable_instrumentation()
+    try:
+        before = profiler.counters()["transactions"]
+        with Session() as session:
+            author = Author("Session Author")
+            magazine = Magazine("Session Mag", "Tech")
+            existing.name = "Renamed"
+            session.add_all([author, magazine, existing])
+            session.add_all(Article(f"S{i}", author, magazine) for i in range(3))
+            assert author.id is None
+            assert pool_stats()["writer"]["in_use"] == 1
+        # One BEGIN ... COMMIT, which the profiler only counts for transaction().
+        assert profiler.counters()["transactions"] == before
+    finally:
+        disable_instrumentation()
+
+    assert pool_stats()["writer"]["in_use"] == 0
+    assert Author.find_by_id(existing.id).name == "Renamed"
+    assert [a.title for a in Author.find_by_id(author.id).articles()] == ["S0", "S1", "S2"]
+    assert [a.name for a in magazine.contributors()] == ["Session Author"]
+
+def test_session_writes_nothing_when_the_block_raises():
+    with pytest.raises(RuntimeError):
+        with Session() as session:
+            session.add(Author("Never Saved"))
+            raise RuntimeError("abort")
+    assert Author.find_by_name("Never Saved") is None
+    assert pool_stats()["writer"]["in_use"] == 0
+
+def test_failed_commit_rolls_back_and_resets_ids():
+    author = Author("Rolled Back")
+    with pytest.raises(ValueError):
+        with Session() as session:
+            session.add(author)
+            session.add(Article("Orphan", author, Magazine("Unsaved Mag", "None")))
+    assert author.id is None
+    assert Author.find_by_name("Rolled Back") is None
+    assert pool_stats()["writer"]["in_use"] == 0
+
+    with pytest.raises(TypeError):
+        Session().add("not a model")
+
+def test_failed_statement_resets_ids_assigned_earlier_in_the_same_flush():
+    existing = Author("Existing")
+    existing.save()
+    new = Author("New In Flush")
+    existing.name = None  # NOT NULL: the UPDATE after the INSERT fails
+    with pytest.raises(sqlite3.IntegrityError):
+        with Session() as session:
+            session.add_all([new, existing])
+    assert new.id is None
+
+    magazine = Magazine("Flush Mag", "Tech")
+    article = Article(None, new, magazine)  # the articles INSERT fails after the parents'
+    with pytest.raises(sqlite3.IntegrityError):
+        with Session() as session:
+            session.add_all([new, magazine, article])
+    assert new.id is None and magazine.id is None
+    assert article.author_id is new and article.magazine_id is magazine
+
+    new.save()
+    assert Author.find_by_id(new.id).name == "New In Flush"
+
+def test_aggregate_reads_release_their_connection():
+    author = Author("Leak Check")
+    author.save()
+    magazine = Magazine("Leak Mag", "Tech")
+    magazine.save()
+    author.add_article(magazine, "Leak Article")
+
+    assert Magazine.article_counts()
+    assert Magazine.magazines_with_multiple_authors() == []
+    assert pool_stats()["readers"]["in_use"] == 0
+
+def test_save_all_batches_dirty_objects_and_skips_clean_ones():
+    authors = [Author(f"Batch {i}") for i in range(4)]
+    save_all(authors)
+    authors[0].name = "Batch Renamed 0"
+    authors[2].name = "Batch Renamed 2"
+
+    before = data_version()
+    save_all(authors)
+    assert data_version() - before == 2  # one bump per row written
+
+    assert [Author.find_by_id(a.id).name for a in authors] == [
+        "Batch Renamed 0", "Batch 1", "Batch Renamed 2", "Batch 3",
+    ]
+    assert not any(a.is_dirty() for a in authors)
@@ -0,0 +1,69 @@
+import pytest
+from lib.analytics import author_article_counts, multi_author_magazines, top_authors, topic_areas
+from lib.db.connection import get_connection
+from lib.db.snapshot import export_snapshot, load_snapshot
+from lib.models.author import Author
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM articles")
+    cursor.execute("DELETE FROM authors")
+    cursor.execute("DELETE FROM magazines")
+    cursor.execute("INSERT INTO authors (id, name) VALUES (1, 'Alice'), (2, 'Bob'), (3, 'Zoë')")
+    cursor.execute("""
+        INSERT INTO magazines (id, name, category) VALUES
+        (1, 'Tech Mag', 'Tech'), (2, 'Science Mag', 'Science'), (3, 'Gadget Mag', 'Tech')
+    """)
+    cursor.execute("""
+        INSERT INTO articles (title, author_id, magazine_id) VALUES
+        ('A1', 1, 1), ('A2', 1, 2), ('A3', 1, 3), ('B1', 2, 1), ('B2', 2, 1)
+    """)
+    conn.commit()
+    conn.close()
+    export_snapshot(str(tmp_path / "snap"))
+    yield load_snapshot(str(tmp_path / "snap"))
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM articles")
+    cursor.execute("DELETE FROM authors")
+    cursor.execute("DELETE FROM magazines")
+    conn.commit()
+    conn.close()
+
+def test_snapshot_columns_round_trip(snapshot):
+    assert snapshot.rows("articles") == 5
+    assert list(snapshot.column("authors", "id")) == [1, 2, 3]
+    assert list(snapshot.column("authors", "name")) == ["Alice", "Bob", "Zoë"]
+    assert list(snapshot.column("articles", "magazine_id")) == [1, 2, 3, 1, 1]
+    assert snapshot.column("articles", "title")[-1] == "B2"
+
+def test_analytics_match_model_queries(snapshot):
+    assert author_article_counts(snapshot) == {1: 3, 2: 2}
+    assert top_authors(snapshot, 1) == [(1, "Alice", 3)]
+    assert top_authors(snapshot, 1)[0][0] == Author.top_author().id
+
+    areas = topic_areas(snapshot)
+    assert areas == {1: ["Science", "Tech"], 2: ["Tech"]}
+    assert areas[1] == sorted(Author.find_by_id(1).topic_areas())
+
+    assert multi_author_magazines(snapshot) == [1]
+
+def test_empty_snapshot(tmp_path):
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM articles")
+    cursor.execute("DELETE FROM authors")
+    cursor.execute("DELETE FROM magazines")
+    conn.commit()
+    conn.close()
+    export_snapshot(str(tmp_path / "empty"))
+    snapshot = load_snapshot(str(tmp_path / "empty"))
+
+    assert len(snapshot.column("articles", "id")) == 0
+    assert len(snapshot.column("authors", "name")) == 0
+    assert top_authors(snapshot) == []
+    assert topic_areas(snapshot) == {}
+    assert multi_author_magazines(snapshot) == []
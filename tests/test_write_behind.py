@@ -0,0 +1,119 @@
+import sqlite3
+import threading
+
+import pytest
+from lib.db.connection import get_connection
+from lib.models.article import Article
+from lib.models.author import Author
+from lib.models.write_behind import (
+    WriteBehindQueue,
+    current_queue,
+    disable_write_behind,
+    enable_write_behind,
+)
+
+
+@pytest.fixture
+def author():
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM articles")
+    cursor.execute("DELETE FROM authors")
+    cursor.execute("DELETE FROM magazines")
+    cursor.execute("INSERT INTO magazines (id, name, category) VALUES (1, 'Tech Mag', 'Tech')")
+    conn.commit()
+    conn.close()
+    author = Author("Buffered Author")
+    author.save()
+    yield author
+    disable_write_behind()
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM articles")
+    cursor.execute("DELETE FROM authors")
+    cursor.execute("DELETE FROM magazines")
+    conn.commit()
+    conn.close()
+
+def count_articles():
+    conn = get_connection()
+    count = conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+    conn.close()
+    return count
+
+def test_saves_from_many_threads_are_group_committed(author):
+    write_behind = enable_write_behind(batch_size=50, window=0.05)
+    futures = []
+    lock = threading.Lock()
+
+    def produce(worker):
+        for i in range(25):
+            future = Article(f"Buffered {worker}-{i}", author.id, 1).save()
+            with lock:
+                futures.append(future)
+
+    producers = [threading.Thread(target=produce, args=(w,)) for w in range(4)]
+    for t in producers:
+        t.start()
+    for t in producers:
+        t.join()
+
+    ids = [f.result(timeout=5) for f in futures]
+    assert len(set(ids)) == 100
+    assert count_articles() == 100
+    stats = write_behind.stats()
+    assert stats["saves"] == 100
+    assert stats["commits"] < 100
+    assert Article.find_by_id(ids[0]) is not None
+
+def test_disable_flushes_queued_saves(author):
+    enable_write_behind(batch_size=1000, window=10)
+    articles = [Article(f"Pending {i}", author.id, 1) for i in range(3)]
+    futures = [a.save() for a in articles]
+    disable_write_behind()
+
+    assert current_queue() is None
+    assert [f.result(timeout=0) for f in futures] == [a.id for a in articles]
+    assert count_articles() == 3
+
+def test_failed_save_does_not_fail_its_group(author):
+    write_behind = enable_write_behind(window=10)
+    good = Article("Good Article", author.id, 1).save()
+    bad = Article("Orphan Article", author.id, 999).save()
+    write_behind.flush(timeout=5)
+
+    assert good.result(timeout=0) is not None
+    with pytest.raises(sqlite3.IntegrityError):
+        bad.result(timeout=0)
+    assert count_articles() == 1
+
+def test_saving_twice_before_commit_updates(author):
+    write_behind = enable_write_behind(window=10)
+    article = Article("First Title", author.id, 1)
+    first = article.save()
+    article.title = "Second Title"
+    second = article.save()
+    write_behind.flush(timeout=5)
+
+    assert first.result(timeout=0) == second.result(timeout=0) == article.id
+    assert count_articles() == 1
+
+def test_producers_blocked_on_a_full_queue_do_not_deadlock_the_writer(author):
+    write_behind = WriteBehindQueue(batch_size=5, window=0.001, max_queued=10)
+    futures = [[] for _ in range(4)]
+
+    def produce(n):
+        for i in range(200):
+            futures[n].append(write_behind.submit(Article(f"Full {n}.{i}", author.id, 1)))
+
+    threads = [threading.Thread(target=produce, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    assert not any(thread.is_alive() for thread in threads)
+    write_behind.close(timeout=10)
+
+    assert all(future.result(timeout=0) for found in futures for future in found)
+    assert write_behind.stats()["saves"] == 800
+    assert count_articles() == 800